@@ -21,6 +21,107 @@ class Config:
     ADMIN_IDS = [int(id_) for id_ in os.getenv("ADMIN_IDS", "").split(",") if id_]
     DEFAULT_LANGUAGE = Languages.EN
 
+    # Режим работы: "polling" (TeleBot.infinity_polling), "async" (AsyncTeleBot)
+    # или "webhook" (встроенный HTTP-сервер)
+    RUN_MODE = os.getenv("RUN_MODE", "polling")
+    ASYNC_HANDLER_WORKERS = int(os.getenv("ASYNC_HANDLER_WORKERS", "16"))
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "64"))
+
+    # Webhook: WEBHOOK_URL регистрируется при запуске, если задан
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SSL_CERT = os.getenv("WEBHOOK_SSL_CERT")
+    WEBHOOK_SSL_KEY = os.getenv("WEBHOOK_SSL_KEY")
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+    # Обработка обновлений: шарды по chat_id, у каждого свой поток и очередь
+    DISPATCH_SHARDS = int(os.getenv("DISPATCH_SHARDS", "16"))
+    DISPATCH_QUEUE_SIZE = int(os.getenv("DISPATCH_QUEUE_SIZE", "200"))  # на шард
+    # Отдельная полоса для администраторов: свои потоки, не ждут очередь пользователей
+    ADMIN_LANE_WORKERS = int(os.getenv("ADMIN_LANE_WORKERS", "2"))
+    ADMIN_LANE_QUEUE_SIZE = int(os.getenv("ADMIN_LANE_QUEUE_SIZE", "100"))  # на поток
+
+    # Многопроцессный режим: 0 - один процесс, N - супервизор и N рабочих процессов
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))
+    WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))  # на процесс
+
+    TICKETS_PAGE_SIZE = int(os.getenv("TICKETS_PAGE_SIZE", "10"))
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "5"))
+
+    # Планировщик исходящих сообщений (лимиты Telegram)
+    GLOBAL_SEND_RATE = float(os.getenv("GLOBAL_SEND_RATE", "30"))  # сообщений/с на бота
+    CHAT_SEND_RATE = float(os.getenv("CHAT_SEND_RATE", "1"))  # сообщений/с в один чат
+    CHAT_SEND_BURST = float(os.getenv("CHAT_SEND_BURST", "3"))
+    SENDER_WORKERS = int(os.getenv("SENDER_WORKERS", "8"))
+    SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "5"))
+    SEND_RETRY_BASE_DELAY = float(os.getenv("SEND_RETRY_BASE_DELAY", "0.5"))  # секунды
+    SEND_RETRY_MAX_DELAY = float(os.getenv("SEND_RETRY_MAX_DELAY", "30"))  # секунды
+    FLOOD_BREAKER_THRESHOLD = int(os.getenv("FLOOD_BREAKER_THRESHOLD", "3"))  # ответов 429
+    FLOOD_BREAKER_WINDOW = float(os.getenv("FLOOD_BREAKER_WINDOW", "10"))  # секунды
+    FLOOD_BREAKER_COOLDOWN = float(os.getenv("FLOOD_BREAKER_COOLDOWN", "5"))  # секунды
+
+    # HTTP-транспорт Telegram API (0 - размер пула по числу отправителей)
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")  # например http://127.0.0.1:8081/bot{0}/{1}
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "0"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # секунды
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))  # секунды
+
+    # Сводка новых обращений для администраторов (0 - без сводок)
+    DIGEST_RATE_THRESHOLD = int(os.getenv("DIGEST_RATE_THRESHOLD", "20"))  # обращений/мин
+    DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "15"))  # секунды
+    DIGEST_MAX_ITEMS = int(os.getenv("DIGEST_MAX_ITEMS", "20"))
+
+    # Сообщения, пришедшие в течение окна после предыдущего, дописываются
+    # в открытое обращение пользователя (0 - каждое сообщение - новое обращение)
+    TICKET_APPEND_WINDOW = int(os.getenv("TICKET_APPEND_WINDOW", "300"))  # секунды
+
+    # Ограничение входящих сообщений от пользователя (INGRESS_RATE=0 и
+    # INGRESS_DUPLICATE_LIMIT=0 - без ограничения). По умолчанию срабатывает только на флуд
+    INGRESS_RATE = float(os.getenv("INGRESS_RATE", "1"))  # сообщений/с
+    INGRESS_BURST = float(os.getenv("INGRESS_BURST", "20"))
+    INGRESS_DUPLICATE_LIMIT = int(os.getenv("INGRESS_DUPLICATE_LIMIT", "5"))  # одинаковых подряд
+    INGRESS_MUTE_STRIKES = int(os.getenv("INGRESS_MUTE_STRIKES", "20"))  # нарушений до отключения
+    INGRESS_MUTE_SECONDS = int(os.getenv("INGRESS_MUTE_SECONDS", "600"))
+    INGRESS_WARN_INTERVAL = int(os.getenv("INGRESS_WARN_INTERVAL", "60"))  # секунды между предупреждениями
+    INGRESS_BAN_STRIKES = int(os.getenv("INGRESS_BAN_STRIKES", "0"))  # 0 - без автоблокировки
+    INGRESS_STRIKE_TTL = int(os.getenv("INGRESS_STRIKE_TTL", "86400"))  # секунды
+    INGRESS_PERSIST_STRIKES = os.getenv("INGRESS_PERSIST_STRIKES", "0") == "1"
+
+    # Рассылки
+    BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "100"))
+    # Возобновление прерванных рассылок при запуске; 0 - на всех экземплярах, кроме одного
+    BROADCAST_RESUME = os.getenv("BROADCAST_RESUME", "1") == "1"
+
+    # Хранилище состояний диалогов: "memory" или "database"
+    STATE_STORE = os.getenv("STATE_STORE", "database")
+    STATE_TTL = int(os.getenv("STATE_TTL", "3600"))  # секунды
+    STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "1000"))
+    STATE_CACHE_TTL = float(os.getenv("STATE_CACHE_TTL", "5"))  # секунды
+
+    # Пересчет счетчиков по таблицам при запуске (RECONCILE_COUNTERS=1)
+    RECONCILE_COUNTERS = os.getenv("RECONCILE_COUNTERS", "0") == "1"
+
+    # Кэш пользователей в памяти процесса
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))  # секунды
+
+    # Профиль движка для серверных СУБД (PostgreSQL, MySQL)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+    # Профиль движка для SQLite
+    SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # в КиБ, если < 0
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # мс
+
 
 class BotMessages:
     WELCOME_MESSAGE = {
@@ -103,3 +204,39 @@ class BotMessages:
             Languages.EN: "🌐 Please select language:",
             Languages.DE: "🌐 Bitte wählen Sie die Sprache:"
             }
+
+    MESSAGE_DROPPED = {
+            Languages.RU: "⏳ Вы пишете слишком часто, это сообщение не доставлено. Подождите немного.",
+            Languages.EN: "⏳ You are sending messages too fast, this message was not delivered. Please wait a little.",
+            Languages.DE: "⏳ Sie senden zu schnell, diese Nachricht wurde nicht zugestellt. Bitte warten Sie kurz."
+            }
+
+    RATE_LIMITED = {
+            Languages.RU: "⏳ Слишком много сообщений. Вы сможете написать снова через {minutes} мин.",
+            Languages.EN: "⏳ Too many messages. You can write again in {minutes} min.",
+            Languages.DE: "⏳ Zu viele Nachrichten. Sie können in {minutes} Min. wieder schreiben."
+            }
+
+    BAN_NOTIFICATION = {
+            Languages.RU: "⛔ Ваш аккаунт заблокирован администратором\nПричина: {reason}",
+            Languages.EN: "⛔ Your account has been blocked by an administrator\nReason: {reason}",
+            Languages.DE: "⛔ Ihr Konto wurde von einem Administrator gesperrt\nGrund: {reason}"
+            }
+
+    BAN_DEFAULT_REASON = {
+            Languages.RU: "нарушение правил",
+            Languages.EN: "violation of the rules",
+            Languages.DE: "Verstoß gegen die Regeln"
+            }
+
+    UNBAN_NOTIFICATION = {
+            Languages.RU: "✅ Ваш аккаунт разблокирован, вы снова можете отправлять обращения",
+            Languages.EN: "✅ Your account has been unblocked, you can send tickets again",
+            Languages.DE: "✅ Ihr Konto wurde entsperrt, Sie können wieder Anfragen senden"
+            }
+
+    USER_REPLY = {
+            Languages.RU: "💬 Ответ на обращение #{ticket_id}:\n\n{reply_text}",
+            Languages.EN: "💬 Reply to ticket #{ticket_id}:\n\n{reply_text}",
+            Languages.DE: "💬 Antwort auf Anfrage #{ticket_id}:\n\n{reply_text}"
+            }
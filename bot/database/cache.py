@@ -0,0 +1,189 @@
+"""
+Кэш записей пользователей в памяти процесса.
+
+Записи хранятся как неизменяемые снимки (UserRecord), а не ORM-объекты,
+поэтому не привязаны к сессии. Кэш ограничен по размеру (LRU) и времени
+жизни записи (TTL). Изменения пользователей сбрасывают кэш сразу и еще раз
+после коммита транзакции, чтобы параллельное чтение не закэшировало
+незакоммиченное старое значение.
+
+Каждый сброс увеличивает поколение кэша. Читатель запоминает поколение до
+запроса к БД и передает его в put: если за время чтения был сброс, запись
+не кэшируется, потому что могла быть прочитана до коммита изменения.
+
+Кэш есть в каждом процессе. Подписчики add_invalidation_listener получают
+сбросы после коммита; в многопроцессном режиме супервизор через них
+пересылает сбросы остальным рабочим процессам.
+"""
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from bot.config import Config
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserRecord(NamedTuple):
+    id: int
+    chat_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    is_banned: bool
+    language: Optional[str]
+
+    @classmethod
+    def from_model(cls, user) -> "UserRecord":
+        return cls(
+            id=user.id,
+            chat_id=user.chat_id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_banned=bool(user.is_banned),
+            language=user.language
+        )
+
+
+class UserCache:
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._by_chat_id: "OrderedDict[int, Tuple[float, UserRecord]]" = OrderedDict()
+        self._chat_id_by_id: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+
+    def get_by_chat_id(self, chat_id: int) -> Optional[UserRecord]:
+        with self._lock:
+            entry = self._by_chat_id.get(chat_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(chat_id)
+                self.misses += 1
+                return None
+            self._by_chat_id.move_to_end(chat_id)
+            self.hits += 1
+            return entry[1]
+
+
+    def get_by_id(self, user_id: int) -> Optional[UserRecord]:
+        with self._lock:
+            chat_id = self._chat_id_by_id.get(user_id)
+        if chat_id is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        return self.get_by_chat_id(chat_id)
+
+
+    def generation(self) -> int:
+        """
+        Текущее поколение; берется перед чтением записи из БД.
+        """
+        with self._lock:
+            return self._generation
+
+
+    def put(self, record: UserRecord, generation: Optional[int] = None) -> bool:
+        """
+        :param generation: Поколение на момент начала чтения записи
+        :return: False, если с начала чтения кэш сбрасывался и запись отброшена
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._remove(record.chat_id)
+            self._by_chat_id[record.chat_id] = (time.monotonic() + self.ttl, record)
+            self._chat_id_by_id[record.id] = record.chat_id
+            while len(self._by_chat_id) > self.max_size:
+                oldest_chat_id = next(iter(self._by_chat_id))
+                self._remove(oldest_chat_id)
+        return True
+
+
+    def invalidate(self, chat_ids: Iterable[int] = (), user_ids: Iterable[int] = ()) -> None:
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                chat_id = self._chat_id_by_id.get(user_id)
+                if chat_id is not None:
+                    self._remove(chat_id)
+            for chat_id in chat_ids:
+                self._remove(chat_id)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._by_chat_id.clear()
+            self._chat_id_by_id.clear()
+
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._by_chat_id),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+    def _remove(self, chat_id: int) -> None:
+        entry = self._by_chat_id.pop(chat_id, None)
+        if entry is not None:
+            self._chat_id_by_id.pop(entry[1].id, None)
+
+
+user_cache = UserCache(max_size=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+
+InvalidationListener = Callable[[List[int], List[int]], None]
+_invalidation_listeners: List[InvalidationListener] = []
+
+
+def add_invalidation_listener(listener: InvalidationListener) -> None:
+    """
+    Подписка на сбросы кэша после коммита.
+
+    :param listener: Функция (chat_ids, user_ids), вызывается в потоке коммита
+    """
+    _invalidation_listeners.append(listener)
+
+
+def invalidate_users(db: Session, chat_ids: Iterable[int] = (), user_ids: Iterable[int] = ()) -> None:
+    """
+    Сброс записей пользователей сейчас и повторно после коммита сессии.
+    """
+    chat_ids, user_ids = list(chat_ids), list(user_ids)
+    user_cache.invalidate(chat_ids=chat_ids, user_ids=user_ids)
+    pending = db.info.setdefault("user_cache_invalidate", {"chat_ids": set(), "user_ids": set()})
+    pending["chat_ids"].update(chat_ids)
+    pending["user_ids"].update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    pending = session.info.pop("user_cache_invalidate", None)
+    if not pending:
+        return
+    user_cache.invalidate(chat_ids=pending["chat_ids"], user_ids=pending["user_ids"])
+    for listener in _invalidation_listeners:
+        try:
+            listener(list(pending["chat_ids"]), list(pending["user_ids"]))
+        except Exception as e:
+            logger.error(f"User cache invalidation listener failed: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop("user_cache_invalidate", None)
@@ -1,17 +1,90 @@
 import logging
 
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool, StaticPool
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Dict, Any
 from bot.config import Config
+from bot.database.models import Base
+from bot.database.migrations import run_migrations
 
 
 logger = logging.getLogger(__name__)
 
 
-Base = declarative_base()
+def get_engine_profile(db_url: str) -> Dict[str, Any]:
+    """
+    Выбор профиля движка по URL подключения.
+
+    Для SQLite: WAL, настройки PRAGMA на каждое соединение и пул,
+    пригодный для работы из потоков обработчиков. Для серверных СУБД:
+    настраиваемый QueuePool.
+
+    :param db_url: URL подключения к БД
+    :return: Словарь с именем профиля, опциями create_engine и PRAGMA
+    """
+    url = make_url(db_url)
+
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        engine_options = {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": Config.SQLITE_BUSY_TIMEOUT / 1000
+            }
+        }
+        if in_memory:
+            engine_options["poolclass"] = StaticPool
+        else:
+            engine_options.update({
+                "poolclass": QueuePool,
+                "pool_size": Config.SQLITE_POOL_SIZE,
+                "max_overflow": 0,
+                "pool_timeout": Config.DB_POOL_TIMEOUT
+            })
+
+        pragmas = {
+            "synchronous": Config.SQLITE_SYNCHRONOUS,
+            "cache_size": Config.SQLITE_CACHE_SIZE,
+            "busy_timeout": Config.SQLITE_BUSY_TIMEOUT
+        }
+        if not in_memory:
+            pragmas = {
+                "journal_mode": Config.SQLITE_JOURNAL_MODE,
+                "mmap_size": Config.SQLITE_MMAP_SIZE,
+                **pragmas
+            }
+
+        return {
+            "name": "sqlite-memory" if in_memory else "sqlite-file",
+            "engine_options": engine_options,
+            "pragmas": pragmas
+        }
+
+    return {
+        "name": "server",
+        "engine_options": {
+            "pool_pre_ping": True,
+            "pool_size": Config.DB_POOL_SIZE,
+            "max_overflow": Config.DB_MAX_OVERFLOW,
+            "pool_recycle": Config.DB_POOL_RECYCLE,
+            "pool_timeout": Config.DB_POOL_TIMEOUT
+        },
+        "pragmas": {}
+    }
+
+
+def _install_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
 
 
 class DatabaseConnector:
@@ -35,20 +108,21 @@ class DatabaseConnector:
         self.db_url = db_url or Config.DB_URL
         self.engine = None
         self.session_factory = None
+        self.profile = None
         self.echo = echo
         self.initialize()
 
 
     def initialize(self):
         try:
+            self.profile = get_engine_profile(self.db_url)
             self.engine = create_engine(
                 self.db_url,
                 echo=self.echo,
-                pool_pre_ping=True,
-                pool_size=10,
-                max_overflow=20,
-                pool_recycle=3600
+                **self.profile["engine_options"]
             )
+            if self.profile["pragmas"]:
+                _install_sqlite_pragmas(self.engine, self.profile["pragmas"])
             self.session_factory = scoped_session(
                 sessionmaker(
                     bind=self.engine,
@@ -58,14 +132,28 @@ class DatabaseConnector:
                 )
             )
             logger.info(f"Database connection initialized for {self.db_url}")
+            logger.info(
+                f"Engine profile '{self.profile['name']}': "
+                f"pool={self.engine.pool.__class__.__name__}, "
+                f"options={self._loggable_options()}, "
+                f"pragmas={self.profile['pragmas']}"
+            )
         except Exception as e:
             logger.error(f"Failed to initialize database: {str(e)}")
             raise
 
 
+    def _loggable_options(self) -> Dict[str, Any]:
+        return {
+            key: value for key, value in self.profile["engine_options"].items()
+            if key not in ("poolclass", "connect_args")
+        }
+
+
     def create_tables(self):
         try:
             Base.metadata.create_all(self.engine)
+            run_migrations(self.engine)
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Failed to create tables: {str(e)}")
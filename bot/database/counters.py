@@ -0,0 +1,149 @@
+"""
+Инкрементальные счетчики статистики.
+
+Счетчики обновляются в той же транзакции, что и запись пользователей,
+обращений и блокировок, поэтому статистика читается без COUNT(*) по
+базовым таблицам. Приращение - один upsert (INSERT ... ON CONFLICT DO
+UPDATE), поэтому параллельные транзакции не создают строку счетчика дважды.
+
+При расхождении счетчики пересчитываются при запуске с
+RECONCILE_COUNTERS=1 или командой администратора /reconcile.
+"""
+import logging
+
+from typing import Any, Dict, Iterable, Tuple
+from sqlalchemy import Table, bindparam, case, delete, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from .models import User, Ticket, Counter, UserCounter
+
+
+logger = logging.getLogger(__name__)
+
+
+GLOBAL_COUNTERS = ("total_users", "banned_users", "total_tickets", "open_tickets")
+
+
+def _add(db: Session, table: Table, key: Dict[str, Any], deltas: Dict[str, int]) -> None:
+    """
+    Прибавление deltas к строке table с ключом key; строка создается, если ее нет.
+    """
+    row = {**key, **deltas}
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(table).values(row)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={name: table.c[name] + statement.excluded[name] for name in deltas}
+        ))
+    elif dialect in ("mysql", "mariadb"):
+        statement = mysql_insert(table).values(row)
+        db.execute(statement.on_duplicate_key_update(
+            {name: table.c[name] + statement.inserted[name] for name in deltas}
+        ))
+    else:
+        # СУБД без upsert: UPDATE, затем INSERT, если строки еще нет
+        result = db.execute(
+            update(table)
+            .where(*[table.c[name] == value for name, value in key.items()])
+            .values({name: table.c[name] + delta for name, delta in deltas.items()})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(row))
+
+
+def increment(db: Session, name: str, delta: int = 1) -> None:
+    if not delta:
+        return
+    _add(db, Counter.__table__, {"name": name}, {"value": delta})
+
+
+def increment_user(db: Session, user_id: int, total_delta: int = 0, open_delta: int = 0) -> None:
+    if not total_delta and not open_delta:
+        return
+    _add(
+        db,
+        UserCounter.__table__,
+        {"user_id": user_id},
+        {"total_tickets": total_delta, "open_tickets": open_delta}
+    )
+
+
+def apply_open_deltas(db: Session, open_deltas: Iterable[Tuple[int, int]]) -> None:
+    """
+    Изменение числа открытых обращений сразу у нескольких пользователей:
+    один executemany по user_counters и один UPDATE глобального счетчика.
+
+    :param open_deltas: Пары (user_id, изменение числа открытых обращений)
+    """
+    rows = [
+        {"target_user_id": user_id, "delta": delta}
+        for user_id, delta in open_deltas if delta
+    ]
+    if not rows:
+        return
+
+    user_counters = UserCounter.__table__
+    db.execute(
+        update(user_counters)
+        .where(user_counters.c.user_id == bindparam("target_user_id"))
+        .values(open_tickets=user_counters.c.open_tickets + bindparam("delta")),
+        rows
+    )
+    increment(db, "open_tickets", sum(row["delta"] for row in rows))
+
+
+def get_global_counters(db: Session) -> Dict[str, int]:
+    values = dict(db.execute(select(Counter.name, Counter.value)).all())
+    return {name: values.get(name, 0) for name in GLOBAL_COUNTERS}
+
+
+def get_user_counters(db: Session, user_id: int) -> Dict[str, int]:
+    counter = db.get(UserCounter, user_id)
+    total = counter.total_tickets if counter else 0
+    open_ = counter.open_tickets if counter else 0
+    return {
+        "total_tickets": total,
+        "open_tickets": open_,
+        "closed_tickets": total - open_
+    }
+
+
+def reconcile(db: Session) -> Dict[str, int]:
+    """
+    Пересчет всех счетчиков по базовым таблицам.
+
+    :return: Пересчитанные глобальные счетчики
+    """
+    db.execute(delete(UserCounter))
+    db.execute(
+        insert(UserCounter).from_select(
+            ["user_id", "total_tickets", "open_tickets"],
+            select(
+                Ticket.user_id,
+                func.count(Ticket.id),
+                func.sum(case((Ticket.status == "open", 1), else_=0))
+            ).group_by(Ticket.user_id)
+        )
+    )
+
+    values = {
+        "total_users": db.scalar(select(func.count(User.id))),
+        "banned_users": db.scalar(select(func.count(User.id)).where(User.is_banned == True)),
+        "total_tickets": db.scalar(select(func.count(Ticket.id))),
+        "open_tickets": db.scalar(select(func.count(Ticket.id)).where(Ticket.status == "open"))
+    }
+    db.execute(delete(Counter))
+    db.execute(insert(Counter), [
+        {"name": name, "value": value} for name, value in values.items()
+    ])
+
+    logger.info(f"Counters reconciled: {values}")
+    return values
+
+
+def needs_reconcile(db: Session) -> bool:
+    return db.scalar(select(func.count()).select_from(Counter)) == 0
+
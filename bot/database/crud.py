@@ -1,6 +1,11 @@
-from typing import Optional, List, Dict, Any
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from sqlalchemy import update, insert, func, tuple_
+from sqlalchemy.orm import Session, Query
 from .models import User, Ticket, AdminLog
+from . import counters
+from . import connector
+from .cache import UserRecord, user_cache, invalidate_users
 from .connector import SessionLocal
 from bot.config import Config
 
@@ -13,6 +18,53 @@ class CRUD:
     @staticmethod 
     def get_user(db: Session, chat_id: int) -> Optional[User]:
         return db.query(User).filter(User.chat_id == chat_id).first()
+
+
+    @staticmethod
+    def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
+        return db.get(User, user_id)
+
+
+    @staticmethod
+    def get_cached_user(db: Optional[Session], chat_id: int) -> Optional[UserRecord]:
+        """
+        Снимок пользователя из кэша процесса; при промахе читается из БД.
+        Если сессия не передана, она открывается только при промахе.
+        """
+        record = user_cache.get_by_chat_id(chat_id)
+        if record is not None:
+            return record
+
+        if db is None:
+            with connector.db_connector.session_scope() as session:
+                return CRUD.get_cached_user(session, chat_id)
+
+        generation = user_cache.generation()
+        user = CRUD.get_user(db, chat_id)
+        if not user:
+            return None
+        record = UserRecord.from_model(user)
+        user_cache.put(record, generation)
+        return record
+
+
+    @staticmethod
+    def get_cached_user_by_id(db: Optional[Session], user_id: int) -> Optional[UserRecord]:
+        record = user_cache.get_by_id(user_id)
+        if record is not None:
+            return record
+
+        if db is None:
+            with connector.db_connector.session_scope() as session:
+                return CRUD.get_cached_user_by_id(session, user_id)
+
+        generation = user_cache.generation()
+        user = CRUD.get_user_by_id(db, user_id)
+        if not user:
+            return None
+        record = UserRecord.from_model(user)
+        user_cache.put(record, generation)
+        return record
     
     
     @staticmethod
@@ -33,6 +85,8 @@ class CRUD:
             language=language
         )
         db.add(db_user)
+        counters.increment(db, "total_users")
+        invalidate_users(db, chat_ids=[chat_id])
         db.commit()
         db.refresh(db_user)
         return db_user
@@ -42,13 +96,43 @@ class CRUD:
     def update_user(db: Session, chat_id: int, update_data: Dict[str, Any]) -> Optional[User]:
         user = db.query(User).filter(User.chat_id == chat_id).first()
         if user:
+            if "is_banned" in update_data and bool(update_data["is_banned"]) != user.is_banned:
+                counters.increment(db, "banned_users", 1 if update_data["is_banned"] else -1)
             for key, value in update_data.items():
                 setattr(user, key, value)
+            invalidate_users(db, chat_ids=[chat_id])
             db.commit()
             db.refresh(user)
         return user
     
 
+    @staticmethod
+    def bulk_update_users(db: Session, user_ids: Iterable[int], update_data: Dict[str, Any]) -> int:
+        """
+        Обновление пользователей по списку ID одним UPDATE без коммита и refresh.
+        Коммит выполняет вызывающий (session_scope).
+
+        :return: Количество обновленных строк
+        """
+        user_ids = list(user_ids)
+        if not user_ids or not update_data:
+            return 0
+        if "is_banned" in update_data:
+            is_banned = bool(update_data["is_banned"])
+            changed = db.query(func.count(User.id)).filter(
+                User.id.in_(user_ids),
+                User.is_banned != is_banned
+            ).scalar()
+            counters.increment(db, "banned_users", changed if is_banned else -changed)
+        result = db.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(**update_data)
+        )
+        invalidate_users(db, user_ids=user_ids)
+        return result.rowcount
+
+
     @staticmethod
     def ban_user(db: Session, chat_id: int) -> Optional[User]:
         return CRUD.update_user(db, chat_id, {"is_banned": True})
@@ -67,11 +151,29 @@ class CRUD:
             status="open"
         )
         db.add(db_ticket)
+        counters.increment(db, "total_tickets")
+        counters.increment(db, "open_tickets")
+        counters.increment_user(db, user_id, total_delta=1, open_delta=1)
         db.commit()
         db.refresh(db_ticket)
         return db_ticket
 
 
+    @staticmethod
+    def append_to_ticket(db: Session, ticket_id: int, message: str, separator: str = "\n\n") -> bool:
+        """
+        Дописывание текста в открытое обращение одним UPDATE без чтения строки.
+
+        :return: False, если обращение уже закрыто
+        """
+        result = db.execute(
+            update(Ticket)
+            .where(Ticket.id == ticket_id, Ticket.status == "open")
+            .values(message=Ticket.message + separator + message, updated_at=func.now())
+        )
+        return result.rowcount > 0
+
+
     @staticmethod
     def get_ticket(db: Session, ticket_id: int) -> Optional[Ticket]:
         return db.query(Ticket).filter(Ticket.id == ticket_id).first()
@@ -90,10 +192,90 @@ class CRUD:
         return db.query(Ticket).filter(Ticket.status == "open").order_by(Ticket.created_at).all()
     
 
+    @staticmethod
+    def _keyset_page(query: Query, cursor: Optional[Tuple[datetime, int]], limit: int,
+                     descending: bool, backward: bool) -> Dict[str, Any]:
+        """
+        Страница обращений по курсору (created_at, id).
+
+        Выполняется один запрос с LIMIT limit + 1 по индексу, без OFFSET.
+
+        :param cursor: Ключ граничной записи предыдущей страницы
+        :param descending: Порядок отображения списка
+        :param backward: Листать назад (к началу списка)
+        :return: Словарь items, next_cursor, prev_cursor
+        """
+        key = tuple_(Ticket.created_at, Ticket.id)
+        scan_descending = descending != backward
+
+        if cursor:
+            query = query.filter(key < cursor if scan_descending else key > cursor)
+        if scan_descending:
+            query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc())
+        else:
+            query = query.order_by(Ticket.created_at.asc(), Ticket.id.asc())
+
+        items = query.limit(limit + 1).all()
+        has_more = len(items) > limit
+        items = items[:limit]
+        if backward:
+            items.reverse()
+
+        has_next = cursor is not None if backward else has_more
+        has_prev = has_more if backward else cursor is not None
+        return {
+            "items": items,
+            "next_cursor": (items[-1].created_at, items[-1].id) if items and has_next else None,
+            "prev_cursor": (items[0].created_at, items[0].id) if items and has_prev else None
+        }
+
+
+    @staticmethod
+    def _ticket_preview_query(db: Session, preview_length: int) -> Query:
+        """
+        Проекция обращения для списков: без полного текста и ответа,
+        превью вычисляется в SQL через substr.
+        """
+        return db.query(
+            Ticket.id,
+            Ticket.user_id,
+            Ticket.status,
+            Ticket.created_at,
+            func.substr(Ticket.message, 1, preview_length).label("preview")
+        )
+
+
+    @staticmethod
+    def get_user_ticket_previews(db: Session, user_id: int, cursor: Optional[Tuple[datetime, int]] = None,
+                                 limit: int = 10, backward: bool = False,
+                                 preview_length: int = 50) -> Dict[str, Any]:
+        """
+        Страница обращений пользователя в виде строк (id, user_id, status, created_at, preview).
+        """
+        query = CRUD._ticket_preview_query(db, preview_length).filter(Ticket.user_id == user_id)
+        return CRUD._keyset_page(query, cursor, limit, descending=True, backward=backward)
+
+
+    @staticmethod
+    def get_open_ticket_previews(db: Session, cursor: Optional[Tuple[datetime, int]] = None,
+                                 limit: int = 10, backward: bool = False,
+                                 preview_length: int = 50) -> Dict[str, Any]:
+        """
+        Страница открытых обращений в виде строк (id, user_id, status, created_at, preview).
+        """
+        query = CRUD._ticket_preview_query(db, preview_length).filter(Ticket.status == "open")
+        return CRUD._keyset_page(query, cursor, limit, descending=False, backward=backward)
+    
+
     @staticmethod
     def update_ticket(db: Session, ticket_id: int, update_data: Dict[str, Any]) -> Optional[Ticket]:
         ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
         if ticket:
+            if "status" in update_data:
+                was_open = ticket.status == "open"
+                is_open = update_data["status"] == "open"
+                if was_open != is_open:
+                    counters.apply_open_deltas(db, [(ticket.user_id, 1 if is_open else -1)])
             for key, value in update_data.items():
                 setattr(ticket, key, value)
             db.commit()
@@ -101,6 +283,61 @@ class CRUD:
         return ticket
     
 
+    @staticmethod
+    def bulk_update_tickets(db: Session, ticket_ids: Iterable[int], update_data: Dict[str, Any],
+                            only_status: Optional[str] = None) -> int:
+        """
+        Обновление обращений по списку ID одним UPDATE без коммита и refresh.
+
+        :param only_status: Обновлять только обращения с этим статусом
+        :return: Количество обновленных строк
+        """
+        ticket_ids = list(ticket_ids)
+        if not ticket_ids or not update_data:
+            return 0
+        stmt = update(Ticket).where(Ticket.id.in_(ticket_ids))
+        if only_status:
+            stmt = stmt.where(Ticket.status == only_status)
+        if "status" in update_data:
+            CRUD._track_open_transitions(db, stmt.whereclause, update_data["status"] == "open")
+        result = db.execute(stmt.values(**update_data))
+        return result.rowcount
+
+
+    @staticmethod
+    def close_user_tickets(db: Session, user_id: int, admin_id: Optional[int] = None) -> int:
+        """
+        Закрытие всех открытых обращений пользователя одним UPDATE ... WHERE.
+
+        :return: Количество закрытых обращений
+        """
+        update_data = {"status": "closed"}
+        if admin_id:
+            update_data["admin_id"] = admin_id
+        result = db.execute(
+            update(Ticket)
+            .where(Ticket.user_id == user_id, Ticket.status == "open")
+            .values(**update_data)
+        )
+        counters.apply_open_deltas(db, [(user_id, -result.rowcount)])
+        return result.rowcount
+
+
+    @staticmethod
+    def _track_open_transitions(db: Session, whereclause, becomes_open: bool) -> None:
+        """
+        Учет в счетчиках обращений, которые меняют статус open <-> не open
+        в результате массового UPDATE. Выполняется до самого UPDATE.
+        """
+        status_filter = Ticket.status != "open" if becomes_open else Ticket.status == "open"
+        rows = db.query(Ticket.user_id, func.count(Ticket.id)).filter(
+            whereclause,
+            status_filter
+        ).group_by(Ticket.user_id).all()
+        sign = 1 if becomes_open else -1
+        counters.apply_open_deltas(db, [(user_id, sign * count) for user_id, count in rows])
+
+
     @staticmethod
     def close_ticket(db: Session, ticket_id: int, admin_id: Optional[int] = None) -> Optional[Ticket]:
         update_data = {"status": "closed"}
@@ -132,6 +369,29 @@ class CRUD:
         return db_log
 
 
+    @staticmethod
+    def bulk_log_admin_actions(db: Session, entries: List[Dict[str, Any]]) -> int:
+        """
+        Запись нескольких действий администраторов одним executemany.
+
+        :param entries: Словари с ключами admin_id, action, target_user_id, details
+        :return: Количество записанных строк
+        """
+        if not entries:
+            return 0
+        rows = [
+            {
+                "admin_id": entry["admin_id"],
+                "action": entry["action"],
+                "target_user_id": entry["target_user_id"],
+                "details": entry.get("details")
+            }
+            for entry in entries
+        ]
+        db.execute(insert(AdminLog), rows)
+        return len(rows)
+
+
     @staticmethod
     def get_admin_logs(db: Session, admin_id: Optional[int] = None, 
                       limit: int = 100) -> List[AdminLog]:
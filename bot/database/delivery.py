@@ -0,0 +1,160 @@
+"""
+Журнал доставки сообщений по чатам.
+
+Отказ 403 (бот заблокирован, аккаунт удален) помечает чат недоступным, не
+затрагивая User.is_banned: блокировка администратором и недоступность чата
+учитываются раздельно. Рассылки и уведомления исключают недоступные чаты
+в самом запросе получателей. Флаг снимается после успешной доставки или
+когда пользователь снова пишет боту.
+
+Результаты отправки пачки записываются одним executemany на группу;
+недостающие строки журнала создаются INSERT без конфликта ключа (или
+по одной в точках сохранения, если СУБД не поддерживает INSERT-or-ignore).
+"""
+import logging
+
+from typing import Dict, Iterable, List
+from sqlalchemy import and_, bindparam, exists, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import ChatDelivery
+
+
+logger = logging.getLogger(__name__)
+
+
+def reachable(chat_id_column):
+    """
+    Условие для запросов получателей: чат не помечен недоступным.
+
+    :param chat_id_column: Колонка с chat_id, например User.chat_id
+    """
+    return ~exists().where(and_(
+        ChatDelivery.chat_id == chat_id_column,
+        ChatDelivery.unreachable == True
+    ))
+
+
+def filter_reachable(db: Session, chat_ids: Iterable[int]) -> List[int]:
+    """
+    Исключение недоступных чатов из списка с сохранением порядка.
+    """
+    chat_ids = list(chat_ids)
+    if not chat_ids:
+        return []
+    unreachable = set(db.scalars(
+        select(ChatDelivery.chat_id).where(
+            ChatDelivery.chat_id.in_(chat_ids),
+            ChatDelivery.unreachable == True
+        )
+    ))
+    return [chat_id for chat_id in chat_ids if chat_id not in unreachable]
+
+
+def _insert_missing(db: Session, table, chat_ids: Iterable[int]) -> None:
+    """
+    Создание недостающих строк журнала. Строки, вставленные параллельной
+    пачкой, пропускаются и не приводят к IntegrityError.
+    """
+    rows = [{"chat_id": chat_id, "failure_count": 0, "unreachable": False} for chat_id in chat_ids]
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        statement = sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.chat_id])
+    elif dialect == "postgresql":
+        statement = postgresql_insert(table).on_conflict_do_nothing(index_elements=[table.c.chat_id])
+    elif dialect in ("mysql", "mariadb"):
+        statement = insert(table).prefix_with("IGNORE")
+    else:
+        # СУБД без INSERT-or-ignore: вставляются только отсутствующие строки,
+        # каждая в своей точке сохранения на случай параллельной вставки
+        existing = set(db.scalars(
+            select(table.c.chat_id).where(table.c.chat_id.in_([row["chat_id"] for row in rows]))
+        ))
+        for row in rows:
+            if row["chat_id"] in existing:
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table), row)
+            except IntegrityError:
+                pass
+        return
+    db.execute(statement, rows)
+
+
+def record_results(
+    db: Session,
+    delivered: Iterable[int] = (),
+    failed: Dict[int, int] = None,
+    unreachable: Iterable[int] = ()
+) -> None:
+    """
+    Запись результатов отправки пачки сообщений.
+
+    :param delivered: chat_id с успешной доставкой
+    :param failed: chat_id -> код ошибки Telegram API
+    :param unreachable: chat_id из failed, которые больше не принимают сообщения
+    """
+    delivered = set(delivered)
+    failed = dict(failed or {})
+    unreachable = set(unreachable) & set(failed)
+    chat_ids = delivered | set(failed)
+    if not chat_ids:
+        return
+
+    table = ChatDelivery.__table__
+    _insert_missing(db, table, chat_ids)
+
+    if delivered:
+        db.execute(
+            update(table)
+            .where(table.c.chat_id == bindparam("target_chat_id"))
+            .values(last_success_at=func.now(), failure_count=0, unreachable=False),
+            [{"target_chat_id": chat_id} for chat_id in delivered]
+        )
+
+    for chat_ids_group, values in (
+        (unreachable, {"unreachable": True}),
+        (set(failed) - unreachable, {}),
+    ):
+        if not chat_ids_group:
+            continue
+        db.execute(
+            update(table)
+            .where(table.c.chat_id == bindparam("target_chat_id"))
+            .values(
+                last_failure_at=func.now(),
+                last_error_code=bindparam("error_code"),
+                failure_count=table.c.failure_count + 1,
+                **values
+            ),
+            [
+                {"target_chat_id": chat_id, "error_code": failed[chat_id]}
+                for chat_id in chat_ids_group
+            ]
+        )
+
+    if unreachable:
+        logger.info(f"Marked {len(unreachable)} chats as unreachable")
+
+
+def mark_reachable(db: Session, chat_id: int) -> bool:
+    """
+    Снятие флага недоступности, когда пользователь снова пишет боту.
+
+    :return: True, если флаг был установлен
+    """
+    result = db.execute(
+        update(ChatDelivery)
+        .where(ChatDelivery.chat_id == chat_id, ChatDelivery.unreachable == True)
+        .values(unreachable=False, failure_count=0)
+    )
+    return result.rowcount > 0
+
+
+def count_unreachable(db: Session) -> int:
+    return db.scalar(
+        select(func.count()).select_from(ChatDelivery).where(ChatDelivery.unreachable == True)
+    )
@@ -0,0 +1,149 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from bot.config import Config
+from .models import Base
+from . import counters
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_missing_indexes(engine: Engine) -> int:
+    """
+    Создание индексов, объявленных в моделях, на уже существующих таблицах.
+
+    Base.metadata.create_all строит индексы только вместе с новой таблицей,
+    поэтому старый tickets.db остается без них. Функция идемпотентна и
+    может вызываться при каждом запуске.
+
+    :param engine: Движок SQLAlchemy
+    :return: Количество созданных индексов
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = 0
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing_indexes = {
+                index['name'] for index in inspector.get_indexes(table.name)
+            }
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                logger.info(f"Creating index {index.name} on {table.name}")
+                index.create(connection)
+                created += 1
+
+        if created and engine.dialect.name == 'sqlite':
+            connection.execute(text("ANALYZE"))
+
+    return created
+
+
+FTS_SCHEMA = {
+    "users_fts": {
+        "table": "users",
+        "columns": ("username", "first_name", "last_name")
+    },
+    "tickets_fts": {
+        "table": "tickets",
+        "columns": ("message", "response")
+    }
+}
+
+
+def _fts_statements(fts_name: str, table: str, columns) -> list:
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts_name}({fts_name}, rowid, {cols}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {fts_name}(rowid, {cols}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ai AFTER INSERT ON {table} BEGIN "
+        f"{insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_ad AFTER DELETE ON {table} BEGIN "
+        f"{delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_name}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"{delete_old} {insert_new} END",
+    ]
+
+
+def create_fts_indexes(engine: Engine) -> int:
+    """
+    Создание FTS5-индексов по пользователям и обращениям (только SQLite).
+
+    Индексы используют таблицы users и tickets как внешний контент и
+    синхронизируются триггерами. Новый индекс заполняется командой rebuild.
+
+    :return: Количество созданных FTS-индексов
+    """
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    existing_tables = set(inspect(engine).get_table_names())
+    created = 0
+
+    with engine.begin() as connection:
+        for fts_name, schema in FTS_SCHEMA.items():
+            if schema["table"] not in existing_tables:
+                continue
+
+            if fts_name not in existing_tables:
+                try:
+                    connection.execute(text(
+                        f"CREATE VIRTUAL TABLE {fts_name} USING fts5("
+                        f"{', '.join(schema['columns'])}, "
+                        f"content='{schema['table']}', content_rowid='id', "
+                        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                    ))
+                except OperationalError as e:
+                    logger.warning(f"FTS5 is not available, full-text search disabled: {e}")
+                    return created
+                connection.execute(text(f"INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild')"))
+                logger.info(f"Created full-text index {fts_name}")
+                created += 1
+
+            for statement in _fts_statements(fts_name, schema["table"], schema["columns"]):
+                connection.execute(text(statement))
+
+    return created
+
+
+def backfill_counters(engine: Engine, force: bool = False) -> bool:
+    """
+    Заполнение таблиц счетчиков для базы, созданной до их появления.
+
+    :param force: Пересчитать счетчики, даже если они уже заполнены
+    :return: True, если счетчики были пересчитаны
+    """
+    with Session(engine) as session:
+        if not force and not counters.needs_reconcile(session):
+            return False
+        counters.reconcile(session)
+        session.commit()
+    return True
+
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Применение всех шагов миграции к существующей базе данных.
+    """
+    created = create_missing_indexes(engine)
+    created += create_fts_indexes(engine)
+    if backfill_counters(engine, force=Config.RECONCILE_COUNTERS):
+        logger.info("Counters backfilled from base tables")
+    if created:
+        logger.info(f"Migrations applied: {created} indexes created")
+    else:
+        logger.info("Database schema is up to date")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, func
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, Index, JSON, func
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from bot.config import Config
 
@@ -6,6 +7,18 @@ from bot.config import Config
 Base = declarative_base()
 
 
+# В SQLite server_default=func.now() сохраняет время без микросекунд.
+# Параметры запросов приводятся к тому же формату, иначе строковое сравнение
+# в keyset-пагинации по created_at расходится с сохраненными значениями.
+Timestamp = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d "
+                       "%(hour)02d:%(minute)02d:%(second)02d"
+    ),
+    "sqlite"
+)
+
+
 class User(Base):
     """
     Модель пользователя Telegram
@@ -29,8 +42,8 @@ class User(Base):
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=True)
     is_banned = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
     language = Column(String(2), default=Config.DEFAULT_LANGUAGE)
 
     def __repr__(self):
@@ -50,8 +63,15 @@ class Ticket(Base):
         response (str): Текст ответа администратора (опционально)
         created_at (DateTime): Время создания обращения
         updated_at (DateTime): Время последнего обновления
+
+    Индексы повторяют фильтры и сортировки get_user_tickets и get_open_tickets.
     """
     __tablename__ = 'tickets'
+    __table_args__ = (
+        Index('ix_tickets_user_status_created', 'user_id', 'status', 'created_at'),
+        Index('ix_tickets_user_created', 'user_id', 'created_at'),
+        Index('ix_tickets_status_created', 'status', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, nullable=False)  # Можно сделать ForeignKey в продакшене
@@ -59,8 +79,8 @@ class Ticket(Base):
     status = Column(String(20), default='open', nullable=False)
     admin_id = Column(Integer, nullable=True)
     response = Column(Text, nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
         return f"<Ticket(id={self.id}, status={self.status}, user_id={self.user_id})>"
@@ -77,15 +97,160 @@ class AdminLog(Base):
         target_user_id (int): ID целевого пользователя
         details (str): Дополнительная информация
         created_at (DateTime): Время действия
+
+    Индексы повторяют фильтры и сортировку get_admin_logs.
     """
     __tablename__ = 'admin_logs'
+    __table_args__ = (
+        Index('ix_admin_logs_admin_created', 'admin_id', 'created_at'),
+        Index('ix_admin_logs_created', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     admin_id = Column(Integer, nullable=False)
     action = Column(String(50), nullable=False)
     target_user_id = Column(Integer, nullable=False)
     details = Column(Text, nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
 
     def __repr__(self):
         return f"<AdminLog(admin={self.admin_id}, action={self.action})>"
+
+
+class Counter(Base):
+    """
+    Глобальный счетчик статистики системы
+
+    Атрибуты:
+        name (str): Имя счетчика ('total_users', 'banned_users', 'total_tickets', 'open_tickets')
+        value (int): Текущее значение
+    """
+    __tablename__ = 'counters'
+
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<Counter({self.name}={self.value})>"
+
+
+class UserCounter(Base):
+    """
+    Счетчики обращений пользователя
+
+    Атрибуты:
+        user_id (int): ID пользователя
+        total_tickets (int): Всего обращений
+        open_tickets (int): Открытых обращений
+    """
+    __tablename__ = 'user_counters'
+
+    user_id = Column(Integer, primary_key=True)
+    total_tickets = Column(Integer, default=0, nullable=False)
+    open_tickets = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<UserCounter(user_id={self.user_id}, total={self.total_tickets}, open={self.open_tickets})>"
+
+
+class DialogState(Base):
+    """
+    Состояние диалога администратора (FSM), общее для всех процессов бота
+
+    Атрибуты:
+        user_id (int): Telegram ID пользователя
+        state (dict): Данные состояния ('action', 'ticket_id', ...)
+        expires_at (int): Время истечения (Unix time, секунды)
+    """
+    __tablename__ = 'dialog_states'
+    __table_args__ = (
+        Index('ix_dialog_states_expires_at', 'expires_at'),
+    )
+
+    user_id = Column(Integer, primary_key=True)
+    state = Column(JSON, nullable=False)
+    expires_at = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<DialogState(user_id={self.user_id}, state={self.state})>"
+
+
+class UserStrike(Base):
+    """
+    Нарушения ограничения входящих сообщений, общие для всех процессов бота
+
+    Атрибуты:
+        user_id (int): Telegram ID пользователя
+        strikes (int): Число нарушений
+        muted_until (int): Конец временного отключения (Unix time, секунды)
+        updated_at (int): Время последнего нарушения (Unix time, секунды)
+    """
+    __tablename__ = 'user_strikes'
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    strikes = Column(Integer, default=0, nullable=False)
+    muted_until = Column(Integer, default=0, nullable=False)
+    updated_at = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<UserStrike(user_id={self.user_id}, strikes={self.strikes})>"
+
+
+class BroadcastJob(Base):
+    """
+    Задание рассылки с контрольной точкой для продолжения после перезапуска
+
+    Атрибуты:
+        id (int): Первичный ключ
+        text (str): Текст рассылки
+        target_filter (str): Получатели ('all' или 'lang:<код>')
+        status (str): Статус ('pending', 'running', 'paused', 'done', 'cancelled')
+        cursor (int): ID последнего пользователя, переданного на отправку
+        success (int): Доставлено
+        failed (int): Ошибок
+        blocked (int): Пользователь заблокировал бота
+        created_by (int): ID администратора
+        created_at (DateTime): Время создания
+        updated_at (DateTime): Время последней контрольной точки
+    """
+    __tablename__ = 'broadcast_jobs'
+
+    id = Column(Integer, primary_key=True)
+    text = Column(Text, nullable=False)
+    target_filter = Column(String(50), default='all', nullable=False)
+    status = Column(String(20), default='pending', nullable=False)
+    cursor = Column(Integer, default=0, nullable=False)
+    success = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    blocked = Column(Integer, default=0, nullable=False)
+    created_by = Column(Integer, nullable=False)
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<BroadcastJob(id={self.id}, status={self.status}, cursor={self.cursor})>"
+
+
+class ChatDelivery(Base):
+    """
+    Состояние доставки сообщений в чат
+
+    Атрибуты:
+        chat_id (int): Идентификатор чата
+        last_success_at (DateTime): Время последней успешной доставки
+        last_failure_at (DateTime): Время последней ошибки доставки
+        last_error_code (int): Код последней ошибки Telegram API
+        failure_count (int): Ошибок подряд с последней успешной доставки
+        unreachable (bool): Чат недоступен (бот заблокирован, аккаунт удален)
+    """
+    __tablename__ = 'chat_delivery'
+
+    chat_id = Column(Integer, primary_key=True, autoincrement=False)
+    last_success_at = Column(Timestamp, nullable=True)
+    last_failure_at = Column(Timestamp, nullable=True)
+    last_error_code = Column(Integer, nullable=True)
+    failure_count = Column(Integer, default=0, nullable=False)
+    unreachable = Column(Boolean, default=False, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<ChatDelivery(chat_id={self.chat_id}, unreachable={self.unreachable})>"
@@ -0,0 +1,107 @@
+"""
+Полнотекстовый поиск по пользователям и обращениям.
+
+В SQLite используются FTS5-индексы users_fts и tickets_fts, которые
+поддерживаются триггерами (см. migrations.create_fts_indexes). Для других
+СУБД и сборок SQLite без FTS5 поиск откатывается на ILIKE.
+"""
+import logging
+import re
+
+from typing import Dict, List, Any
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+from .models import User, Ticket
+
+
+logger = logging.getLogger(__name__)
+
+
+FTS_TABLES = ("users_fts", "tickets_fts")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_fts_available: Dict[str, bool] = {}
+
+
+def is_fts_available(db: Session) -> bool:
+    engine = db.get_bind()
+    key = str(engine.url)
+    if key not in _fts_available:
+        if engine.dialect.name != "sqlite":
+            _fts_available[key] = False
+        else:
+            found = db.execute(
+                text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN (:u, :t)"),
+                {"u": FTS_TABLES[0], "t": FTS_TABLES[1]}
+            ).scalar()
+            _fts_available[key] = found == len(FTS_TABLES)
+    return _fts_available[key]
+
+
+def build_match_query(query: str) -> str:
+    """
+    Преобразование пользовательского ввода в безопасный запрос FTS5:
+    каждое слово экранируется и ищется по префиксу, слова объединяются через AND.
+    """
+    tokens = _TOKEN_RE.findall(query)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_users(db: Session, query: str, limit: int = 10, offset: int = 0) -> List[Any]:
+    """
+    Поиск пользователей по username, first_name и last_name, по релевантности.
+
+    :return: Строки (id, chat_id, username, first_name, last_name, is_banned)
+    """
+    match = build_match_query(query.lstrip('@'))
+    if not match:
+        return []
+
+    if is_fts_available(db):
+        return db.execute(text(
+            "SELECT u.id, u.chat_id, u.username, u.first_name, u.last_name, u.is_banned "
+            "FROM users_fts JOIN users u ON u.id = users_fts.rowid "
+            "WHERE users_fts MATCH :match "
+            "ORDER BY users_fts.rank LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset}).all()
+
+    pattern = f"%{query.strip().lstrip('@')}%"
+    return db.query(
+        User.id, User.chat_id, User.username, User.first_name, User.last_name, User.is_banned
+    ).filter(or_(
+        User.username.ilike(pattern),
+        User.first_name.ilike(pattern),
+        User.last_name.ilike(pattern)
+    )).order_by(User.id).limit(limit).offset(offset).all()
+
+
+def search_tickets(db: Session, query: str, limit: int = 10, offset: int = 0) -> List[Any]:
+    """
+    Поиск обращений по тексту сообщения и ответа, по релевантности.
+
+    :return: Строки (id, user_id, status, created_at, preview)
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if is_fts_available(db):
+        return db.execute(text(
+            "SELECT t.id, t.user_id, t.status, t.created_at, "
+            "snippet(tickets_fts, -1, '', '', '…', 12) AS preview "
+            "FROM tickets_fts JOIN tickets t ON t.id = tickets_fts.rowid "
+            "WHERE tickets_fts MATCH :match "
+            "ORDER BY tickets_fts.rank LIMIT :limit OFFSET :offset"
+        ).columns(created_at=Ticket.created_at.type), {
+            "match": match, "limit": limit, "offset": offset
+        }).all()
+
+    pattern = f"%{query.strip()}%"
+    return db.query(
+        Ticket.id, Ticket.user_id, Ticket.status, Ticket.created_at,
+        Ticket.message.label("preview")
+    ).filter(or_(
+        Ticket.message.ilike(pattern),
+        Ticket.response.ilike(pattern)
+    )).order_by(Ticket.id.desc()).limit(limit).offset(offset).all()
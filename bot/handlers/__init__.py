@@ -2,5 +2,7 @@ from .user_handlers import register_user_handlers
 from .admin_handlers import register_admin_handlers
 
 def register_handlers(bot):
-    register_user_handlers(bot)
+    # Админские обработчики регистрируются первыми: пользовательский
+    # handle_text_message принимает любой текст и перехватил бы кнопки админ-панели.
     register_admin_handlers(bot)
+    register_user_handlers(bot)
@@ -1,17 +1,30 @@
+import html
 import logging
 
 from telebot import TeleBot, types
+from bot.database.crud import crud
+from bot.database import search
+from bot.database.cache import user_cache
 from bot.database.connector import db_connector
 from bot.services.admin_actions import AdminActions
-from bot.services.messaging import MessagingService
+from bot.services.broadcast import BroadcastService
+from bot.services.messaging import MessagingService, admin_notification_latency
+from bot.services.state_store import create_state_store
+from bot.services.scheduler import ScheduledTeleBot
+from bot.services.transport import get_transport
+from bot.utils.callbacks import CallbackData, encode_callback, get_router
 from bot.utils.decorators import access_check
 from bot.utils.keyboards import (
     get_admin_main_keyboard,
     get_admin_ticket_keyboard,
     get_cancel_keyboard,
-    get_confirmation_keyboard
+    get_confirmation_keyboard,
+    get_pagination_keyboard,
+    get_offset_pagination_keyboard,
+    remove_ticket_buttons
 )
-from bot.config import BotMessages
+from bot.utils.pagination import decode_cursor
+from bot.config import Config, BotMessages
 
 
 logger = logging.getLogger(__name__)
@@ -20,8 +33,22 @@ logger = logging.getLogger(__name__)
 def register_admin_handlers(bot: TeleBot):
     admin_actions = AdminActions(bot)
     messaging = MessagingService(bot)
+    callbacks = get_router(bot)
+    broadcasts = BroadcastService(bot)
+    bot.broadcasts = broadcasts
 
-    admin_states = {}
+    admin_states = create_state_store()
+    last_searches = {}
+
+
+    def is_admin_in_dialog(user_id: int, action: str = None) -> bool:
+        # Проверка ADMIN_IDS первой: сообщения пользователей не обращаются к хранилищу
+        if user_id not in Config.ADMIN_IDS:
+            return False
+        current_action = admin_states.get_action(user_id)
+        if action is None:
+            return current_action is not None
+        return current_action == action
 
 
     @bot.message_handler(commands=['admin'])
@@ -30,10 +57,98 @@ def register_admin_handlers(bot: TeleBot):
         admin_actions.show_admin_panel(message.from_user.id)
 
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('ban_'))
+    @bot.message_handler(commands=['reconcile'])
+    @access_check(is_admin=True)
+    def handle_reconcile_counters(message: types.Message):
+        stats = admin_actions.reconcile_counters(message.from_user.id)
+        if stats is None:
+            bot.send_message(message.chat.id, "❌ Не удалось пересчитать статистику")
+            return
+
+        bot.send_message(
+            message.chat.id,
+            "🔄 <b>Статистика пересчитана</b>\n\n"
+            f"👥 Пользователей: {stats['total_users']}\n"
+            f"⛔ Заблокировано: {stats['banned_users']}\n"
+            f"📨 Обращений: {stats['total_tickets']}\n"
+            f"🟢 Открытых: {stats['open_tickets']}",
+            reply_markup=get_admin_main_keyboard()
+        )
+
+
+    def format_broadcast_job(job: dict) -> str:
+        return (
+            f"📣 <b>Рассылка #{job['id']}</b> ({job['target_filter']})\n"
+            f"Статус: {job['status']}\n"
+            f"✅ Доставлено: {job['success']}\n"
+            f"🚫 Заблокировали бота: {job['blocked']}\n"
+            f"❌ Ошибок: {job['failed']}"
+        )
+
+
+    @bot.message_handler(commands=['broadcast'])
+    @access_check(is_admin=True)
+    def handle_broadcast_start(message: types.Message):
+        text = message.text.partition(' ')[2].strip()
+        target_filter = "all"
+        if text.startswith("lang:"):
+            target_filter, _, text = text.partition(' ')
+            text = text.strip()
+        if not text:
+            bot.send_message(message.chat.id, "Использование: /broadcast [lang:код] <текст>")
+            return
+
+        job_id = broadcasts.create_job(message.from_user.id, text, target_filter)
+        bot.send_message(
+            message.chat.id,
+            f"📣 Рассылка #{job_id} запущена\n"
+            f"/broadcast_status {job_id} · /broadcast_pause {job_id}"
+        )
+
+
+    @bot.message_handler(commands=['broadcast_status'])
+    @access_check(is_admin=True)
+    def handle_broadcast_status(message: types.Message):
+        arg = message.text.partition(' ')[2].strip()
+        if arg.isdigit():
+            job = broadcasts.get_job(int(arg))
+            jobs = [job] if job else []
+        else:
+            jobs = broadcasts.list_jobs(limit=5)
+
+        if not jobs:
+            bot.send_message(message.chat.id, "Рассылок не найдено")
+            return
+        bot.send_message(message.chat.id, "\n\n".join(format_broadcast_job(job) for job in jobs))
+
+
+    @bot.message_handler(commands=['broadcast_pause', 'broadcast_resume', 'broadcast_cancel'])
     @access_check(is_admin=True)
-    def handle_ban_user(call: types.CallbackQuery):
-        ticket_id = int(call.data.split('_')[1])
+    def handle_broadcast_control(message: types.Message):
+        command, _, arg = message.text.partition(' ')
+        if not arg.strip().isdigit():
+            bot.send_message(message.chat.id, f"Использование: {command} <id>")
+            return
+
+        job_id = int(arg.strip())
+        if command.startswith('/broadcast_pause'):
+            changed = broadcasts.pause_job(job_id)
+        elif command.startswith('/broadcast_resume'):
+            changed = broadcasts.resume_job(job_id)
+        else:
+            changed = broadcasts.cancel_job(job_id)
+
+        job = broadcasts.get_job(job_id)
+        if not changed or not job:
+            bot.send_message(message.chat.id, f"❌ Не удалось изменить рассылку #{job_id}")
+            return
+        bot.send_message(message.chat.id, format_broadcast_job(job))
+
+
+    @callbacks.route('ban')
+    @access_check(is_admin=True)
+    def handle_ban_user(call: types.CallbackQuery, data: CallbackData):
+        ticket_id = data.id
         
         with db_connector.session_scope() as session:
             ticket = crud.get_ticket(session, ticket_id)
@@ -41,11 +156,11 @@ def register_admin_handlers(bot: TeleBot):
                 bot.answer_callback_query(call.id, "Обращение не найдено")
                 return
 
-            admin_states[call.from_user.id] = {
+            admin_states.set(call.from_user.id, {
                 'action': 'ban',
                 'user_id': ticket.user_id,
                 'ticket_id': ticket_id
-            }
+            })
 
             bot.send_message(
                 call.from_user.id,
@@ -55,31 +170,49 @@ def register_admin_handlers(bot: TeleBot):
             bot.answer_callback_query(call.id)
 
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('close_'))
+    @callbacks.route('ban_user')
+    @access_check(is_admin=True)
+    def handle_ban_user_by_id(call: types.CallbackQuery, data: CallbackData):
+        admin_states.set(call.from_user.id, {
+            'action': 'ban',
+            'user_id': data.id,
+            'ticket_id': None
+        })
+
+        bot.send_message(
+            call.from_user.id,
+            f"⚠️ Подтвердите блокировку пользователя ID: {data.id}",
+            reply_markup=get_confirmation_keyboard()
+        )
+        bot.answer_callback_query(call.id)
+
+
+    @callbacks.route('close')
     @access_check(is_admin=True)
-    def handle_close_ticket(call: types.CallbackQuery):
-        ticket_id = int(call.data.split('_')[1])
+    def handle_close_ticket(call: types.CallbackQuery, data: CallbackData):
+        ticket_id = data.id
         
         if admin_actions.close_ticket(call.from_user.id, ticket_id):
+            # В сводке остаются кнопки других обращений
             bot.edit_message_reply_markup(
                 chat_id=call.message.chat.id,
                 message_id=call.message.message_id,
-                reply_markup=None
+                reply_markup=remove_ticket_buttons(call.message.reply_markup, ticket_id)
             )
             bot.answer_callback_query(call.id, "Обращение закрыто")
         else:
             bot.answer_callback_query(call.id, "Ошибка закрытия обращения")
 
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('reply_'))
+    @callbacks.route('reply')
     @access_check(is_admin=True)
-    def handle_reply_to_ticket(call: types.CallbackQuery):
-        ticket_id = int(call.data.split('_')[1])
+    def handle_reply_to_ticket(call: types.CallbackQuery, data: CallbackData):
+        ticket_id = data.id
         
-        admin_states[call.from_user.id] = {
+        admin_states.set(call.from_user.id, {
             'action': 'reply',
             'ticket_id': ticket_id
-        }
+        })
 
         bot.send_message(
             call.from_user.id,
@@ -89,11 +222,10 @@ def register_admin_handlers(bot: TeleBot):
         bot.answer_callback_query(call.id)
 
 
-    @bot.message_handler(func=lambda m: m.text == "❌ Отмена" and m.from_user.id in admin_states)
+    @bot.message_handler(func=lambda m: m.text == "❌ Отмена" and is_admin_in_dialog(m.from_user.id))
     @access_check(is_admin=True)
     def handle_cancel_action(message: types.Message):
-        if message.from_user.id in admin_states:
-            del admin_states[message.from_user.id]
+        admin_states.clear(message.from_user.id)
         bot.send_message(
             message.chat.id,
             "Действие отменено",
@@ -101,40 +233,40 @@ def register_admin_handlers(bot: TeleBot):
         )
 
 
-    @bot.callback_query_handler(func=lambda call: call.data in ['confirm', 'cancel'])
+    @callbacks.route('confirm', 'cancel')
     @access_check(is_admin=True)
-    def handle_confirmation(call: types.CallbackQuery):
-        user_state = admin_states.get(call.from_user.id, {})
+    def handle_confirmation(call: types.CallbackQuery, data: CallbackData):
+        user_state = admin_states.get(call.from_user.id) or {}
         
-        if call.data == 'confirm' and user_state:
+        if data.verb == 'confirm' and user_state:
             if user_state['action'] == 'ban':
-                admin_actions.ban_user(
+                banned = admin_actions.ban_user(
                     admin_id=call.from_user.id,
                     user_id=user_state['user_id'],
-                    reason=f"По обращению #{user_state['ticket_id']}"
+                    reason=f"По обращению #{user_state['ticket_id']}" if user_state.get('ticket_id') else None
                 )
                 bot.send_message(
                     call.from_user.id,
-                    f"Пользователь {user_state['user_id']} заблокирован",
+                    f"Пользователь {user_state['user_id']} заблокирован" if banned
+                    else f"Не удалось заблокировать пользователя {user_state['user_id']}",
                     reply_markup=get_admin_main_keyboard()
                 )
             
-            del admin_states[call.from_user.id]
+            admin_states.clear(call.from_user.id)
         
-        elif call.data == 'cancel':
+        elif data.verb == 'cancel':
             bot.send_message(
                 call.from_user.id,
                 "Действие отменено",
                 reply_markup=get_admin_main_keyboard()
             )
-            if call.from_user.id in admin_states:
-                del admin_states[call.from_user.id]
+            admin_states.clear(call.from_user.id)
         
         bot.answer_callback_query(call.id)
         bot.delete_message(call.message.chat.id, call.message.message_id)
 
 
-    @bot.message_handler(func=lambda m: m.from_user.id in admin_states and admin_states[m.from_user.id]['action'] == 'reply')
+    @bot.message_handler(func=lambda m: is_admin_in_dialog(m.from_user.id, 'reply'))
     @access_check(is_admin=True)
     def handle_admin_reply(message: types.Message):
         user_state = admin_states.get(message.from_user.id)
@@ -142,7 +274,7 @@ def register_admin_handlers(bot: TeleBot):
             return
 
         ticket_id = user_state['ticket_id']
-        del admin_states[message.from_user.id]
+        admin_states.clear(message.from_user.id)
         
         if messaging.reply_to_ticket(ticket_id, message.from_user.id, message.text):
             bot.send_message(
@@ -158,39 +290,110 @@ def register_admin_handlers(bot: TeleBot):
             )
 
 
+    def render_open_tickets_page(page) -> str:
+        response = ["📂 Открытые обращения:"]
+        for ticket in page["items"]:
+            response.append(
+                f"#{ticket.id} от пользователя {ticket.user_id}\n"
+                f"📅 {ticket.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+                f"📝 {html.escape(ticket.preview)}..."
+            )
+        return "\n\n".join(response)
+
+
+    @callbacks.route('ot')
+    @access_check(is_admin=True)
+    def handle_open_tickets_page(call: types.CallbackQuery, data: CallbackData):
+        direction, raw_cursor = data.args
+
+        with db_connector.session_scope() as session:
+            page = crud.get_open_ticket_previews(
+                session,
+                cursor=decode_cursor(raw_cursor),
+                limit=Config.TICKETS_PAGE_SIZE,
+                backward=direction == 'p'
+            )
+            if not page["items"]:
+                bot.answer_callback_query(call.id, "Нет открытых обращений")
+                return
+
+            bot.edit_message_text(
+                render_open_tickets_page(page),
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                reply_markup=get_pagination_keyboard('ot', page["prev_cursor"], page["next_cursor"])
+            )
+        bot.answer_callback_query(call.id)
+
+
     @bot.message_handler(func=lambda m: m.text in ["📊 Статистика", "📨 Все обращения", "👥 Пользователи"])
     @access_check(is_admin=True)
     def handle_admin_commands(message: types.Message):
         if message.text == "📊 Статистика":
             stats = admin_actions.get_system_stats()
+            cache_stats = user_cache.stats()
             response = (
                 "📊 <b>Статистика системы</b>\n\n"
                 f"👥 Пользователей: {stats['total_users']}\n"
                 f"⛔ Заблокировано: {stats['banned_users']}\n"
                 f"📨 Обращений: {stats['total_tickets']}\n"
-                f"🟢 Открытых: {stats['open_tickets']}"
+                f"🟢 Открытых: {stats['open_tickets']}\n\n"
+                f"🧠 Кэш пользователей: {cache_stats['hits']} попаданий / "
+                f"{cache_stats['misses']} промахов ({cache_stats['size']} записей)"
+            )
+            if isinstance(bot, ScheduledTeleBot):
+                send_stats = bot.scheduler.stats()
+                response += (
+                    f"\n📤 Очередь отправки: {send_stats['queue_depth']}, "
+                    f"{send_stats['send_rate']} сообщ./с"
+                )
+            notify_stats = admin_notification_latency.snapshot()
+            response += (
+                f"\n🔔 Уведомления админам: {notify_stats['count']}, "
+                f"p95 {notify_stats['p95']} с, ошибок {notify_stats['failures']}"
             )
+            update_dispatcher = getattr(bot, "update_dispatcher", None)
+            if update_dispatcher:
+                for name, lane in update_dispatcher.stats()["lanes"].items():
+                    busiest = max(lane["shards"], key=lambda shard: shard["depth"])
+                    response += (
+                        f"\n📥 Очередь обновлений ({name}): {lane['queue_depth']} "
+                        f"(макс. в шарде {busiest['depth']}), "
+                        f"ожидание до {lane['oldest_age']} с, "
+                        f"отброшено {lane['dropped']}"
+                    )
+            ingress_limiter = getattr(bot, "ingress_limiter", None)
+            if ingress_limiter:
+                ingress_stats = ingress_limiter.stats()
+                response += (
+                    f"\n🚦 Лимит сообщений: отброшено {ingress_stats['throttled']}, "
+                    f"отключено сейчас {ingress_stats['muted']}, "
+                    f"автоблокировок {ingress_stats['bans']}"
+                )
+            transport = get_transport()
+            if transport:
+                http_stats = transport.stats()
+                connections = http_stats["connections"]
+                send_latency = http_stats["endpoints"].get("sendMessage")
+                response += (
+                    f"\n🌐 HTTP: {connections['requests']} запросов, "
+                    f"{connections['connections']} соединений"
+                )
+                if send_latency:
+                    response += f", sendMessage p95 {send_latency['p95']} с"
             bot.send_message(message.chat.id, response)
         
         elif message.text == "📨 Все обращения":
             with db_connector.session_scope() as session:
-                tickets = crud.get_open_tickets(session)
-                if not tickets:
+                page = crud.get_open_ticket_previews(session, limit=Config.TICKETS_PAGE_SIZE)
+                if not page["items"]:
                     bot.send_message(message.chat.id, "Нет открытых обращений")
                     return
-                
-                response = ["📂 Открытые обращения:"]
-                for ticket in tickets[:10]:
-                    response.append(
-                        f"#{ticket.id} от пользователя {ticket.user_id}\n"
-                        f"📅 {ticket.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-                        f"📝 {ticket.message[:50]}..."
-                    )
-                
+
                 bot.send_message(
                     message.chat.id,
-                    "\n\n".join(response),
-                    reply_markup=get_admin_main_keyboard()
+                    render_open_tickets_page(page),
+                    reply_markup=get_pagination_keyboard('ot', page["prev_cursor"], page["next_cursor"])
                 )
         
         elif message.text == "👥 Пользователи":
@@ -199,10 +402,10 @@ def register_admin_handlers(bot: TeleBot):
                 "Введите ID пользователя или @username для поиска:",
                 reply_markup=get_cancel_keyboard()
             )
-            admin_states[message.from_user.id] = {'action': 'user_search'}
+            admin_states.set(message.from_user.id, {'action': 'user_search'})
 
 
-    @bot.message_handler(func=lambda m: m.from_user.id in admin_states and admin_states[m.from_user.id]['action'] == 'user_search')
+    @bot.message_handler(func=lambda m: is_admin_in_dialog(m.from_user.id, 'user_search'))
     @access_check(is_admin=True)
     def handle_user_search(message: types.Message):
         search_query = message.text.strip()
@@ -225,12 +428,12 @@ def register_admin_handlers(bot: TeleBot):
                     if user.is_banned:
                         keyboard.add(types.InlineKeyboardButton(
                             text="🔓 Разблокировать",
-                            callback_data=f"unban_{user.id}"
+                            callback_data=encode_callback('unban', user.id)
                         ))
                     else:
                         keyboard.add(types.InlineKeyboardButton(
                             text="⛔ Заблокировать",
-                            callback_data=f"ban_{user.id}"
+                            callback_data=encode_callback('ban_user', user.id)
                         ))
                     
                     bot.send_message(
@@ -238,44 +441,94 @@ def register_admin_handlers(bot: TeleBot):
                         response,
                         reply_markup=keyboard
                     )
-                    del admin_states[message.from_user.id]
+                    admin_states.clear(message.from_user.id)
                     return
             except ValueError:
                 pass
-            
-            username = search_query.lstrip('@')
-            users = session.query(crud.User).filter(
-                crud.User.username.ilike(f"%{username}%")
-            ).limit(5).all()
-            
-            if not users:
-                bot.send_message(
-                    message.chat.id,
-                    "Пользователи не найдены",
-                    reply_markup=get_admin_main_keyboard()
+
+        admin_states.clear(message.from_user.id)
+        last_searches[message.from_user.id] = ('u', search_query)
+        send_search_page(message.chat.id, 'u', search_query, 0)
+
+
+    @bot.message_handler(commands=['search'])
+    @access_check(is_admin=True)
+    def handle_ticket_search(message: types.Message):
+        search_query = message.text.partition(' ')[2].strip()
+        if not search_query:
+            bot.send_message(message.chat.id, "Использование: /search <текст>")
+            return
+
+        last_searches[message.from_user.id] = ('t', search_query)
+        send_search_page(message.chat.id, 't', search_query, 0)
+
+
+    @callbacks.route('sr')
+    @access_check(is_admin=True)
+    def handle_search_page(call: types.CallbackQuery, data: CallbackData):
+        kind = data.args[0]
+        last_search = last_searches.get(call.from_user.id)
+        if not last_search or last_search[0] != kind:
+            bot.answer_callback_query(call.id, "Поиск устарел, повторите запрос")
+            return
+
+        send_search_page(
+            call.message.chat.id,
+            kind,
+            last_search[1],
+            data.id,
+            message_id=call.message.message_id
+        )
+        bot.answer_callback_query(call.id)
+
+
+    def send_search_page(chat_id: int, kind: str, search_query: str, offset: int, message_id: int = None):
+        limit = Config.SEARCH_PAGE_SIZE
+        with db_connector.session_scope() as session:
+            if kind == 'u':
+                rows = search.search_users(session, search_query, limit=limit + 1, offset=offset)
+            else:
+                rows = search.search_tickets(session, search_query, limit=limit + 1, offset=offset)
+
+        if not rows:
+            bot.send_message(
+                chat_id,
+                "Пользователи не найдены" if kind == 'u' else "Обращения не найдены",
+                reply_markup=get_admin_main_keyboard()
+            )
+            return
+
+        response = ["🔍 Результаты поиска:"]
+        for row in rows[:limit]:
+            if kind == 'u':
+                response.append(
+                    f"ID: {row.id} | @{html.escape(row.username or 'нет')}\n"
+                    f"{html.escape(row.first_name or '')} | "
+                    f"{'⛔' if row.is_banned else '🟢'}"
                 )
-                return
-            
-            response = ["🔍 Результаты поиска:"]
-            for user in users:
+            else:
                 response.append(
-                    f"ID: {user.id} | @{user.username or 'нет'}\n"
-                    f"{user.first_name} | "
-                    f"{'⛔' if user.is_banned else '🟢'}"
+                    f"{'🟢' if row.status == 'open' else '🔒'} #{row.id} от пользователя {row.user_id}\n"
+                    f"📅 {row.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+                    f"📝 {html.escape(row.preview[:100])}"
                 )
-            
-            bot.send_message(
-                message.chat.id,
+
+        keyboard = get_offset_pagination_keyboard('sr', offset, limit, len(rows) > limit, kind)
+        if message_id:
+            bot.edit_message_text(
                 "\n\n".join(response),
-                reply_markup=get_admin_main_keyboard()
+                chat_id=chat_id,
+                message_id=message_id,
+                reply_markup=keyboard
             )
-        del admin_states[message.from_user.id]
+        else:
+            bot.send_message(chat_id, "\n\n".join(response), reply_markup=keyboard)
 
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('unban_'))
+    @callbacks.route('unban')
     @access_check(is_admin=True)
-    def handle_unban_user(call: types.CallbackQuery):
-        user_id = int(call.data.split('_')[1])
+    def handle_unban_user(call: types.CallbackQuery, data: CallbackData):
+        user_id = data.id
         if admin_actions.unban_user(call.from_user.id, user_id):
             bot.answer_callback_query(call.id, "Пользователь разблокирован")
             bot.edit_message_reply_markup(
@@ -1,33 +1,62 @@
+import functools
+import html
 import logging
+import math
 
 from telebot import TeleBot, types
 from bot.database.crud import crud
+from bot.database import delivery
 from bot.database.connector import db_connector
+from bot.services import ingress
+from bot.services.admin_actions import AdminActions
+from bot.services.digest import NotificationDigest
+from bot.services.followups import FollowUpTracker
+from bot.services.messaging import MessagingService
+from bot.utils.callbacks import CallbackData, encode_callback, get_router
 from bot.utils.decorators import log_message
-from bot.utils.keyboards import get_language_keyboard, get_main_menu_keyboard
+from bot.utils.keyboards import get_language_keyboard, get_main_menu_keyboard, get_pagination_keyboard
+from bot.utils.pagination import decode_cursor
 from bot.config import Config, BotMessages, Languages
 
 
 logger = logging.getLogger(__name__)
 
 
+NOTIFICATION_TEXT_LIMIT = 3500  # из 4096 символов сообщения, остальное - шаблон
+
+
 def register_user_handlers(bot: TeleBot):
+    messaging = MessagingService(bot)
+    admin_digest = NotificationDigest.from_config(messaging)
+    followups = FollowUpTracker(messaging, admin_digest, window=Config.TICKET_APPEND_WINDOW)
+    callbacks = get_router(bot)
+    admin_actions = AdminActions(bot)
+    limiter = ingress.IngressLimiter.from_config(on_ban=admin_actions.system_ban)
+    # Статистика ограничения для панели администратора
+    bot.ingress_limiter = limiter
+
+    def get_user_language(chat_id: int) -> str:
+        user = crud.get_cached_user(None, chat_id)
+        return user.language if user and user.language else Config.DEFAULT_LANGUAGE
+
 
     def send_localized_message(chat_id: int, message_key: str, **kwargs):
         lang = get_user_language(chat_id)
         try:
             message = getattr(BotMessages, message_key)[lang].format(**kwargs)
-            bot.send_message(chat_id, message)
+            messaging.send_raw(chat_id, message)
         except (KeyError, AttributeError) as e:
             logger.error(f"Translation error for {message_key} in {lang}: {e}")
             fallback = getattr(BotMessages, message_key).get(Config.DEFAULT_LANGUAGE, "Error")
-            bot.send_message(chat_id, fallback.format(**kwargs))
+            messaging.send_raw(chat_id, fallback.format(**kwargs))
 
 
     @bot.message_handler(commands=['start', 'help'])
     @log_message
     def handle_start(message: types.Message):
         with db_connector.session_scope() as session:
+            # После разблокировки бота Telegram присылает /start
+            delivery.mark_reachable(session, message.chat.id)
             user = crud.get_user(session, message.from_user.id)
             
             if user and user.is_banned:
@@ -54,9 +83,9 @@ def register_user_handlers(bot: TeleBot):
                 send_localized_message(message.chat.id, 'WELCOME_MESSAGE')
 
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('lang_'))
-    def handle_language_selection(call: types.CallbackQuery):
-        lang = call.data.split('_')[1]
+    @callbacks.route('lang')
+    def handle_language_selection(call: types.CallbackQuery, data: CallbackData):
+        lang = data.args[0] if data.args else Config.DEFAULT_LANGUAGE
         if lang not in {Languages.EN, Languages.DE, Languages.RU}:
             lang = Config.DEFAULT_LANGUAGE
 
@@ -75,11 +104,29 @@ def register_user_handlers(bot: TeleBot):
         send_localized_message(
             call.message.chat.id,
             'WELCOME_MESSAGE',
-            reply_markup=get_main_menu_keyboard(lang)
+            reply_markup=get_main_menu_keyboard()
         )
         bot.answer_callback_query(call.id)
 
 
+    def render_tickets_page(user, page) -> str:
+        response = [BotMessages.TICKETS_HEADER[user.language]]
+
+        for ticket in page["items"]:
+            status_icon = "✓" if ticket.status == "open" else "×"
+            response.append(
+                BotMessages.TICKET_ITEM.format(
+                    status_icon=status_icon,
+                    ticket_id=ticket.id,
+                    status=ticket.status,
+                    date=ticket.created_at.strftime('%d.%m.%Y %H:%M'),
+                    preview=html.escape(ticket.preview)
+                )
+            )
+
+        return "\n\n".join(response)
+
+
     @bot.message_handler(commands=['mytickets'])
     @log_message
     def handle_my_tickets(message: types.Message):
@@ -90,53 +137,95 @@ def register_user_handlers(bot: TeleBot):
                 send_localized_message(message.chat.id, 'ACCESS_DENIED')
                 return
 
-            tickets = crud.get_user_tickets(session, user.id)
-            if not tickets:
+            page = crud.get_user_ticket_previews(session, user.id, limit=Config.TICKETS_PAGE_SIZE)
+            if not page["items"]:
                 send_localized_message(message.chat.id, 'NO_TICKETS')
                 return
 
-            response = [BotMessages.TICKETS_HEADER[user.language]]
-            
-            for ticket in tickets:
-                status_icon = "✓" if ticket.status == "open" else "×"
-                response.append(
-                    BotMessages.TICKET_ITEM[user.language].format(
-                        status_icon=status_icon,
-                        ticket_id=ticket.id,
-                        status=ticket.status,
-                        date=ticket.created_at.strftime('%d.%m.%Y %H:%M'),
-                        preview=ticket.message[:50]
-                    )
-                )
-
             bot.send_message(
                 message.chat.id,
-                "\n\n".join(response),
-                reply_markup=get_main_menu_keyboard(user.language)
+                render_tickets_page(user, page),
+                reply_markup=get_pagination_keyboard('mt', page["prev_cursor"], page["next_cursor"])
             )
 
 
+    @callbacks.route('mt')
+    def handle_my_tickets_page(call: types.CallbackQuery, data: CallbackData):
+        direction, raw_cursor = data.args
+
+        with db_connector.session_scope() as session:
+            user = crud.get_user(session, call.from_user.id)
+            if not user or user.is_banned:
+                bot.answer_callback_query(call.id)
+                return
+
+            page = crud.get_user_ticket_previews(
+                session,
+                user.id,
+                cursor=decode_cursor(raw_cursor),
+                limit=Config.TICKETS_PAGE_SIZE,
+                backward=direction == 'p'
+            )
+            if not page["items"]:
+                bot.answer_callback_query(call.id)
+                return
+
+            bot.edit_message_text(
+                render_tickets_page(user, page),
+                chat_id=call.message.chat.id,
+                message_id=call.message.message_id,
+                reply_markup=get_pagination_keyboard('mt', page["prev_cursor"], page["next_cursor"])
+            )
+        bot.answer_callback_query(call.id)
+
+
     @bot.message_handler(func=lambda m: True, content_types=['text'])
     @log_message
     def handle_text_message(message: types.Message):
         if message.reply_to_message:
             return
 
-        with db_connector.session_scope() as session:
-            user = crud.get_user(session, message.from_user.id)
-            
-            if not user or user.is_banned:
-                send_localized_message(message.chat.id, 'ACCESS_DENIED')
-                return
-
-            ticket = crud.create_ticket(session, user.id, message.text)
-            notify_admins_about_new_ticket(bot, ticket, user)
-            
+        # До любых запросов к БД: флуд не создает обращений и уведомлений
+        verdict = limiter.check(message.from_user.id, message.text)
+        if verdict == ingress.MUTED:
             send_localized_message(
                 message.chat.id,
-                'TICKET_CREATED',
-                ticket_id=ticket.id
+                'RATE_LIMITED',
+                minutes=max(1, math.ceil(limiter.mute_remaining(message.from_user.id) / 60))
             )
+        elif verdict == ingress.WARNED:
+            send_localized_message(message.chat.id, 'MESSAGE_DROPPED')
+        if verdict != ingress.ALLOWED:
+            return
+
+        user = crud.get_cached_user(None, message.from_user.id)
+        if not user or user.is_banned:
+            send_localized_message(message.chat.id, 'ACCESS_DENIED')
+            return
+
+        # Продолжение недавнего обращения: без новой строки, подтверждения и уведомления
+        if followups.append(user.id, message.text) is not None:
+            return
+
+        with db_connector.session_scope() as session:
+            ticket = crud.create_ticket(session, user.id, message.text)
+            delivery.mark_reachable(session, message.chat.id)
+
+        # Подтверждение пользователю уходит первым, уведомления администраторам
+        # рассылаются параллельно и не задерживают обработчик
+        send_localized_message(
+            message.chat.id,
+            'TICKET_CREATED',
+            ticket_id=ticket.id
+        )
+        notifications = notify_admins_about_new_ticket(ticket, user)
+        followups.track(
+            user.id,
+            ticket.id,
+            ticket.message,
+            functools.partial(render_admin_notification, ticket, user),
+            notifications
+        )
 
 
     def detect_language(message: types.Message) -> str:
@@ -147,37 +236,40 @@ def register_user_handlers(bot: TeleBot):
             return Languages.DE
         return Config.DEFAULT_LANGUAGE
 
-    def notify_admins_about_new_ticket(bot: TeleBot, ticket, user):
+    def render_admin_notification(ticket, user, ticket_text: str):
         lang = user.language
-        
+        if len(ticket_text) > NOTIFICATION_TEXT_LIMIT:
+            ticket_text = ticket_text[:NOTIFICATION_TEXT_LIMIT] + "…"
+
         admin_message = BotMessages.ADMIN_NOTIFICATION[lang].format(
             ticket_id=ticket.id,
-            username=user.username or 'N/A',
+            username=html.escape(user.username or 'N/A'),
             user_id=user.id,
             date=ticket.created_at.strftime('%d.%m.%Y %H:%M'),
-            message=ticket.message
+            message=html.escape(ticket_text)
         )
 
         admin_keyboard = types.InlineKeyboardMarkup()
         admin_keyboard.row(
             types.InlineKeyboardButton(
                 text="Ответить" if lang == Languages.RU else "Reply" if lang == Languages.EN else "Antworten",
-                callback_data=f"reply_{ticket.id}"
+                callback_data=encode_callback('reply', ticket.id)
             ),
             types.InlineKeyboardButton(
                 text="Закрыть" if lang == Languages.RU else "Close" if lang == Languages.EN else "Schließen",
-                callback_data=f"close_{ticket.id}"
+                callback_data=encode_callback('close', ticket.id)
             )
         )
         admin_keyboard.row(
             types.InlineKeyboardButton(
                 text="Блокировать" if lang == Languages.RU else "Ban" if lang == Languages.EN else "Sperren",
-                callback_data=f"ban_{ticket.id}"
+                callback_data=encode_callback('ban', ticket.id)
             )
         )
 
-        for admin_id in Config.ADMIN_IDS:
-            try:
-                bot.send_message(admin_id, admin_message, reply_markup=admin_keyboard)
-            except Exception as e:
-                logger.error(f"Error notifying admin {admin_id}: {e}")
+        return admin_message, admin_keyboard
+
+
+    def notify_admins_about_new_ticket(ticket, user):
+        admin_message, admin_keyboard = render_admin_notification(ticket, user, ticket.message)
+        return admin_digest.notify_new_ticket(ticket.id, ticket.message, admin_message, admin_keyboard)
@@ -1,12 +1,12 @@
 import os
+import asyncio
 import logging
 
-from telebot import TeleBot
-
+from bot.runtime.polling import run_polling
+from bot.services.transport import install_transport
 from bot.database.connector import init_db, db_connector
 from bot.database.models import Base
 
-from bot.handlers import register_handlers
 from bot.config import Config
 
 
@@ -38,17 +38,22 @@ def main():
     
 
     init_db(Config.DB_URL)
+    install_transport()
     
-    
-    bot = TeleBot(bot_token, parse_mode="HTML")
-    
-    
-    register_handlers(bot)
-    
-    
-    logger.info("Bot is starting...")
+
+    logger.info(f"Bot is starting in {Config.RUN_MODE} mode...")
     try:
-        bot.infinity_polling()
+        if Config.WORKER_PROCESSES > 0:
+            from bot.runtime.supervisor import run_supervisor
+            run_supervisor(bot_token)
+        elif Config.RUN_MODE == "async":
+            from bot.runtime.async_polling import run_async_polling
+            asyncio.run(run_async_polling(bot_token))
+        elif Config.RUN_MODE == "webhook":
+            from bot.runtime.webhook import run_webhook
+            run_webhook(bot_token)
+        else:
+            run_polling(bot_token)
     except Exception as e:
         logger.critical(f"Error occured: {str(e)}")
         raise
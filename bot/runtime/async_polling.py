@@ -0,0 +1,202 @@
+"""
+Асинхронный режим работы бота (RUN_MODE=async).
+
+Обновления принимает AsyncTeleBot, а обрабатывают их те же синхронные
+обработчики, зарегистрированные на DeferringTeleBot без собственного пула
+потоков. Обработка обновления идет в два этапа:
+
+1. Обработчик выполняется в пуле из ASYNC_HANDLER_WORKERS потоков. Работа
+   с БД (session_scope) идет в потоке, а вызовы Bot API записываются в
+   outbox (см. bot/services/outbox.py).
+2. Цикл событий по порядку выполняет записанные вызовы через сессию
+   AsyncTeleBot, повторяя их при 429, 5xx и сетевых ошибках.
+
+Поток занят только на первом этапе, поэтому число одновременно
+обслуживаемых чатов не ограничено числом потоков. Ограничение
+ASYNC_MAX_IN_FLIGHT применяется при получении обновлений: getUpdates
+запрашивает не больше обновлений, чем есть свободных мест, и ждет, пока
+места освободятся. Обновления администраторов мест не занимают и
+выполняются в отдельном пуле из ADMIN_LANE_WORKERS потоков.
+"""
+import asyncio
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from telebot import types
+from bot.config import Config
+from bot.handlers import register_handlers
+from bot.runtime.dispatcher import ADMIN_LANE, update_lane
+from bot.runtime.polling import resume_broadcasts
+from bot.services import outbox
+from bot.services.messaging import MessagingService
+from bot.services.outbox import DeferringTeleBot, Outbox
+from bot.services.retry import ErrorKind, RetryPolicy, classify_error
+
+
+logger = logging.getLogger(__name__)
+
+
+MAX_UPDATES_PER_REQUEST = 100  # ограничение getUpdates
+
+
+def _create_async_bot_class():
+    # aiohttp нужен только в асинхронном режиме, поэтому импорт отложен
+    from telebot import asyncio_helper
+    from telebot.async_telebot import AsyncTeleBot
+
+    class OffloadingAsyncTeleBot(AsyncTeleBot):
+        """
+        AsyncTeleBot, который передает обновления синхронному диспетчеру
+        в пуле потоков и выполняет отложенные им вызовы Bot API.
+        """
+
+        def __init__(self, token: str, dispatcher: DeferringTeleBot, executor: ThreadPoolExecutor,
+                     max_in_flight: int, admin_executor: ThreadPoolExecutor = None, **kwargs):
+            super().__init__(token, **kwargs)
+            self.dispatcher = dispatcher
+            self.executor = executor
+            self.admin_executor = admin_executor
+            self.messaging = MessagingService(dispatcher)
+            self.retry_policy = RetryPolicy.from_config()
+            self.max_in_flight = max_in_flight
+            self.in_flight = 0
+            self.capacity = asyncio.Condition()
+            self.tasks = set()
+
+
+        async def get_updates(self, *args, limit=None, **kwargs) -> List[types.Update]:
+            # Следующий getUpdates ждет свободных мест: ограничение работает при получении
+            async with self.capacity:
+                await self.capacity.wait_for(lambda: self.in_flight < self.max_in_flight)
+                free = self.max_in_flight - self.in_flight
+
+            limit = min(limit or MAX_UPDATES_PER_REQUEST, free)
+            updates = await super().get_updates(*args, limit=limit, **kwargs)
+            self.in_flight += sum(1 for update in updates if not self._is_admin(update))
+            return updates
+
+
+        async def process_new_updates(self, updates: List[types.Update]):
+            for update in updates:
+                if self._is_admin(update):
+                    self._start(self._dispatch(update, self.admin_executor))
+                else:
+                    self._start(self._dispatch(update, self.executor, limited=True))
+
+
+        def _is_admin(self, update: types.Update) -> bool:
+            return (
+                self.admin_executor is not None
+                and update_lane(update, Config.ADMIN_IDS) == ADMIN_LANE
+            )
+
+
+        def _start(self, coroutine) -> None:
+            task = asyncio.create_task(coroutine)
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+
+        async def _dispatch(self, update: types.Update, executor: ThreadPoolExecutor,
+                            limited: bool = False):
+            loop = asyncio.get_running_loop()
+            try:
+                calls = await loop.run_in_executor(executor, self._run_handlers, update)
+                await self._flush(calls, executor)
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+            finally:
+                if limited:
+                    async with self.capacity:
+                        self.in_flight -= 1
+                        self.capacity.notify_all()
+
+
+        def _run_handlers(self, update: types.Update) -> Outbox:
+            # Выполняется в потоке пула: БД здесь, вызовы Bot API - в outbox
+            with outbox.collect() as calls:
+                self.dispatcher.process_new_updates([update])
+            return calls
+
+
+        async def _flush(self, calls: Outbox, executor: ThreadPoolExecutor) -> None:
+            for method, args, kwargs in calls.calls:
+                await self._call(method, args, kwargs, executor)
+
+
+        async def _call(self, method: str, args, kwargs, executor: ThreadPoolExecutor) -> None:
+            chat_id = kwargs.get("chat_id", args[0] if args and method != "answer_callback_query" else None)
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    await getattr(self, method)(*args, **kwargs)
+                    return
+                except asyncio_helper.RequestTimeout as e:
+                    error = TimeoutError(str(e))
+                except Exception as e:
+                    error = e
+
+                if classify_error(error) == ErrorKind.FORBIDDEN and chat_id is not None:
+                    # Запись в журнал доставки - работа с БД, она идет в пуле
+                    await asyncio.get_running_loop().run_in_executor(
+                        executor, self.messaging._handle_blocked_user, chat_id, error
+                    )
+                    return
+
+                delay = self.retry_policy.next_delay(attempt, error)
+                if delay is None:
+                    logger.error(f"{method} to {chat_id} failed after {attempt} attempts: {error}")
+                    return
+                await asyncio.sleep(delay)
+
+
+        async def drain(self):
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    return OffloadingAsyncTeleBot
+
+
+async def run_async_polling(bot_token: str) -> None:
+    """
+    Запуск бота в асинхронном режиме до остановки polling.
+    """
+    dispatcher = DeferringTeleBot(bot_token, parse_mode="HTML", threaded=False)
+    register_handlers(dispatcher)
+    resume_broadcasts(dispatcher.broadcasts)
+
+    executor = ThreadPoolExecutor(
+        max_workers=Config.ASYNC_HANDLER_WORKERS,
+        thread_name_prefix="handler"
+    )
+    admin_executor = None
+    if Config.ADMIN_IDS and Config.ADMIN_LANE_WORKERS > 0:
+        admin_executor = ThreadPoolExecutor(
+            max_workers=Config.ADMIN_LANE_WORKERS,
+            thread_name_prefix="admin-handler"
+        )
+    async_bot_class = _create_async_bot_class()
+    async_bot = async_bot_class(
+        bot_token,
+        dispatcher=dispatcher,
+        executor=executor,
+        max_in_flight=Config.ASYNC_MAX_IN_FLIGHT,
+        admin_executor=admin_executor,
+        parse_mode="HTML"
+    )
+
+    logger.info(
+        f"Async runtime: {Config.ASYNC_HANDLER_WORKERS} DB workers, "
+        f"{Config.ASYNC_MAX_IN_FLIGHT} updates in flight"
+    )
+    try:
+        await async_bot.infinity_polling()
+    finally:
+        await async_bot.drain()
+        await async_bot.close_session()
+        executor.shutdown(wait=True)
+        if admin_executor is not None:
+            admin_executor.shutdown(wait=True)
+        dispatcher.scheduler.stop(drain=True, timeout=30)
@@ -0,0 +1,236 @@
+"""
+Диспетчер обновлений с разбиением по чатам и полосами приоритета.
+
+Обновление передается в process_new_updates бота, зарегистрированного с
+threaded=False. Каждый chat_id закреплен за одной очередью (шардом) с
+собственным потоком, поэтому обновления одного чата обрабатываются
+строго по порядку, а разные чаты - параллельно. Медленный чат задерживает
+только свой шард.
+
+Обновления делятся на две полосы. Сообщения и нажатия кнопок от
+администраторов (Config.ADMIN_IDS) идут в полосу admin с отдельными
+потоками и очередями, поэтому поток сообщений от пользователей не мешает
+администраторам отвечать, закрывать обращения и блокировать. Все
+остальное идет в полосу user.
+
+Очереди полосы user ограничены: при переполнении обновление отбрасывается
+и учитывается в статистике, а submit возвращает True, чтобы источник не
+ждал и Telegram не повторял доставку. Для полосы admin submit по
+умолчанию не блокирует: при переполнении возвращается False, и источник
+сам решает, что делать (webhook отвечает ошибкой, и Telegram повторит
+доставку). Polling передает block=True: обновления уже подтверждены
+offset, поэтому приему лучше подождать.
+"""
+import logging
+import queue
+import threading
+import time
+
+from typing import Dict, Iterable, List, Optional, Sequence
+from telebot import TeleBot, types
+
+
+logger = logging.getLogger(__name__)
+
+
+_STOP = object()
+
+ADMIN_LANE = "admin"
+USER_LANE = "user"
+
+
+def update_chat_id(update: types.Update) -> Optional[int]:
+    """
+    Чат, к которому относится обновление, или отправитель, если чата нет.
+    """
+    for message in (
+        update.message, update.edited_message,
+        update.channel_post, update.edited_channel_post
+    ):
+        if message is not None:
+            return message.chat.id
+
+    callback = update.callback_query
+    if callback is not None:
+        if callback.message is not None:
+            return callback.message.chat.id
+        return callback.from_user.id
+
+    for event in (
+        update.inline_query, update.chosen_inline_result, update.shipping_query,
+        update.pre_checkout_query, update.poll_answer, update.my_chat_member,
+        update.chat_member, update.chat_join_request
+    ):
+        if event is None:
+            continue
+        chat = getattr(event, "chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        if user is not None:
+            return user.id
+    return None
+
+
+def update_sender_id(update: types.Update) -> Optional[int]:
+    """
+    Автор сообщения или нажатия кнопки; для остальных типов обновлений None.
+    """
+    for event in (update.message, update.edited_message, update.callback_query):
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+    return None
+
+
+def update_lane(update: types.Update, admin_ids: Sequence[int]) -> str:
+    return ADMIN_LANE if update_sender_id(update) in admin_ids else USER_LANE
+
+
+def shard_for(update: types.Update, shards: int) -> int:
+    chat_id = update_chat_id(update)
+    key = chat_id if chat_id is not None else update.update_id
+    return key % shards
+
+
+class _Lane:
+
+    def __init__(self, name: str, shards: int, queue_size: int, shed: bool):
+        self.name = name
+        self.shards = shards
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(shards)]
+        self.processed = [0] * shards
+        self.shed = shed
+        self.dropped = 0
+        self.rejected = 0
+
+
+    def stats(self, now: float) -> Dict:
+        shards = []
+        for index, shard_queue in enumerate(self.queues):
+            with shard_queue.mutex:
+                depth = len(shard_queue.queue)
+                oldest = shard_queue.queue[0][0] if depth else None
+            shards.append({
+                "depth": depth,
+                "oldest_age": round(now - oldest, 3) if oldest is not None else 0.0,
+                "processed": self.processed[index]
+            })
+        return {
+            "queue_depth": sum(shard["depth"] for shard in shards),
+            "oldest_age": max(shard["oldest_age"] for shard in shards),
+            "processed": sum(self.processed),
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "shards": shards
+        }
+
+
+class ShardedDispatcher:
+
+    def __init__(
+        self,
+        bot: TeleBot,
+        shards: int = 16,
+        queue_size: int = 200,
+        admin_ids: Sequence[int] = (),
+        admin_shards: int = 2,
+        admin_queue_size: int = 100
+    ):
+        self.bot = bot
+        self.admin_ids = frozenset(admin_ids)
+        self.lanes = {USER_LANE: _Lane(USER_LANE, shards, queue_size, shed=True)}
+        if self.admin_ids and admin_shards > 0:
+            self.lanes[ADMIN_LANE] = _Lane(ADMIN_LANE, admin_shards, admin_queue_size, shed=False)
+        self._threads: List[threading.Thread] = []
+
+
+    def start(self) -> None:
+        for lane in self.lanes.values():
+            for index in range(lane.shards):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(lane, index),
+                    name=f"update-{lane.name}-{index}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+
+    def lane_for(self, update: types.Update) -> _Lane:
+        lane = update_lane(update, self.admin_ids)
+        return self.lanes.get(lane, self.lanes[USER_LANE])
+
+
+    def submit(self, update: types.Update, block: bool = False) -> bool:
+        lane = self.lane_for(update)
+        try:
+            lane.queues[shard_for(update, lane.shards)].put(
+                (time.monotonic(), update),
+                block=block and not lane.shed
+            )
+            return True
+        except queue.Full:
+            if lane.shed:
+                lane.dropped += 1
+                if lane.dropped % 100 == 1:
+                    logger.warning(f"{lane.name} lane is full, dropped {lane.dropped} updates so far")
+                return True
+            lane.rejected += 1
+            return False
+
+
+    def submit_many(self, updates: Iterable[types.Update], block: bool = True) -> int:
+        return sum(1 for update in updates if self.submit(update, block=block))
+
+
+    def stop(self, drain: bool = True, timeout: float = 30) -> None:
+        """
+        Остановка потоков. При drain=True сначала обрабатываются
+        обновления, уже принятые в очереди.
+        """
+        queues = [shard_queue for lane in self.lanes.values() for shard_queue in lane.queues]
+        if not drain:
+            for shard_queue in queues:
+                self._discard_pending(shard_queue)
+        deadline = time.monotonic() + timeout
+        for shard_queue in queues:
+            shard_queue.put((time.monotonic(), _STOP))
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads.clear()
+
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        lanes = {name: lane.stats(now) for name, lane in self.lanes.items()}
+        return {
+            "queue_depth": sum(lane["queue_depth"] for lane in lanes.values()),
+            "oldest_age": max(lane["oldest_age"] for lane in lanes.values()),
+            "dropped": sum(lane["dropped"] for lane in lanes.values()),
+            "rejected": sum(lane["rejected"] for lane in lanes.values()),
+            "lanes": lanes
+        }
+
+
+    def _worker(self, lane: _Lane, index: int) -> None:
+        shard_queue = lane.queues[index]
+        while True:
+            _, update = shard_queue.get()
+            if update is _STOP:
+                return
+            try:
+                self.bot.process_new_updates([update])
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+            finally:
+                lane.processed[index] += 1
+
+
+    @staticmethod
+    def _discard_pending(shard_queue: queue.Queue) -> None:
+        while True:
+            try:
+                shard_queue.get_nowait()
+            except queue.Empty:
+                return
@@ -0,0 +1,75 @@
+"""
+Режим long polling (RUN_MODE=polling).
+
+Отдельный экземпляр TeleBot только получает обновления и передает их
+ShardedDispatcher; обработчики зарегистрированы на ScheduledTeleBot с
+threaded=False и выполняются в потоках шардов.
+"""
+import logging
+
+from telebot import TeleBot
+from bot.config import Config
+from bot.handlers import register_handlers
+from bot.runtime.dispatcher import ShardedDispatcher
+from bot.services.broadcast import BroadcastService
+from bot.services.scheduler import ScheduledTeleBot
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_dispatcher(bot: TeleBot) -> ShardedDispatcher:
+    dispatcher = ShardedDispatcher(
+        bot,
+        shards=Config.DISPATCH_SHARDS,
+        queue_size=Config.DISPATCH_QUEUE_SIZE,
+        admin_ids=Config.ADMIN_IDS,
+        admin_shards=Config.ADMIN_LANE_WORKERS,
+        admin_queue_size=Config.ADMIN_LANE_QUEUE_SIZE
+    )
+    # Статистика очередей для панели администратора
+    bot.update_dispatcher = dispatcher
+    dispatcher.start()
+    return dispatcher
+
+
+def create_intake(bot_token: str, dispatcher) -> TeleBot:
+    """
+    TeleBot, который только получает обновления и передает их dispatcher.
+
+    :param dispatcher: Объект с методом submit_many(updates, block)
+    """
+    intake = TeleBot(bot_token, threaded=False)
+
+    def forward(updates):
+        # Offset следующего getUpdates обычно сдвигает TeleBot.process_new_updates
+        for update in updates:
+            intake.last_update_id = max(intake.last_update_id, update.update_id)
+        dispatcher.submit_many(updates, block=True)
+
+    intake.process_new_updates = forward
+    return intake
+
+
+def resume_broadcasts(broadcasts: BroadcastService) -> None:
+    """
+    Возобновление прерванных рассылок, если это разрешено BROADCAST_RESUME.
+    """
+    if Config.BROADCAST_RESUME:
+        broadcasts.resume_interrupted()
+
+
+def run_polling(bot_token: str) -> None:
+    bot = ScheduledTeleBot(bot_token, parse_mode="HTML", threaded=False)
+    register_handlers(bot)
+    dispatcher = create_dispatcher(bot)
+    resume_broadcasts(bot.broadcasts)
+
+    intake = create_intake(bot_token, dispatcher)
+
+    logger.info(f"Polling with {Config.DISPATCH_SHARDS} update shards")
+    try:
+        intake.infinity_polling()
+    finally:
+        dispatcher.stop(drain=True, timeout=30)
+        bot.scheduler.stop(drain=True, timeout=30)
@@ -0,0 +1,332 @@
+"""
+Многопроцессный режим (WORKER_PROCESSES > 0).
+
+Процесс-супервизор принимает обновления (polling или webhook, по RUN_MODE)
+и по chat_id распределяет их через multiprocessing-очереди между
+WORKER_PROCESSES рабочими процессами. Процессы запускаются методом spawn:
+каждый импортирует приложение заново и получает собственный
+DatabaseConnector, планировщик отправки и набор обработчиков. Внутри
+процесса обновления идут через ShardedDispatcher, поэтому порядок
+обновлений одного чата сохраняется.
+
+Обновления администраторов ставятся в очередь процесса с ожиданием, а
+обновления пользователей - без ожидания: если очередь процесса заполнена,
+обновление отбрасывается, чтобы прием не останавливался из-за потока
+сообщений от пользователей.
+
+Остановка (SIGINT/SIGTERM): прием прекращается, в каждую очередь ставится
+маркер остановки, и процесс завершается, обработав все, что было до него.
+SIGHUP перезапускает процессы по одному с тем же порядком остановки;
+обновления, пришедшие во время перезапуска, ждут в очереди. Упавший
+процесс перезапускается автоматически.
+
+Прерванные рассылки возобновляет супервизор, а не рабочие процессы: при
+запуске и после каждого перезапуска рабочих процессов, чьи потоки
+рассылок остановились вместе с ними. Отправляет их собственный
+ScheduledTeleBot супервизора.
+
+Лимит GLOBAL_SEND_RATE общий для бота, поэтому делится поровну между
+отправителями: планировщик каждого рабочего процесса и супервизора
+получает GLOBAL_SEND_RATE / (WORKER_PROCESSES + 1) сообщений в секунду.
+
+Кэш пользователей (bot/database/cache.py) есть в каждом процессе. Сбросы
+после коммита рабочий процесс отправляет в общую очередь событий, а
+супервизор пересылает их в управляющие очереди остальных процессов, где
+их применяет отдельный поток. Блокировка, выполненная в одном процессе,
+перестает обслуживаться из кэша других сразу, а не через USER_CACHE_TTL.
+"""
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from typing import List, Optional, Sequence
+from telebot import TeleBot, types
+from bot.config import Config
+from bot.runtime.dispatcher import ADMIN_LANE, shard_for, update_lane
+from bot.runtime.polling import create_intake, resume_broadcasts
+from bot.services.broadcast import BroadcastService
+from bot.services.scheduler import OutboundScheduler, ScheduledTeleBot
+
+
+logger = logging.getLogger(__name__)
+
+
+_STOP = None
+
+
+def process_send_rate() -> float:
+    """
+    Доля GLOBAL_SEND_RATE для одного процесса: лимит Telegram общий для
+    бота, а отправляют рабочие процессы и супервизор.
+    """
+    return Config.GLOBAL_SEND_RATE / (Config.WORKER_PROCESSES + 1)
+
+
+def _apply_invalidations(control: multiprocessing.Queue) -> None:
+    from bot.database.cache import user_cache
+
+    while True:
+        chat_ids, user_ids = control.get()
+        user_cache.invalidate(chat_ids=chat_ids, user_ids=user_ids)
+
+
+def worker_main(
+    index: int,
+    updates: multiprocessing.Queue,
+    bot_token: str,
+    events: multiprocessing.Queue,
+    control: multiprocessing.Queue
+) -> None:
+    """
+    Точка входа рабочего процесса.
+
+    :param events: Очередь сбросов кэша пользователей для супервизора
+    :param control: Сбросы кэша от других процессов
+    """
+    # Сигналы обрабатывает супервизор; рабочий процесс останавливается маркером в очереди
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    from bot.main import configure_logging
+    from bot.database.cache import add_invalidation_listener
+    from bot.handlers import register_handlers
+    from bot.runtime.polling import create_dispatcher
+    from bot.services.scheduler import OutboundScheduler, ScheduledTeleBot
+    from bot.services.transport import install_transport
+
+    configure_logging()
+    install_transport()
+    add_invalidation_listener(lambda chat_ids, user_ids: events.put((index, chat_ids, user_ids)))
+    threading.Thread(
+        target=_apply_invalidations,
+        args=(control,),
+        name="cache-invalidations",
+        daemon=True
+    ).start()
+    bot = ScheduledTeleBot(
+        bot_token,
+        scheduler=OutboundScheduler.from_config(global_rate=process_send_rate()),
+        parse_mode="HTML",
+        threaded=False
+    )
+    register_handlers(bot)
+    dispatcher = create_dispatcher(bot)
+    logger.info(f"Worker {index} started")
+
+    try:
+        while True:
+            update = updates.get()
+            if update is _STOP:
+                break
+            dispatcher.submit(update, block=True)
+    finally:
+        dispatcher.stop(drain=True, timeout=30)
+        bot.scheduler.stop(drain=True, timeout=30)
+        logger.info(f"Worker {index} stopped")
+
+
+class ProcessDispatcher:
+    """
+    Распределение обновлений по рабочим процессам. Интерфейс submit совпадает
+    с ShardedDispatcher, поэтому источники обновлений используют любой из них.
+    """
+
+    def __init__(
+        self,
+        bot_token: str,
+        processes: int = 2,
+        queue_size: int = 1000,
+        admin_ids: Sequence[int] = (),
+        broadcasts: Optional[BroadcastService] = None
+    ):
+        self.bot_token = bot_token
+        self.admin_ids = frozenset(admin_ids)
+        self.broadcasts = broadcasts
+        self.context = multiprocessing.get_context("spawn")
+        self.queues = [self.context.Queue(maxsize=queue_size) for _ in range(processes)]
+        self.events = self.context.Queue()
+        self.controls = [self.context.Queue() for _ in range(processes)]
+        self.workers: List[Optional[multiprocessing.Process]] = [None] * processes
+        self.dropped = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self._forwarder: Optional[threading.Thread] = None
+
+
+    def start(self) -> None:
+        for index in range(len(self.queues)):
+            self._spawn(index)
+        self._resume_broadcasts()
+        self._monitor = threading.Thread(target=self._watch, name="worker-monitor", daemon=True)
+        self._monitor.start()
+        self._forwarder = threading.Thread(
+            target=self._forward_invalidations,
+            name="cache-invalidations",
+            daemon=True
+        )
+        self._forwarder.start()
+
+
+    def submit(self, update: types.Update, block: bool = False) -> bool:
+        is_admin = update_lane(update, self.admin_ids) == ADMIN_LANE
+        try:
+            self.queues[shard_for(update, len(self.queues))].put(update, block=block and is_admin)
+            return True
+        except queue.Full:
+            if is_admin:
+                self.rejected += 1
+                return False
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"Worker queue is full, dropped {self.dropped} user updates so far")
+            return True
+
+
+    def submit_many(self, updates, block: bool = True) -> int:
+        return sum(1 for update in updates if self.submit(update, block=block))
+
+
+    def restart(self, timeout: float = 60) -> None:
+        """
+        Поочередный перезапуск рабочих процессов с дообработкой их очередей.
+        """
+        for index in range(len(self.queues)):
+            with self._lock:
+                self._drain_worker(index, timeout)
+                if not self._stopping.is_set():
+                    self._spawn(index)
+        self._resume_broadcasts()
+        logger.info("All workers restarted")
+
+
+    def stop(self, timeout: float = 60) -> None:
+        self._stopping.set()
+        with self._lock:
+            for index in range(len(self.queues)):
+                self.queues[index].put(_STOP)
+            deadline = time.monotonic() + timeout
+            for index, worker in enumerate(self.workers):
+                self._join(index, worker, max(0.0, deadline - time.monotonic()))
+
+
+    def stats(self) -> dict:
+        depths = []
+        for shard_queue in self.queues:
+            try:
+                depths.append(shard_queue.qsize())
+            except NotImplementedError:  # macOS
+                depths.append(-1)
+        return {
+            "workers": sum(1 for worker in self.workers if worker and worker.is_alive()),
+            "queue_depths": depths,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "restarts": self.restarts
+        }
+
+
+    def _spawn(self, index: int) -> None:
+        worker = self.context.Process(
+            target=worker_main,
+            args=(index, self.queues[index], self.bot_token, self.events, self.controls[index]),
+            name=f"bot-worker-{index}",
+            daemon=False
+        )
+        worker.start()
+        self.workers[index] = worker
+        logger.info(f"Worker {index} spawned (pid {worker.pid})")
+
+
+    def _forward_invalidations(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                source, chat_ids, user_ids = self.events.get(timeout=1)
+            except queue.Empty:
+                continue
+            for index, control in enumerate(self.controls):
+                if index != source:
+                    control.put((chat_ids, user_ids))
+
+
+    def _resume_broadcasts(self) -> None:
+        if self.broadcasts is not None:
+            resume_broadcasts(self.broadcasts)
+
+
+    def _drain_worker(self, index: int, timeout: float) -> None:
+        worker = self.workers[index]
+        if worker is None or not worker.is_alive():
+            return
+        self.queues[index].put(_STOP)
+        self._join(index, worker, timeout)
+
+
+    def _join(self, index: int, worker: Optional[multiprocessing.Process], timeout: float) -> None:
+        if worker is None:
+            return
+        worker.join(timeout)
+        if worker.is_alive():
+            logger.warning(f"Worker {index} did not stop in time, terminating")
+            worker.terminate()
+            worker.join(5)
+
+
+    def _watch(self) -> None:
+        while not self._stopping.wait(1):
+            with self._lock:
+                if self._stopping.is_set():
+                    return
+                for index, worker in enumerate(self.workers):
+                    if worker is not None and not worker.is_alive():
+                        logger.error(f"Worker {index} exited with code {worker.exitcode}, restarting")
+                        self.restarts += 1
+                        self._spawn(index)
+                        self._resume_broadcasts()
+
+
+def run_supervisor(bot_token: str) -> None:
+    sender = ScheduledTeleBot(
+        bot_token,
+        scheduler=OutboundScheduler.from_config(global_rate=process_send_rate()),
+        parse_mode="HTML",
+        threaded=False
+    )
+    dispatcher = ProcessDispatcher(
+        bot_token,
+        processes=Config.WORKER_PROCESSES,
+        queue_size=Config.WORKER_QUEUE_SIZE,
+        admin_ids=Config.ADMIN_IDS,
+        broadcasts=BroadcastService(sender)
+    )
+    dispatcher.start()
+    stop_event = threading.Event()
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(
+            signal.SIGHUP,
+            lambda *_: threading.Thread(target=dispatcher.restart, name="worker-restart").start()
+        )
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    logger.info(f"Supervisor: {Config.WORKER_PROCESSES} worker processes, {Config.RUN_MODE} intake")
+    try:
+        if Config.RUN_MODE == "webhook":
+            from bot.runtime.webhook import serve_webhook
+            serve_webhook(TeleBot(bot_token, threaded=False), dispatcher, stop_event)
+        else:
+            intake = create_intake(bot_token, dispatcher)
+            threading.Thread(
+                target=lambda: (stop_event.wait(), intake.stop_polling()),
+                name="polling-stop",
+                daemon=True
+            ).start()
+            intake.infinity_polling()
+    finally:
+        dispatcher.stop()
+        sender.scheduler.stop(drain=True, timeout=30)
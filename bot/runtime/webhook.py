@@ -0,0 +1,172 @@
+"""
+Прием обновлений через webhook (RUN_MODE=webhook).
+
+Встроенный HTTP-сервер из стандартной библиотеки проверяет заголовок
+X-Telegram-Bot-Api-Secret-Token, декодирует обновление и ставит его в
+очередь шарда ShardedDispatcher, сразу отвечая 200. Если очередь
+шарда заполнена, сервер отвечает 503: Telegram повторит доставку позже.
+
+Для проверки без Telegram достаточно отправить записанное обновление:
+
+    curl -X POST -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \
+         -d @update.json http://127.0.0.1:8443/telegram
+"""
+import hmac
+import json
+import logging
+import ssl
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from telebot import TeleBot, types
+from bot.config import Config
+from bot.handlers import register_handlers
+from bot.runtime.polling import create_dispatcher, resume_broadcasts
+from bot.services.scheduler import ScheduledTeleBot
+
+
+logger = logging.getLogger(__name__)
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "WebhookServer"
+
+
+    def do_POST(self):
+        if self.path != self.server.path:
+            self._respond(404)
+            return
+
+        secret = self.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(secret.encode(), self.server.secret.encode()):
+            logger.warning(f"Webhook request with invalid secret token from {self.client_address[0]}")
+            self._respond(403)
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_SIZE:
+            self._respond(413 if length else 400)
+            return
+
+        try:
+            update = types.Update.de_json(json.loads(self.rfile.read(length)))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Malformed webhook update: {e}")
+            self._respond(400)
+            return
+
+        if not self.server.dispatcher.submit(update):
+            logger.warning(f"Update queue is full, rejecting update {update.update_id}")
+            self._respond(503)
+            return
+        self._respond(200)
+
+
+    def do_GET(self):
+        self._respond(405)
+
+
+    def _respond(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.client_address[0]} - {format % args}")
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, dispatcher, secret: str, path: str = "/telegram"):
+        super().__init__(address, WebhookHandler)
+        self.dispatcher = dispatcher
+        self.secret = secret
+        self.path = path
+
+
+def create_server(dispatcher, ssl_context: Optional[ssl.SSLContext] = None) -> WebhookServer:
+    server = WebhookServer(
+        (Config.WEBHOOK_HOST, Config.WEBHOOK_PORT),
+        dispatcher,
+        secret=Config.WEBHOOK_SECRET,
+        path=Config.WEBHOOK_PATH
+    )
+    if ssl_context:
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+    return server
+
+
+def _ssl_context() -> Optional[ssl.SSLContext]:
+    if not Config.WEBHOOK_SSL_CERT:
+        return None
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(Config.WEBHOOK_SSL_CERT, Config.WEBHOOK_SSL_KEY)
+    return context
+
+
+def _set_webhook(bot: TeleBot) -> None:
+    if not Config.WEBHOOK_URL:
+        logger.info("WEBHOOK_URL not set, assuming the webhook is registered externally")
+        return
+    certificate = open(Config.WEBHOOK_SSL_CERT, "rb") if Config.WEBHOOK_SSL_CERT else None
+    try:
+        bot.set_webhook(
+            url=Config.WEBHOOK_URL,
+            certificate=certificate,
+            secret_token=Config.WEBHOOK_SECRET,
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+        )
+    finally:
+        if certificate:
+            certificate.close()
+    logger.info(f"Webhook registered: {Config.WEBHOOK_URL}")
+
+
+def serve_webhook(bot: TeleBot, dispatcher, stop_event: Optional[threading.Event] = None) -> None:
+    """
+    Прием обновлений в dispatcher до остановки процесса или stop_event.
+
+    :param bot: Бот для регистрации webhook
+    :param dispatcher: Объект с методом submit(update) -> bool
+    """
+    if not Config.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET must be provided in webhook mode")
+
+    server = create_server(dispatcher, _ssl_context())
+    _set_webhook(bot)
+
+    if stop_event:
+        threading.Thread(
+            target=lambda: (stop_event.wait(), server.shutdown()),
+            name="webhook-stop",
+            daemon=True
+        ).start()
+
+    logger.info(f"Webhook server listening on {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def run_webhook(bot_token: str, stop_event: Optional[threading.Event] = None) -> None:
+    """
+    Запуск бота в режиме webhook до остановки процесса или stop_event.
+    """
+    bot = ScheduledTeleBot(bot_token, parse_mode="HTML", threaded=False)
+    register_handlers(bot)
+    dispatcher = create_dispatcher(bot)
+    resume_broadcasts(bot.broadcasts)
+    try:
+        serve_webhook(bot, dispatcher, stop_event)
+    finally:
+        dispatcher.stop(drain=True, timeout=30)
+        bot.scheduler.stop(drain=True, timeout=30)
@@ -2,7 +2,9 @@ import logging
 
 from typing import Optional, Dict, List
 from telebot import TeleBot, types
-from bot.database import crud
+from bot.database.crud import crud
+from bot.database import counters
+from bot.database.models import Ticket
 from bot.database.connector import db_connector
 from bot.config import Config, BotMessages
 from bot.services.messaging import MessagingService
@@ -12,6 +14,9 @@ from bot.utils.keyboards import get_admin_main_keyboard
 logger = logging.getLogger(__name__)
 
 
+SYSTEM_ADMIN_ID = 0  # автор автоматических действий бота в журнале
+
+
 class AdminActions:
 
     def __init__(self, bot: TeleBot):
@@ -25,12 +30,35 @@ class AdminActions:
         user_id: int,
         reason: Optional[str] = None
     ) -> bool:
+        """
+        :param user_id: ID пользователя в БД (User.id, Ticket.user_id)
+        :return: True, если пользователь заблокирован
+        """
+        if admin_id not in Config.ADMIN_IDS:
+            logger.warning(f"Unauthorized ban attempt by {admin_id}")
+            return False
+        return self._ban(admin_id, user_id, reason)
+
+
+    def system_ban(self, user_id: int, reason: str) -> bool:
+        """
+        Блокировка по решению самого бота (например, ограничения сообщений),
+        без проверки ADMIN_IDS. В журнале записывается от SYSTEM_ADMIN_ID.
+
+        :param user_id: Telegram ID пользователя
+        """
         with db_connector.session_scope() as session:
-            if admin_id not in Config.ADMIN_IDS:
-                logger.warning(f"Unauthorized ban attempt by {admin_id}")
+            user = crud.get_user(session, user_id)
+            if not user:
+                logger.error(f"User with chat_id {user_id} not found")
                 return False
+            db_user_id = user.id
+        return self._ban(SYSTEM_ADMIN_ID, db_user_id, reason)
 
-            user = crud.get_user(session, user_id)
+
+    def _ban(self, admin_id: int, user_id: int, reason: Optional[str]) -> bool:
+        with db_connector.session_scope() as session:
+            user = crud.get_user_by_id(session, user_id)
             if not user:
                 logger.error(f"User {user_id} not found")
                 return False
@@ -39,43 +67,44 @@ class AdminActions:
                 logger.info(f"User {user_id} already banned")
                 return True
 
-            crud.update_user(session, user.id, {"is_banned": True})
+            crud.bulk_update_users(session, [user.id], {"is_banned": True})
+            closed_count = crud.close_user_tickets(session, user.id, admin_id=admin_id)
 
-            crud.log_admin_action(
-                session,
-                admin_id=admin_id,
-                action="ban",
-                target_user_id=user.id,
-                details=reason or "No reason provided"
-            )
+            crud.bulk_log_admin_actions(session, [{
+                "admin_id": admin_id,
+                "action": "ban",
+                "target_user_id": user.id,
+                "details": reason or "No reason provided"
+            }])
 
             try:
-                self.messaging.send_message(
+                self.messaging.send_raw(
                     user.chat_id,
-                    BotMessages.BAN_NOTIFICATION.format(reason=reason or "нарушение правил")
+                    BotMessages.BAN_NOTIFICATION[user.language].format(
+                        reason=reason or BotMessages.BAN_DEFAULT_REASON[user.language]
+                    )
                 )
             except Exception as e:
                 logger.error(f"Failed to notify user about ban: {e}")
 
-            open_tickets = crud.get_user_tickets(session, user.id, status="open")
-            for ticket in open_tickets:
-                crud.update_ticket(
-                    session,
-                    ticket.id,
-                    {"status": "closed", "admin_id": admin_id}
-                )
-
-            logger.info(f"User {user_id} banned by admin {admin_id}")
+            logger.info(
+                f"User {user_id} banned by admin {admin_id}, "
+                f"{closed_count} open tickets closed"
+            )
             return True
 
 
     def unban_user(self, admin_id: int, user_id: int) -> bool:
+        """
+        :param user_id: ID пользователя в БД (User.id), как в ban_user
+        :return: True, если пользователь разблокирован или не был заблокирован
+        """
         with db_connector.session_scope() as session:
             if admin_id not in Config.ADMIN_IDS:
                 logger.warning(f"Unauthorized unban attempt by {admin_id}")
                 return False
 
-            user = crud.get_user(session, user_id)
+            user = crud.get_user_by_id(session, user_id)
             if not user:
                 logger.error(f"User {user_id} not found")
                 return False
@@ -84,21 +113,20 @@ class AdminActions:
                 logger.info(f"User {user_id} not banned")
                 return True
 
-            crud.update_user(session, user.id, {"is_banned": False})
+            crud.bulk_update_users(session, [user.id], {"is_banned": False})
 
-            crud.log_admin_action(
-                session,
-                admin_id=admin_id,
-                action="unban",
-                target_user_id=user.id,
-                details="User unbanned"
-            )
+            crud.bulk_log_admin_actions(session, [{
+                "admin_id": admin_id,
+                "action": "unban",
+                "target_user_id": user.id,
+                "details": "User unbanned"
+            }])
 
 
             try:
-                self.messaging.send_message(
+                self.messaging.send_raw(
                     user.chat_id,
-                    BotMessages.UNBAN_NOTIFICATION
+                    BotMessages.UNBAN_NOTIFICATION[user.language]
                 )
             except Exception as e:
                 logger.error(f"Failed to notify user about unban: {e}")
@@ -130,49 +158,88 @@ class AdminActions:
             if comment:
                 update_data["response"] = comment
 
-            crud.update_ticket(session, ticket.id, update_data)
+            crud.bulk_update_tickets(session, [ticket.id], update_data)
 
-            crud.log_admin_action(
-                session,
-                admin_id=admin_id,
-                action="close_ticket",
-                target_user_id=ticket.user_id,
-                details=f"Ticket #{ticket_id}"
-            )
+            crud.bulk_log_admin_actions(session, [{
+                "admin_id": admin_id,
+                "action": "close_ticket",
+                "target_user_id": ticket.user_id,
+                "details": f"Ticket #{ticket_id}"
+            }])
 
             logger.info(f"Ticket {ticket_id} closed by admin {admin_id}")
             return True
 
 
+    def close_tickets(self, admin_id: int, ticket_ids: List[int]) -> int:
+        """
+        Массовое закрытие обращений: один UPDATE и один executemany в журнал
+        независимо от количества обращений.
+
+        :return: Количество закрытых обращений
+        """
+        if not ticket_ids:
+            return 0
+
+        with db_connector.session_scope() as session:
+            open_rows = session.query(Ticket.id, Ticket.user_id).filter(
+                Ticket.id.in_(ticket_ids),
+                Ticket.status == "open"
+            ).all()
+            if not open_rows:
+                return 0
+
+            closed_count = crud.bulk_update_tickets(
+                session,
+                [row.id for row in open_rows],
+                {"status": "closed", "admin_id": admin_id},
+                only_status="open"
+            )
+
+            crud.bulk_log_admin_actions(session, [
+                {
+                    "admin_id": admin_id,
+                    "action": "close_ticket",
+                    "target_user_id": row.user_id,
+                    "details": f"Ticket #{row.id}"
+                }
+                for row in open_rows
+            ])
+
+            logger.info(f"{closed_count} tickets closed by admin {admin_id}")
+            return closed_count
+
+
     def get_user_stats(self, user_id: int) -> Optional[Dict[str, int]]:
         with db_connector.session_scope() as session:
-            user = crud.get_user(session, user_id)
+            user = crud.get_user_by_id(session, user_id)
             if not user:
                 return None
 
-            all_tickets = crud.get_user_tickets(session, user.id)
-            open_tickets = crud.get_user_tickets(session, user.id, status="open")
-
-            return {
-                "total_tickets": len(all_tickets),
-                "open_tickets": len(open_tickets),
-                "closed_tickets": len(all_tickets) - len(open_tickets)
-            }
+            return counters.get_user_counters(session, user.id)
 
 
     def get_system_stats(self) -> Dict[str, int]:
         with db_connector.session_scope() as session:
-            total_users = session.query(crud.User).count()
-            banned_users = session.query(crud.User).filter(crud.User.is_banned == True).count()
-            total_tickets = session.query(crud.Ticket).count()
-            open_tickets = session.query(crud.Ticket).filter(crud.Ticket.status == "open").count()
-
-            return {
-                "total_users": total_users,
-                "banned_users": banned_users,
-                "total_tickets": total_tickets,
-                "open_tickets": open_tickets
-            }
+            return counters.get_global_counters(session)
+
+
+    def reconcile_counters(self, admin_id: int) -> Optional[Dict[str, int]]:
+        if admin_id not in Config.ADMIN_IDS:
+            logger.warning(f"Unauthorized reconcile attempt by {admin_id}")
+            return None
+
+        with db_connector.session_scope() as session:
+            stats = counters.reconcile(session)
+            crud.bulk_log_admin_actions(session, [{
+                "admin_id": admin_id,
+                "action": "reconcile_counters",
+                "target_user_id": 0,
+                "details": str(stats)
+            }])
+
+        logger.info(f"Counters reconciled by admin {admin_id}")
+        return stats
 
 
     def show_admin_panel(self, admin_id: int):
@@ -185,7 +252,7 @@ class AdminActions:
             f"✓ Открытых: {stats['open_tickets']}"
         )
 
-        self.messaging.send_message(
+        self.messaging.send_raw(
             admin_id,
             stats_message,
             reply_markup=get_admin_main_keyboard()
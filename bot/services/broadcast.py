@@ -0,0 +1,236 @@
+"""
+Возобновляемые рассылки.
+
+Задание хранится в таблице broadcast_jobs. Получатели читаются из users
+порциями по ключу id (keyset), без загрузки всего списка в память. Перед
+отправкой порции курсор задания переносится на ее последний id и
+фиксируется в БД, поэтому после сбоя задание продолжается со следующей
+порции и никому не приходит повторно. Сообщения из порции, прерванной
+сбоем, могут быть не доставлены (не более BROADCAST_CHUNK_SIZE).
+"""
+import logging
+import threading
+
+from typing import Dict, List, Optional
+from sqlalchemy import update
+from telebot import TeleBot
+from bot.config import Config
+from bot.database import delivery
+from bot.database.connector import db_connector
+from bot.database.models import BroadcastJob, User
+from bot.services.messaging import MessagingService
+
+
+logger = logging.getLogger(__name__)
+
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class BroadcastService:
+
+    def __init__(self, bot: TeleBot):
+        self.bot = bot
+        self.messaging = MessagingService(bot)
+        self._runners: Dict[int, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+
+    def create_job(self, admin_id: int, text: str, target_filter: str = "all") -> int:
+        with db_connector.session_scope() as session:
+            job = BroadcastJob(
+                text=text,
+                target_filter=target_filter,
+                status="pending",
+                created_by=admin_id
+            )
+            session.add(job)
+            session.flush()
+            job_id = job.id
+
+        logger.info(f"Broadcast job {job_id} created by admin {admin_id} for '{target_filter}'")
+        self._start_runner(job_id)
+        return job_id
+
+
+    def pause_job(self, job_id: int) -> bool:
+        return self._set_status(job_id, "paused", from_statuses=ACTIVE_STATUSES)
+
+
+    def resume_job(self, job_id: int) -> bool:
+        if not self._set_status(job_id, "pending", from_statuses=("paused",)):
+            return False
+        self._start_runner(job_id)
+        return True
+
+
+    def cancel_job(self, job_id: int) -> bool:
+        return self._set_status(job_id, "cancelled", from_statuses=ACTIVE_STATUSES + ("paused",))
+
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        with db_connector.session_scope() as session:
+            job = session.get(BroadcastJob, job_id)
+            return self._job_info(job) if job else None
+
+
+    def list_jobs(self, limit: int = 10) -> List[Dict]:
+        with db_connector.session_scope() as session:
+            jobs = session.query(BroadcastJob).order_by(BroadcastJob.id.desc()).limit(limit).all()
+            return [self._job_info(job) for job in jobs]
+
+
+    def resume_interrupted(self) -> int:
+        """
+        Запуск заданий, прерванных остановкой процесса. Вызывается при
+        старте из точки входа режима работы, один раз на развертывание.
+        """
+        with db_connector.session_scope() as session:
+            job_ids = [
+                job_id for (job_id,) in session.query(BroadcastJob.id).filter(
+                    BroadcastJob.status.in_(ACTIVE_STATUSES)
+                ).all()
+            ]
+        for job_id in job_ids:
+            logger.info(f"Resuming interrupted broadcast job {job_id}")
+            self._start_runner(job_id)
+        return len(job_ids)
+
+
+    def _start_runner(self, job_id: int) -> None:
+        with self._lock:
+            if job_id in self._runners:
+                return
+            runner = threading.Thread(
+                target=self._run_job,
+                args=(job_id,),
+                name=f"broadcast-{job_id}",
+                daemon=True
+            )
+            self._runners[job_id] = runner
+            runner.start()
+
+
+    def _run_job(self, job_id: int) -> None:
+        try:
+            while True:
+                chunk = self._claim_next_chunk(job_id)
+                if chunk is None:
+                    if self._release_runner(job_id):
+                        logger.info(f"Broadcast job {job_id} stopped")
+                        return
+                    continue
+                text, chat_ids = chunk
+                if not chat_ids:
+                    self._set_status(job_id, "done", from_statuses=("running",))
+                    logger.info(f"Broadcast job {job_id} finished")
+                    self._release_runner(job_id)
+                    return
+
+                result = self.messaging.broadcast_message(text, chat_ids, skip_unreachable=False)
+                self._record_chunk(job_id, result)
+        except Exception as e:
+            logger.error(f"Broadcast job {job_id} interrupted: {e}", exc_info=True)
+            self._set_status(job_id, "paused", from_statuses=("running",))
+            with self._lock:
+                self._runners.pop(job_id, None)
+
+
+    def _release_runner(self, job_id: int) -> bool:
+        """
+        Снятие потока с задания. Если задание успели возобновить, пока
+        поток завершал порцию, поток остается и продолжает работу.
+
+        :return: True, если поток должен завершиться
+        """
+        with self._lock:
+            job = self.get_job(job_id)
+            if job and job["status"] in ACTIVE_STATUSES:
+                return False
+            self._runners.pop(job_id, None)
+            return True
+
+
+    def _claim_next_chunk(self, job_id: int) -> Optional[tuple]:
+        """
+        Чтение следующей порции получателей и перенос курсора за нее.
+
+        Курсор переносится условным UPDATE по прежнему значению, поэтому
+        два исполнителя одного задания (например, в разных процессах)
+        никогда не получат одну и ту же порцию.
+
+        :return: (текст, chat_id получателей) или None, если задание не активно
+        """
+        while True:
+            with db_connector.session_scope() as session:
+                job = session.get(BroadcastJob, job_id)
+                if not job or job.status not in ACTIVE_STATUSES:
+                    return None
+
+                rows = self._recipients_query(session, job.target_filter).filter(
+                    User.id > job.cursor
+                ).order_by(User.id).limit(Config.BROADCAST_CHUNK_SIZE).all()
+
+                # Задание, возобновленное до завершения текущей порции, продолжает тот же поток
+                result = session.execute(
+                    update(BroadcastJob)
+                    .where(
+                        BroadcastJob.id == job_id,
+                        BroadcastJob.cursor == job.cursor,
+                        BroadcastJob.status.in_(ACTIVE_STATUSES)
+                    )
+                    .values(status="running", cursor=rows[-1].id if rows else job.cursor)
+                )
+                if result.rowcount:
+                    return job.text, [row.chat_id for row in rows]
+            logger.debug(f"Broadcast job {job_id} chunk claimed concurrently, retrying")
+
+
+    @staticmethod
+    def _recipients_query(session, target_filter: str):
+        query = session.query(User.id, User.chat_id).filter(
+            User.is_banned == False,
+            delivery.reachable(User.chat_id)
+        )
+        if target_filter.startswith("lang:"):
+            query = query.filter(User.language == target_filter.split(":", 1)[1])
+        return query
+
+
+    @staticmethod
+    def _record_chunk(job_id: int, result: Dict[str, int]) -> None:
+        with db_connector.session_scope() as session:
+            session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job_id)
+                .values(
+                    success=BroadcastJob.success + result["success"],
+                    failed=BroadcastJob.failed + result["failed"],
+                    blocked=BroadcastJob.blocked + result["blocked"]
+                )
+            )
+
+
+    @staticmethod
+    def _set_status(job_id: int, status: str, from_statuses: tuple) -> bool:
+        with db_connector.session_scope() as session:
+            result = session.execute(
+                update(BroadcastJob)
+                .where(BroadcastJob.id == job_id, BroadcastJob.status.in_(from_statuses))
+                .values(status=status)
+            )
+            return result.rowcount > 0
+
+
+    @staticmethod
+    def _job_info(job: BroadcastJob) -> Dict:
+        return {
+            "id": job.id,
+            "status": job.status,
+            "target_filter": job.target_filter,
+            "cursor": job.cursor,
+            "success": job.success,
+            "failed": job.failed,
+            "blocked": job.blocked,
+            "text": job.text
+        }
@@ -0,0 +1,171 @@
+"""
+Сводка новых обращений для администраторов при всплеске нагрузки.
+
+Пока за последнюю минуту создано не больше DIGEST_RATE_THRESHOLD
+обращений, каждое уведомление уходит сразу. При превышении порога
+обращения копятся DIGEST_WINDOW секунд, и каждый администратор получает
+одно сообщение со списком вместо отдельного уведомления на обращение.
+Когда поток спадает, уведомления снова отправляются по одному.
+"""
+import html
+import logging
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+from telebot import types
+from bot.config import Config
+from bot.services.messaging import MessagingService
+from bot.utils.callbacks import encode_callback
+
+
+logger = logging.getLogger(__name__)
+
+
+RATE_PERIOD = 60  # секунды, за которые считается частота обращений
+PREVIEW_LENGTH = 60
+MAX_BUTTONS = 8
+
+
+class NotificationDigest:
+
+    def __init__(
+        self,
+        messaging: MessagingService,
+        threshold: int = 20,
+        window: float = 15,
+        max_items: int = 20
+    ):
+        self.messaging = messaging
+        self.threshold = threshold
+        self.window = window
+        self.max_items = max_items
+        self.digests_sent = 0
+        self.coalesced = 0
+        self._arrivals = deque()
+        self._pending: List[Tuple[int, str]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_config(cls, messaging: MessagingService) -> "NotificationDigest":
+        return cls(
+            messaging,
+            threshold=Config.DIGEST_RATE_THRESHOLD,
+            window=Config.DIGEST_WINDOW,
+            max_items=Config.DIGEST_MAX_ITEMS
+        )
+
+
+    def notify_new_ticket(
+        self,
+        ticket_id: int,
+        ticket_text: str,
+        text: str,
+        keyboard: Optional[types.InlineKeyboardMarkup] = None
+    ) -> List[Future]:
+        """
+        Уведомление администраторов о новом обращении: сразу или в сводке.
+
+        :param ticket_text: Текст обращения для превью в сводке
+        :param text: Полное уведомление для обычного режима
+        :param keyboard: Клавиатура полного уведомления
+        :return: Отправки отдельных уведомлений (пустой список, если
+            обращение попало в сводку)
+        """
+        if self.threshold <= 0:
+            return self.messaging.notify_admins_async(text, keyboard)
+
+        now = time.monotonic()
+        with self._lock:
+            self._arrivals.append(now)
+            while self._arrivals and self._arrivals[0] < now - RATE_PERIOD:
+                self._arrivals.popleft()
+
+            surge = len(self._arrivals) > self.threshold
+            if not surge and not self._pending:
+                immediate = True
+            else:
+                immediate = False
+                self._pending.append((ticket_id, ticket_text))
+                if self._timer is None:
+                    logger.info(f"Ticket surge: {len(self._arrivals)}/min, coalescing for {self.window} s")
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if immediate:
+            return self.messaging.notify_admins_async(text, keyboard)
+        return []
+
+
+    def update_pending(self, ticket_id: int, ticket_text: str) -> bool:
+        """
+        Замена текста обращения, еще ожидающего отправки в сводке.
+
+        :return: True, если обращение есть среди ожидающих
+        """
+        with self._lock:
+            for index, (pending_id, _) in enumerate(self._pending):
+                if pending_id == ticket_id:
+                    self._pending[index] = (ticket_id, ticket_text)
+                    return True
+        return False
+
+
+    def flush(self) -> int:
+        """
+        Отправка накопленной сводки.
+
+        :return: Число обращений в сводке
+        """
+        with self._lock:
+            items, self._pending = self._pending, []
+            self._timer = None
+        if not items:
+            return 0
+
+        self.digests_sent += 1
+        self.coalesced += len(items)
+        self.messaging.notify_admins_async(self._render(items), self._keyboard(items))
+        return len(items)
+
+
+    def _render(self, items: List[Tuple[int, str]]) -> str:
+        lines = [f"📥 <b>Новые обращения: {len(items)}</b>", ""]
+        for ticket_id, ticket_text in items[:self.max_items]:
+            preview = " ".join(ticket_text.split())[:PREVIEW_LENGTH]
+            lines.append(f"#{ticket_id} — {html.escape(preview)}")
+        if len(items) > self.max_items:
+            lines.append(f"\n…и еще {len(items) - self.max_items}")
+        return "\n".join(lines)
+
+
+    @staticmethod
+    def _keyboard(items: List[Tuple[int, str]]) -> types.InlineKeyboardMarkup:
+        keyboard = types.InlineKeyboardMarkup(row_width=4)
+        buttons = []
+        for ticket_id, _ in items[:MAX_BUTTONS]:
+            buttons.append(types.InlineKeyboardButton(
+                text=f"✉️ {ticket_id}",
+                callback_data=encode_callback("reply", ticket_id)
+            ))
+            buttons.append(types.InlineKeyboardButton(
+                text=f"🔒 {ticket_id}",
+                callback_data=encode_callback("close", ticket_id)
+            ))
+        keyboard.add(*buttons)
+        return keyboard
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "surge": len(self._arrivals) > self.threshold > 0,
+                "pending": len(self._pending),
+                "digests_sent": self.digests_sent,
+                "coalesced": self.coalesced
+            }
@@ -0,0 +1,175 @@
+"""
+Дописывание последующих сообщений пользователя в его открытое обращение.
+
+Если пользователь пишет снова в течение TICKET_APPEND_WINDOW секунд после
+предыдущего сообщения, а обращение еще открыто, текст дописывается в него
+одним UPDATE, без новой строки, подтверждения и уведомления. Уже
+отправленные администраторам уведомления об этом обращении правятся;
+несколько сообщений подряд дают одну правку на администратора, если
+предыдущая еще ждет в очереди отправки. Обращение, ожидающее сводки,
+попадет в нее с полным текстом. Если сводка уже отправлена, администраторы
+получают полное уведомление об обращении, и дальше правится оно.
+
+Текст правки строится перед самой отправкой; если обращение к этому
+моменту закрыто, уведомление остается без кнопок.
+
+Последнее обращение пользователя и ID уведомлений хранятся в памяти
+процесса. Обновления одного чата всегда обрабатывает один процесс, а
+после перезапуска первое сообщение просто открывает новое обращение.
+"""
+import functools
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Set, Tuple
+from telebot import types
+from bot.database.crud import crud
+from bot.database.connector import db_connector
+from bot.services.digest import NotificationDigest
+from bot.services.messaging import MessagingService
+
+
+logger = logging.getLogger(__name__)
+
+
+SEPARATOR = "\n\n"
+MAX_TRACKED_USERS = 10000
+
+Render = Callable[[str], Tuple[str, Optional[types.InlineKeyboardMarkup]]]
+
+
+class _OpenTicket:
+
+    def __init__(self, ticket_id: int, text: str, render: Render, notifications: List[Future]):
+        self.ticket_id = ticket_id
+        self.text = text
+        self.render = render
+        self.notifications = notifications
+        self.updated_at = time.monotonic()
+        self.queued_edits: Set[int] = set()
+
+
+class FollowUpTracker:
+
+    def __init__(self, messaging: MessagingService, digest: NotificationDigest, window: float = 300):
+        self.messaging = messaging
+        self.digest = digest
+        self.window = window
+        self.appended = 0
+        self.edits = 0
+        self._tickets: "OrderedDict[int, _OpenTicket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def track(
+        self,
+        user_id: int,
+        ticket_id: int,
+        text: str,
+        render: Render,
+        notifications: List[Future]
+    ) -> None:
+        """
+        Запоминание нового обращения пользователя.
+
+        :param render: Построение уведомления администратора по тексту обращения
+        :param notifications: Отправки уведомлений, результат - словарь сообщения
+        """
+        if self.window <= 0:
+            return
+        entry = _OpenTicket(ticket_id, text, render, list(notifications))
+        with self._lock:
+            self._tickets[user_id] = entry
+            self._tickets.move_to_end(user_id)
+            while len(self._tickets) > MAX_TRACKED_USERS:
+                self._tickets.popitem(last=False)
+
+
+    def append(self, user_id: int, text: str) -> Optional[int]:
+        """
+        Дописывание сообщения в недавнее открытое обращение пользователя.
+
+        :param user_id: ID пользователя в БД
+        :return: ID обращения или None, если нужно создать новое
+        """
+        if self.window <= 0:
+            return None
+
+        with self._lock:
+            entry = self._tickets.get(user_id)
+            if entry is None or time.monotonic() - entry.updated_at > self.window:
+                self._tickets.pop(user_id, None)
+                return None
+
+        with db_connector.session_scope() as session:
+            appended = crud.append_to_ticket(session, entry.ticket_id, text, SEPARATOR)
+        if not appended:  # обращение закрыто администратором
+            with self._lock:
+                self._tickets.pop(user_id, None)
+            return None
+
+        with self._lock:
+            entry.text = f"{entry.text}{SEPARATOR}{text}"
+            entry.updated_at = time.monotonic()
+            self.appended += 1
+
+        if not self.digest.update_pending(entry.ticket_id, entry.text) and not entry.notifications:
+            # Сводка ушла с первым сообщением: дописанный текст иначе никто не увидит
+            text, keyboard = entry.render(entry.text)
+            entry.notifications = self.messaging.notify_admins_async(text, keyboard)
+            return entry.ticket_id
+
+        for future in entry.notifications:
+            future.add_done_callback(functools.partial(self._edit_notification, entry))
+        return entry.ticket_id
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tracked": len(self._tickets), "appended": self.appended, "edits": self.edits}
+
+
+    def _edit_notification(self, entry: _OpenTicket, future: Future) -> None:
+        if future.exception() is not None:
+            return
+        sent = future.result() or {}
+        admin_id, message_id = sent.get("chat", {}).get("id"), sent.get("message_id")
+        if admin_id is None or message_id is None:
+            return
+
+        with self._lock:
+            # Правка уже в очереди: она покажет и этот текст
+            if admin_id in entry.queued_edits:
+                return
+            entry.queued_edits.add(admin_id)
+            self.edits += 1
+
+        def render():
+            with self._lock:
+                entry.queued_edits.discard(admin_id)
+                text = entry.text
+            message_text, keyboard = entry.render(text)
+            # Обращение могли закрыть, пока правка ждала в очереди
+            if self._is_closed(entry.ticket_id):
+                keyboard = None
+            return message_text, keyboard
+
+        edit = self.messaging.submit_edit(admin_id, message_id, render)
+        edit.add_done_callback(functools.partial(self._log_edit_error, entry.ticket_id, admin_id))
+
+
+    @staticmethod
+    def _is_closed(ticket_id: int) -> bool:
+        with db_connector.session_scope() as session:
+            ticket = crud.get_ticket(session, ticket_id)
+            return ticket is None or ticket.status == "closed"
+
+
+    @staticmethod
+    def _log_edit_error(ticket_id: int, admin_id: int, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Failed to update notification for ticket #{ticket_id} to admin {admin_id}: {error}")
@@ -0,0 +1,258 @@
+"""
+Ограничение входящих сообщений от пользователей.
+
+Проверка выполняется до обращения к БД: у каждого пользователя в памяти
+процесса есть корзина токенов (INGRESS_RATE сообщений/с, запас
+INGRESS_BURST) и счетчик одинаковых сообщений подряд. Сообщение сверх
+лимита или повтор сверх INGRESS_DUPLICATE_LIMIT отбрасывается без
+обращения и уведомлений администраторам и засчитывается как нарушение.
+О первом отброшенном сообщении пользователь узнает (WARNED), следующие
+в течение INGRESS_WARN_INTERVAL отбрасываются молча.
+
+Каждые INGRESS_MUTE_STRIKES нарушений пользователь отключается на
+INGRESS_MUTE_SECONDS (MUTED, об этом тоже сообщается один раз). После
+INGRESS_BAN_STRIKES нарушений (если задано) вызывается on_ban.
+Нарушения забываются через INGRESS_STRIKE_TTL секунд без новых. При
+INGRESS_PERSIST_STRIKES счетчик и время отключения сохраняются в таблице
+user_strikes при отключении и блокировке и читаются при первом сообщении
+пользователя в процессе, поэтому отключение переживает перезапуск.
+"""
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+from bot.config import Config
+from bot.database.connector import db_connector
+from bot.database.models import UserStrike
+from bot.services.scheduler import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+
+ALLOWED = "allowed"
+THROTTLED = "throttled"  # сообщение отброшено, пользователь уже предупрежден
+WARNED = "warned"        # сообщение отброшено, нужно предупредить пользователя
+MUTED = "muted"          # сообщение отброшено, нужно сообщить об отключении
+BANNED = "banned"        # сообщение отброшено, пользователь заблокирован
+
+MAX_TRACKED_USERS = 50000
+
+
+class _UserState:
+    __slots__ = (
+        "bucket", "last_text", "repeats", "strikes", "struck_at", "muted_until", "warned_until", "loaded"
+    )
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.last_text: Optional[int] = None
+        self.repeats = 0
+        self.strikes = 0
+        self.struck_at = 0.0
+        self.muted_until = 0.0
+        self.warned_until = 0.0
+        self.loaded = False
+
+
+class IngressLimiter:
+
+    def __init__(
+        self,
+        rate: float = 1,
+        burst: float = 20,
+        duplicate_limit: int = 5,
+        mute_strikes: int = 20,
+        mute_seconds: int = 600,
+        warn_interval: int = 60,
+        ban_strikes: int = 0,
+        strike_ttl: int = 86400,
+        persist: bool = False,
+        exempt: Iterable[int] = (),
+        on_ban: Optional[Callable[[int, str], None]] = None
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.duplicate_limit = duplicate_limit
+        self.mute_strikes = mute_strikes
+        self.mute_seconds = mute_seconds
+        self.warn_interval = warn_interval
+        self.ban_strikes = ban_strikes
+        self.strike_ttl = strike_ttl
+        self.persist = persist
+        self.exempt = frozenset(exempt)
+        self.on_ban = on_ban
+        self.throttled = 0
+        self.mutes = 0
+        self.bans = 0
+        self._users: "OrderedDict[int, _UserState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_config(cls, on_ban: Optional[Callable[[int, str], None]] = None) -> "IngressLimiter":
+        return cls(
+            rate=Config.INGRESS_RATE,
+            burst=Config.INGRESS_BURST,
+            duplicate_limit=Config.INGRESS_DUPLICATE_LIMIT,
+            mute_strikes=Config.INGRESS_MUTE_STRIKES,
+            mute_seconds=Config.INGRESS_MUTE_SECONDS,
+            warn_interval=Config.INGRESS_WARN_INTERVAL,
+            ban_strikes=Config.INGRESS_BAN_STRIKES,
+            strike_ttl=Config.INGRESS_STRIKE_TTL,
+            persist=Config.INGRESS_PERSIST_STRIKES,
+            exempt=Config.ADMIN_IDS,
+            on_ban=on_ban
+        )
+
+
+    def check(self, user_id: int, text: Optional[str]) -> str:
+        """
+        Проверка входящего сообщения.
+
+        :param user_id: Telegram ID отправителя
+        :param text: Текст сообщения
+        :return: ALLOWED, THROTTLED, WARNED, MUTED или BANNED
+        """
+        if user_id in self.exempt:
+            return ALLOWED
+
+        with self._lock:
+            state = self._state(user_id)
+            needs_load = self.persist and not state.loaded
+            state.loaded = True
+
+        # Сохраненные нарушения и отключение читаются один раз, при первом сообщении
+        if needs_load:
+            self._load(user_id, state)
+
+        now = time.time()
+        bucket_now = time.monotonic()
+        fingerprint = hash(" ".join((text or "").split()).casefold())
+        with self._lock:
+            if state.muted_until > now:
+                self.throttled += 1
+                return self._notice(state, now)
+
+            if fingerprint == state.last_text:
+                state.repeats += 1
+            else:
+                state.last_text = fingerprint
+                state.repeats = 1
+
+            duplicate = 0 < self.duplicate_limit < state.repeats
+            limited = state.bucket is not None and state.bucket.wait_time(bucket_now) > 0
+            if not duplicate and not limited:
+                if state.bucket is not None:
+                    state.bucket.consume(bucket_now)
+                return ALLOWED
+
+            self.throttled += 1
+            if now - state.struck_at > self.strike_ttl:
+                state.strikes = 0
+            state.strikes += 1
+            state.struck_at = now
+            strikes = state.strikes
+
+            if 0 < self.ban_strikes <= strikes:
+                # После блокировки счет начинается заново, если ее снимут
+                verdict = BANNED
+                state.strikes = 0
+                state.muted_until = now + self.mute_seconds
+                self.bans += 1
+            elif self.mute_strikes > 0 and strikes % self.mute_strikes == 0:
+                verdict = MUTED
+                state.muted_until = now + self.mute_seconds
+                self.mutes += 1
+            else:
+                return self._notice(state, now)
+            state.warned_until = muted_until = state.muted_until
+
+        logger.warning(f"User {user_id} {verdict} by ingress limiter after {strikes} strikes")
+        if self.persist:
+            self._save(user_id, 0 if verdict == BANNED else strikes, muted_until, now)
+        if verdict == BANNED and self.on_ban:
+            try:
+                self.on_ban(user_id, f"Автоблокировка: {strikes} нарушений лимита сообщений")
+            except Exception as e:
+                logger.error(f"Auto-ban of user {user_id} failed: {e}", exc_info=True)
+        return verdict
+
+
+    def mute_remaining(self, user_id: int) -> float:
+        """
+        :return: Секунды до конца отключения пользователя, 0 - не отключен
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            return max(0.0, state.muted_until - time.time()) if state else 0.0
+
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            muted = sum(1 for state in self._users.values() if state.muted_until > now)
+            return {
+                "tracked": len(self._users),
+                "muted": muted,
+                "throttled": self.throttled,
+                "mutes": self.mutes,
+                "bans": self.bans
+            }
+
+
+    def _notice(self, state: _UserState, now: float) -> str:
+        # Вызывается под self._lock для отброшенного сообщения
+        if state.warned_until > now:
+            return THROTTLED
+        if state.muted_until > now:
+            state.warned_until = state.muted_until
+            return MUTED
+        state.warned_until = now + self.warn_interval
+        return WARNED
+
+
+    def _state(self, user_id: int) -> _UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            state = _UserState(self.rate, self.burst)
+            self._users[user_id] = state
+            while len(self._users) > MAX_TRACKED_USERS:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return state
+
+
+    def _load(self, user_id: int, state: _UserState) -> None:
+        try:
+            with db_connector.session_scope() as session:
+                row = session.get(UserStrike, user_id)
+                if row is None or time.time() - row.updated_at > self.strike_ttl:
+                    return
+                strikes, muted_until, updated_at = row.strikes, row.muted_until, row.updated_at
+        except Exception as e:
+            logger.error(f"Failed to load strikes for user {user_id}: {e}")
+            return
+
+        with self._lock:
+            if strikes > state.strikes:
+                state.strikes = strikes
+                state.struck_at = max(state.struck_at, updated_at)
+            state.muted_until = max(state.muted_until, muted_until)
+
+
+    @staticmethod
+    def _save(user_id: int, strikes: int, muted_until: float, now: float) -> None:
+        try:
+            with db_connector.session_scope() as session:
+                session.merge(UserStrike(
+                    user_id=user_id,
+                    strikes=strikes,
+                    muted_until=int(muted_until),
+                    updated_at=int(now)
+                ))
+        except Exception as e:
+            logger.error(f"Failed to save strikes for user {user_id}: {e}")
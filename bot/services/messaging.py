@@ -1,19 +1,41 @@
+import functools
+import html
+import json
 import logging
 import time
 
-from typing import Optional, Union, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple, Union, List
 from telebot import TeleBot, types
 from telebot.types import ReplyKeyboardMarkup, InlineKeyboardMarkup, Message
 from telebot.apihelper import ApiTelegramException
-from bot.database import crud
+from bot.database.crud import crud
+from bot.database import delivery
 from bot.database.connector import db_connector
 from bot.config import Config, BotMessages
+from bot.services import outbox
+from bot.services.scheduler import ScheduledTeleBot, Priority
+from bot.services.retry import RetryPolicy, ErrorKind, classify_error
+from bot.services.transport import api_request
 from bot.utils.keyboards import get_admin_ticket_keyboard
+from bot.utils.metrics import LatencyStats
 
 
 logger = logging.getLogger(__name__)
 
 
+admin_notification_latency = LatencyStats()
+
+_NO_LINK_PREVIEW = json.dumps({"is_disabled": True})
+_NO_PREVIEW_OPTIONS = types.LinkPreviewOptions(is_disabled=True)
+
+# Пул для параллельных отправок, если бот работает без OutboundScheduler
+_fallback_executor = ThreadPoolExecutor(
+    max_workers=Config.SENDER_WORKERS,
+    thread_name_prefix="send"
+)
+
+
 class MessagingService:
 
     def __init__(self, bot: TeleBot):
@@ -29,23 +51,138 @@ class MessagingService:
         disable_web_page_preview: Optional[bool] = True,
         max_retries: int = 2
     ) -> Optional[Message]:
-        for attempt in range(max_retries):
+        return self._deliver(
+            chat_id,
+            lambda: self.bot.send_message(
+                chat_id=chat_id,
+                text=text,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup,
+                disable_web_page_preview=disable_web_page_preview
+            ),
+            max_retries
+        )
+
+
+    def send_raw(
+        self,
+        chat_id: Union[int, str],
+        text: str,
+        parse_mode: Optional[str] = "HTML",
+        reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
+        disable_web_page_preview: Optional[bool] = True,
+        max_retries: int = 2
+    ) -> bool:
+        """
+        Отправка без построения telebot.types.Message из ответа: проверяются
+        только ok и error_code. Для вызовов, которым не нужен результат.
+
+        :return: True, если сообщение доставлено (в асинхронном режиме -
+            если отправка поставлена в outbox)
+        """
+        if outbox.defer(
+            "send_message",
+            chat_id,
+            text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup,
+            link_preview_options=_NO_PREVIEW_OPTIONS if disable_web_page_preview else None
+        ):
+            return True
+
+        def post():
+            return self._post_message(
+                chat_id,
+                text,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup,
+                disable_web_page_preview=disable_web_page_preview
+            )
+
+        if isinstance(self.bot, ScheduledTeleBot):
+            send = lambda: self.bot.scheduler.call(chat_id, post, Priority.HIGH)
+        else:
+            send = post
+        return self._deliver(chat_id, send, max_retries) is not None
+
+
+    def _deliver(self, chat_id: Union[int, str], send: Callable[[], Any], max_retries: int) -> Any:
+        # ScheduledTeleBot повторяет отправку сам, с учетом retry_after и flood control
+        if isinstance(self.bot, ScheduledTeleBot):
+            max_retries = 1
+        retry_policy = RetryPolicy(
+            max_attempts=max_retries,
+            base_delay=Config.SEND_RETRY_BASE_DELAY,
+            max_delay=Config.SEND_RETRY_MAX_DELAY
+        )
+
+        for attempt in range(1, max_retries + 1):
             try:
-                return self.bot.send_message(
-                    chat_id=chat_id,
-                    text=text,
-                    parse_mode=parse_mode,
-                    reply_markup=reply_markup,
-                    disable_web_page_preview=disable_web_page_preview
-                )
-            except ApiTelegramException as e:
-                logger.error(f"Error sending message to {chat_id} (attempt {attempt + 1}): {e}")
-                if e.error_code == 403:  # Бот заблокирован пользователем
-                    self._handle_blocked_user(chat_id)
+                return send()
+            except Exception as e:
+                kind = classify_error(e)
+                logger.error(f"Error sending message to {chat_id} (attempt {attempt}, {kind}): {e}")
+                if kind == ErrorKind.FORBIDDEN:  # Бот заблокирован пользователем
+                    self._handle_blocked_user(chat_id, e)
                     return None
-                if attempt == max_retries - 1:
-                    logger.error(f"Failed to send message after {max_retries} attempts")
+
+                delay = retry_policy.next_delay(attempt, e)
+                if delay is None:
+                    logger.error(f"Failed to send message to {chat_id} after {attempt} attempts")
                     raise
+                time.sleep(delay)
+
+
+    def _post_message(
+        self,
+        chat_id: Union[int, str],
+        text: str,
+        parse_mode: Optional[str] = None,
+        reply_markup: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup]] = None,
+        disable_web_page_preview: Optional[bool] = None
+    ) -> dict:
+        """
+        Запрос sendMessage через transport.api_request. Ошибки API поднимаются
+        как ApiTelegramException с error_code и retry_after, как у TeleBot.
+
+        :return: Поле result ответа без преобразования в типы telebot
+        """
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup is not None:
+            payload["reply_markup"] = reply_markup.to_json()
+        if disable_web_page_preview:
+            payload["link_preview_options"] = _NO_LINK_PREVIEW
+        return api_request(self.bot.token, "sendMessage", payload)
+
+
+    def _edit_message(
+        self,
+        chat_id: Union[int, str],
+        message_id: int,
+        render: Callable[[], Tuple[str, Optional[InlineKeyboardMarkup]]]
+    ) -> dict:
+        """
+        Запрос editMessageText через transport.api_request. Текст и клавиатура
+        строятся render() непосредственно перед запросом.
+        """
+        text, reply_markup = render()
+        payload = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": "HTML",
+            "link_preview_options": _NO_LINK_PREVIEW
+        }
+        if reply_markup is not None:
+            payload["reply_markup"] = reply_markup.to_json()
+        try:
+            return api_request(self.bot.token, "editMessageText", payload)
+        except ApiTelegramException as e:
+            if "message is not modified" in (e.description or ""):
+                return {}
+            raise
 
 
     def notify_admins(
@@ -55,18 +192,50 @@ class MessagingService:
         exclude_admin_ids: Optional[List[int]] = None
     ) -> int:
         success_count = 0
-        exclude_admin_ids = exclude_admin_ids or []
-        
-        for admin_id in set(Config.ADMIN_IDS) - set(exclude_admin_ids):
+        for future in self.notify_admins_async(text, keyboard, exclude_admin_ids):
             try:
-                self.send_message(admin_id, text, reply_markup=keyboard)
+                future.result()
                 success_count += 1
-            except Exception as e:
-                logger.error(f"Failed to notify admin {admin_id}: {e}")
+            except Exception:
+                pass  # ошибка уже записана в _record_admin_notification
         
         return success_count
 
 
+    def notify_admins_async(
+        self,
+        text: str,
+        keyboard: Optional[types.InlineKeyboardMarkup] = None,
+        exclude_admin_ids: Optional[List[int]] = None
+    ) -> List[Future]:
+        """
+        Параллельная рассылка администраторам без ожидания результата.
+        Задержка доставки каждого уведомления записывается в
+        admin_notification_latency.
+        """
+        started_at = time.monotonic()
+        futures = []
+        admin_ids = set(Config.ADMIN_IDS) - set(exclude_admin_ids or [])
+        with db_connector.session_scope() as session:
+            admin_ids = delivery.filter_reachable(session, admin_ids)
+        for admin_id in admin_ids:
+            future = self.submit(admin_id, text, Priority.NORMAL, reply_markup=keyboard)
+            future.add_done_callback(
+                functools.partial(self._record_admin_notification, admin_id, started_at)
+            )
+            futures.append(future)
+        return futures
+
+
+    def _record_admin_notification(self, admin_id: int, started_at: float, future: Future) -> None:
+        error = future.exception()
+        admin_notification_latency.record(time.monotonic() - started_at, ok=error is None)
+        if error is not None and classify_error(error) == ErrorKind.FORBIDDEN:
+            self._handle_blocked_user(admin_id, error)
+        if error is not None:
+            logger.error(f"Failed to notify admin {admin_id}: {error}")
+
+
     def notify_about_new_ticket(self, ticket_id: int, user_id: int) -> int:
         with db_connector.session_scope() as session:
             ticket = crud.get_ticket(session, ticket_id)
@@ -76,12 +245,12 @@ class MessagingService:
                 logger.error(f"Ticket {ticket_id} or user {user_id} not found")
                 return 0
             
-            message_text = BotMessages.ADMIN_NOTIFICATION.format(
+            message_text = BotMessages.ADMIN_NOTIFICATION[user.language or Config.DEFAULT_LANGUAGE].format(
                 ticket_id=ticket.id,
-                username=user.username or "N/A",
+                username=html.escape(user.username or "N/A"),
                 user_id=user.id,
                 date=ticket.created_at.strftime('%d.%m.%Y %H:%M'),
-                message=ticket.message
+                message=html.escape(ticket.message)
             )
             
             keyboard = get_admin_ticket_keyboard(ticket.id)
@@ -100,22 +269,24 @@ class MessagingService:
                 logger.error(f"Ticket {ticket_id} not found")
                 return False
                 
-            user = crud.get_user(session, ticket.user_id)
+            user = crud.get_user_by_id(session, ticket.user_id)
             if not user or user.is_banned:
                 logger.error(f"User {ticket.user_id} not found or banned")
                 return False
             
             try:
-                response_text = BotMessages.USER_REPLY.format(
+                response_text = BotMessages.USER_REPLY[user.language].format(
                     ticket_id=ticket_id,
                     reply_text=reply_text
                 )
                 
-                self.send_message(user.chat_id, response_text)
+                if not self.send_raw(user.chat_id, response_text):
+                    logger.error(f"Reply to ticket {ticket_id} was not delivered, ticket stays open")
+                    return False
                 
-                crud.update_ticket(
+                crud.bulk_update_tickets(
                     session,
-                    ticket_id,
+                    [ticket_id],
                     {
                         "status": "closed",
                         "admin_id": admin_id,
@@ -123,13 +294,12 @@ class MessagingService:
                     }
                 )
                 
-                crud.log_admin_action(
-                    session,
-                    admin_id=admin_id,
-                    action="reply",
-                    target_user_id=user.id,
-                    details=f"Ticket #{ticket_id}"
-                )
+                crud.bulk_log_admin_actions(session, [{
+                    "admin_id": admin_id,
+                    "action": "reply",
+                    "target_user_id": user.id,
+                    "details": f"Ticket #{ticket_id}"
+                }])
                 
                 return True
                 
@@ -138,41 +308,84 @@ class MessagingService:
                 return False
 
 
-    def _handle_blocked_user(self, chat_id: int) -> None:
+    def _handle_blocked_user(self, chat_id: int, error: BaseException) -> None:
         with db_connector.session_scope() as session:
-            user = crud.get_user(session, chat_id)
-            if user:
-                crud.update_user(session, user.id, {"is_banned": True})
-                logger.info(f"User {chat_id} blocked the bot, marked as banned")
+            delivery.record_results(
+                session,
+                failed={chat_id: getattr(error, "error_code", 403)},
+                unreachable=[chat_id]
+            )
+        logger.info(f"Chat {chat_id} blocked the bot, marked as unreachable")
 
 
-    def broadcast_message(
-        self,
-        text: str,
-        user_ids: List[int],
-        batch_size: int = 20,
-        delay: float = 0.5
-    ) -> dict:
+    def broadcast_message(self, text: str, chat_ids: List[int], skip_unreachable: bool = True) -> dict:
+        """
+        Рассылка через очередь планировщика с приоритетом BULK: скорость
+        определяется лимитами планировщика, а не паузами между пачками.
+        Результаты доставки записываются в журнал одной транзакцией.
+
+        :param skip_unreachable: Исключить недоступные чаты (не нужно, если
+            получатели уже выбраны запросом с delivery.reachable)
+        """
         result = {'success': 0, 'failed': 0, 'blocked': 0}
-        
-        for i in range(0, len(user_ids), batch_size):
-            batch = user_ids[i:i + batch_size]
-            for user_id in batch:
-                try:
-                    self.send_message(user_id, text)
-                    result['success'] += 1
-                except ApiTelegramException as e:
-                    if e.error_code == 403:
-                        result['blocked'] += 1
-                        self._handle_blocked_user(user_id)
-                    else:
-                        result['failed'] += 1
-                        logger.error(f"Failed to broadcast to {user_id}: {e}")
-                except Exception as e:
+        if skip_unreachable:
+            with db_connector.session_scope() as session:
+                chat_ids = delivery.filter_reachable(session, chat_ids)
+
+        delivered, failed, unreachable = [], {}, []
+        pending = [(chat_id, self.submit(chat_id, text, Priority.BULK)) for chat_id in chat_ids]
+        for chat_id, future in pending:
+            try:
+                future.result()
+                result['success'] += 1
+                delivered.append(chat_id)
+            except ApiTelegramException as e:
+                failed[chat_id] = e.error_code
+                if classify_error(e) == ErrorKind.FORBIDDEN:
+                    result['blocked'] += 1
+                    unreachable.append(chat_id)
+                else:
                     result['failed'] += 1
-                    logger.error(f"Error broadcasting to {user_id}: {e}")
-            
-            if i + batch_size < len(user_ids):
-                time.sleep(delay)
-        
+                    logger.error(f"Failed to broadcast to {chat_id}: {e}")
+            except Exception as e:
+                result['failed'] += 1
+                logger.error(f"Error broadcasting to {chat_id}: {e}")
+
+        with db_connector.session_scope() as session:
+            delivery.record_results(session, delivered, failed, unreachable)
         return result
+
+
+    def submit(self, chat_id: int, text: str, priority: int = Priority.BULK, **kwargs) -> Future:
+        """
+        Постановка сообщения в очередь отправки без ожидания результата.
+        Отправка идет через _post_message: результат Future - словарь ответа.
+        """
+        kwargs.setdefault("parse_mode", "HTML")
+        kwargs.setdefault("disable_web_page_preview", True)
+        post = functools.partial(self._post_message, chat_id, text, **kwargs)
+        return self._schedule(chat_id, post, priority)
+
+
+    def submit_edit(
+        self,
+        chat_id: int,
+        message_id: int,
+        render: Callable[[], Tuple[str, Optional[InlineKeyboardMarkup]]],
+        priority: int = Priority.NORMAL
+    ) -> Future:
+        """
+        Постановка правки сообщения в очередь отправки. Текст строится в
+        момент отправки, поэтому правка, долго ждавшая в очереди, показывает
+        последнюю версию.
+
+        :param render: Функция без аргументов, возвращающая (текст, клавиатура)
+        """
+        edit = functools.partial(self._edit_message, chat_id, message_id, render)
+        return self._schedule(chat_id, edit, priority)
+
+
+    def _schedule(self, chat_id: int, func: Callable[[], Any], priority: int) -> Future:
+        if isinstance(self.bot, ScheduledTeleBot):
+            return self.bot.scheduler.submit(chat_id, func, priority)
+        return _fallback_executor.submit(func)
@@ -0,0 +1,102 @@
+"""
+Отложенные вызовы Bot API для асинхронного режима (RUN_MODE=async).
+
+Синхронные обработчики выполняются в пуле потоков внутри collect(). Пока
+он активен, вызовы send_message, edit_message_text,
+edit_message_reply_markup, delete_message и answer_callback_query
+(а также MessagingService.send_raw) не выполняются в потоке, а
+записываются в Outbox. После возврата обработчика цикл событий выполняет
+их по порядку через сессию AsyncTeleBot: поток занят только работой с БД,
+а ожидание ответа Telegram его не держит.
+
+Отложенный вызов возвращает None (send_raw - True), потому что результат
+станет известен позже. Ошибки доставки обрабатываются при выполнении.
+Вне collect() все вызовы работают как обычно.
+"""
+import functools
+import threading
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from bot.services.scheduler import ScheduledTeleBot
+
+
+DEFERRED_METHODS = (
+    "send_message",
+    "edit_message_text",
+    "edit_message_reply_markup",
+    "delete_message",
+    "answer_callback_query"
+)
+
+
+class Outbox:
+
+    def __init__(self):
+        self.calls: List[Tuple[str, Tuple[Any, ...], Dict[str, Any]]] = []
+
+
+    def add(self, method: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+        self.calls.append((method, args, kwargs))
+
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+
+_local = threading.local()
+
+
+def current() -> Optional[Outbox]:
+    return getattr(_local, "outbox", None)
+
+
+@contextmanager
+def collect() -> Iterator[Outbox]:
+    """
+    Сбор вызовов Bot API текущего потока в Outbox.
+    """
+    outbox, previous = Outbox(), current()
+    _local.outbox = outbox
+    try:
+        yield outbox
+    finally:
+        _local.outbox = previous
+
+
+def defer(method: str, *args, **kwargs) -> bool:
+    """
+    Запись вызова в Outbox текущего потока.
+
+    :return: False, если сбор не активен и вызов нужно выполнить сразу
+    """
+    outbox = current()
+    if outbox is None:
+        return False
+    outbox.add(method, args, kwargs)
+    return True
+
+
+def _deferrable(name: str):
+    base = getattr(ScheduledTeleBot, name)
+
+    @functools.wraps(base)
+    def method(self, *args, **kwargs):
+        if current() is None:
+            return base(self, *args, **kwargs)
+        kwargs.pop("priority", None)  # приоритет есть только у планировщика
+        defer(name, *args, **kwargs)
+        return None
+
+    return method
+
+
+class DeferringTeleBot(ScheduledTeleBot):
+    """
+    ScheduledTeleBot, который внутри collect() откладывает вызовы
+    DEFERRED_METHODS вместо их выполнения.
+    """
+
+
+for _name in DEFERRED_METHODS:
+    setattr(DeferringTeleBot, _name, _deferrable(_name))
@@ -0,0 +1,148 @@
+"""
+Классификация ошибок Telegram API и политика повторов.
+
+- 429 (flood control): повтор не раньше retry_after из ответа сервера;
+  повторяющиеся 429 размыкают CircuitBreaker и приостанавливают все отправки.
+- 5xx и сетевые ошибки: экспоненциальная задержка со случайным разбросом.
+- 400, 403 и прочие ошибки клиента: без повторов.
+"""
+import random
+import threading
+import time
+
+from collections import deque
+from typing import Optional
+from requests import exceptions as requests_exceptions
+from telebot.apihelper import ApiTelegramException, ApiHTTPException
+from bot.config import Config
+
+
+class ErrorKind:
+    FLOOD = "flood"
+    SERVER = "server"
+    NETWORK = "network"
+    BAD_REQUEST = "bad_request"
+    FORBIDDEN = "forbidden"
+    UNKNOWN = "unknown"
+
+
+RETRYABLE = {ErrorKind.FLOOD, ErrorKind.SERVER, ErrorKind.NETWORK}
+
+
+def classify_error(error: BaseException) -> str:
+    if isinstance(error, ApiTelegramException):
+        code = error.error_code
+    elif isinstance(error, ApiHTTPException):
+        code = getattr(error.result, "status_code", None)
+    elif isinstance(error, (requests_exceptions.ConnectionError, requests_exceptions.Timeout)):
+        return ErrorKind.NETWORK
+    elif getattr(error, "error_code", None) is not None:
+        # telebot.asyncio_helper.ApiTelegramException (модуль требует aiohttp)
+        code = error.error_code
+    elif isinstance(error, (TimeoutError, OSError)):
+        return ErrorKind.NETWORK
+    else:
+        return ErrorKind.UNKNOWN
+
+    if code == 429:
+        return ErrorKind.FLOOD
+    if code == 403:
+        return ErrorKind.FORBIDDEN
+    if code is not None and 500 <= code < 600:
+        return ErrorKind.SERVER
+    if code is not None and 400 <= code < 500:
+        return ErrorKind.BAD_REQUEST
+    return ErrorKind.UNKNOWN
+
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    result_json = getattr(error, "result_json", None) or {}
+    retry_after = (result_json.get("parameters") or {}).get("retry_after")
+    return float(retry_after) if retry_after is not None else None
+
+
+class RetryPolicy:
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+
+    @classmethod
+    def from_config(cls) -> "RetryPolicy":
+        return cls(
+            max_attempts=Config.SEND_MAX_ATTEMPTS,
+            base_delay=Config.SEND_RETRY_BASE_DELAY,
+            max_delay=Config.SEND_RETRY_MAX_DELAY
+        )
+
+
+    def next_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        Задержка перед следующей попыткой или None, если повторять не нужно.
+
+        :param attempt: Номер неудавшейся попытки, начиная с 1
+        """
+        kind = classify_error(error)
+        if kind not in RETRYABLE or attempt >= self.max_attempts:
+            return None
+
+        if kind == ErrorKind.FLOOD:
+            retry_after = get_retry_after(error) or self.base_delay
+            return retry_after + random.uniform(0, self.base_delay)
+
+        # Full jitter: случайная задержка в [0, base * 2^(attempt-1)]
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Приостанавливает все отправки, если за window секунд получено
+    threshold ответов 429. Пауза длится не меньше самого большого
+    retry_after и не меньше cooldown.
+    """
+
+    def __init__(self, threshold: int = 3, window: float = 10, cooldown: float = 5):
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.paused_until = 0.0
+        self.trips = 0
+        self._floods = deque()
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_config(cls) -> "CircuitBreaker":
+        return cls(
+            threshold=Config.FLOOD_BREAKER_THRESHOLD,
+            window=Config.FLOOD_BREAKER_WINDOW,
+            cooldown=Config.FLOOD_BREAKER_COOLDOWN
+        )
+
+
+    def record_flood(self, retry_after: Optional[float]) -> bool:
+        """
+        :return: True, если отправки приостановлены этим вызовом
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._floods.append(now)
+            while self._floods and self._floods[0] < now - self.window:
+                self._floods.popleft()
+            if len(self._floods) < self.threshold:
+                return False
+
+            self._floods.clear()
+            self.trips += 1
+            self.paused_until = max(
+                self.paused_until,
+                now + max(retry_after or 0, self.cooldown)
+            )
+            return True
+
+
+    def pause_remaining(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
@@ -0,0 +1,406 @@
+"""
+Планировщик исходящих сообщений.
+
+Все отправки проходят через общую очередь с приоритетами, которую
+разбирает пул потоков-отправителей. Скорость ограничена двумя видами
+token bucket: общим (лимит Telegram ~30 сообщений/с на бота) и отдельным
+для каждого чата (~1 сообщение/с). Сообщение в чат, который исчерпал свой
+лимит, откладывается, не задерживая отправку в другие чаты.
+
+Неудачные отправки классифицируются (см. retry.py): повторяемые ошибки
+возвращаются в очередь с задержкой, ответ 429 снижает общую скорость
+(AIMD: уменьшение в разы, восстановление понемногу после успешных отправок),
+а серия 429 приостанавливает все отправки через CircuitBreaker.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Union
+from telebot import TeleBot
+from bot.config import Config
+from bot.services.retry import RetryPolicy, CircuitBreaker, ErrorKind, classify_error, get_retry_after
+
+
+logger = logging.getLogger(__name__)
+
+
+class Priority:
+    HIGH = 0     # ответы на действия пользователей и администраторов
+    NORMAL = 1   # уведомления администраторов
+    BULK = 2     # рассылки
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+    def wait_time(self, now: float) -> float:
+        """
+        Время до появления токена (0, если токен доступен сейчас).
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _SendJob:
+    __slots__ = ("chat_id", "func", "future", "priority", "attempts")
+
+    def __init__(self, chat_id: Union[int, str], func: Callable[[], Any], priority: int):
+        self.chat_id = chat_id
+        self.func = func
+        self.priority = priority
+        self.future = Future()
+        self.attempts = 0
+
+
+class OutboundScheduler:
+
+    RATE_WINDOW = 10.0       # окно расчета скорости отправки, секунды
+    BUCKET_PRUNE_EVERY = 1000
+    RATE_DECREASE_FACTOR = 0.5
+    RATE_RECOVERY_STEP = 0.1    # сообщений/с на каждую успешную отправку
+    RATE_DECREASE_INTERVAL = 1.0  # не чаще одного снижения скорости в секунду
+    MIN_GLOBAL_RATE = 1.0
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        workers: int = 4,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.max_global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        self._ready = []     # (priority, seq, job)
+        self._delayed = []   # (ready_at, seq, job)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = False
+        self._in_flight = 0
+
+        self._sent_times = deque()
+        self.sent_total = 0
+        self.failed_total = 0
+        self.retried_total = 0
+        self.flood_total = 0
+        self._rate_decreased_at = 0.0
+
+
+    @classmethod
+    def from_config(cls, global_rate: Optional[float] = None) -> "OutboundScheduler":
+        """
+        :param global_rate: Лимит отправки этого экземпляра, по умолчанию GLOBAL_SEND_RATE
+        """
+        return cls(
+            global_rate=global_rate or Config.GLOBAL_SEND_RATE,
+            chat_rate=Config.CHAT_SEND_RATE,
+            chat_burst=Config.CHAT_SEND_BURST,
+            workers=Config.SENDER_WORKERS,
+            retry_policy=RetryPolicy.from_config(),
+            breaker=CircuitBreaker.from_config()
+        )
+
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker,
+                name=f"sender-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(
+            f"Outbound scheduler started: {self.workers} workers, "
+            f"{self.global_bucket.rate}/s global, {self.chat_rate}/s per chat"
+        )
+
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None) -> None:
+        deadline = time.monotonic() + timeout if timeout else None
+        if drain:
+            with self._cond:
+                while self._ready or self._delayed or self._in_flight:
+                    remaining = deadline - time.monotonic() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+    def submit(
+        self,
+        chat_id: Union[int, str],
+        func: Callable[[], Any],
+        priority: int = Priority.NORMAL
+    ) -> Future:
+        """
+        Постановка отправки в очередь. func выполняет сам запрос к API.
+
+        :return: Future с результатом func
+        """
+        if not self._running:
+            self.start()
+        job = _SendJob(chat_id, func, priority)
+        with self._cond:
+            heapq.heappush(self._ready, (priority, next(self._seq), job))
+            self._cond.notify()
+        return job.future
+
+
+    def call(
+        self,
+        chat_id: Union[int, str],
+        func: Callable[[], Any],
+        priority: int = Priority.HIGH,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Отправка через очередь с ожиданием результата.
+        """
+        return self.submit(chat_id, func, priority).result(timeout)
+
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            self._trim_rate_window(now)
+            return {
+                "queue_depth": len(self._ready) + len(self._delayed),
+                "delayed": len(self._delayed),
+                "in_flight": self._in_flight,
+                "sent_total": self.sent_total,
+                "failed_total": self.failed_total,
+                "send_rate": round(len(self._sent_times) / self.RATE_WINDOW, 2),
+                "rate_limit": round(self.global_bucket.rate, 2),
+                "retried_total": self.retried_total,
+                "flood_total": self.flood_total,
+                "breaker_trips": self.breaker.trips,
+                "paused_for": round(self.breaker.pause_remaining(), 1),
+                "tracked_chats": len(self._chat_buckets)
+            }
+
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            try:
+                result = job.func()
+            except BaseException as e:
+                if self._retry_later(job, e):
+                    continue
+                with self._cond:
+                    self.failed_total += 1
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+                job.future.set_exception(e)
+            else:
+                with self._cond:
+                    self.sent_total += 1
+                    self._sent_times.append(time.monotonic())
+                    self._recover_rate()
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+                job.future.set_result(result)
+
+
+    def _retry_later(self, job: _SendJob, error: BaseException) -> bool:
+        """
+        Возврат задания в очередь с задержкой для повторяемых ошибок.
+
+        :return: True, если задание будет повторено
+        """
+        job.attempts += 1
+        kind = classify_error(error)
+        delay = self.retry_policy.next_delay(job.attempts, error)
+
+        with self._cond:
+            now = time.monotonic()
+            if kind == ErrorKind.FLOOD:
+                self._on_flood(job.chat_id, get_retry_after(error), now)
+            if delay is None:
+                return False
+
+            self.retried_total += 1
+            self._in_flight -= 1
+            heapq.heappush(self._delayed, (now + delay, next(self._seq), job))
+            self._cond.notify_all()
+
+        logger.warning(
+            f"Send to {job.chat_id} failed ({kind}, attempt {job.attempts}), "
+            f"retrying in {delay:.2f}s: {error}"
+        )
+        return True
+
+
+    def _on_flood(self, chat_id: Union[int, str], retry_after: Optional[float], now: float) -> None:
+        self.flood_total += 1
+        # Ответы 429 на один всплеск отправок снижают скорость один раз
+        if now - self._rate_decreased_at >= self.RATE_DECREASE_INTERVAL:
+            self._rate_decreased_at = now
+            self.global_bucket.rate = max(
+                self.MIN_GLOBAL_RATE,
+                self.global_bucket.rate * self.RATE_DECREASE_FACTOR
+            )
+            self.global_bucket.consume(now)
+            self.global_bucket.tokens = min(self.global_bucket.tokens, 0)
+        if retry_after:
+            # Чат не получит токен раньше, чем истечет retry_after
+            bucket = self._chat_bucket(chat_id)
+            bucket.consume(now)
+            bucket.tokens = min(bucket.tokens, 1 - retry_after * bucket.rate)
+        if self.breaker.record_flood(retry_after):
+            logger.warning(
+                f"Flood control: pausing all sends for {self.breaker.pause_remaining():.1f}s, "
+                f"global rate lowered to {self.global_bucket.rate:.1f}/s"
+            )
+
+
+    def _recover_rate(self) -> None:
+        if self.global_bucket.rate < self.max_global_rate:
+            self.global_bucket.rate = min(
+                self.max_global_rate,
+                self.global_bucket.rate + self.RATE_RECOVERY_STEP
+            )
+
+
+    def _next_job(self) -> Optional[_SendJob]:
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, job = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (job.priority, seq, job))
+
+                if not self._ready:
+                    timeout = self._delayed[0][0] - now if self._delayed else None
+                    self._cond.wait(timeout)
+                    continue
+
+                paused_for = self.breaker.pause_remaining()
+                if paused_for > 0:
+                    self._cond.wait(paused_for)
+                    continue
+
+                _, seq, job = self._ready[0]
+                chat_bucket = self._chat_bucket(job.chat_id)
+                chat_wait = chat_bucket.wait_time(now)
+                if chat_wait > 0:
+                    heapq.heappop(self._ready)
+                    heapq.heappush(self._delayed, (now + chat_wait, seq, job))
+                    continue
+
+                global_wait = self.global_bucket.wait_time(now)
+                if global_wait > 0:
+                    self._cond.wait(global_wait)
+                    continue
+
+                heapq.heappop(self._ready)
+                chat_bucket.consume(now)
+                self.global_bucket.consume(now)
+                self._in_flight += 1
+                if seq % self.BUCKET_PRUNE_EVERY == 0:
+                    self._prune_buckets(now)
+                return job
+            return None
+
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+
+    def _prune_buckets(self, now: float) -> None:
+        waiting = {job.chat_id for _, _, job in self._ready}
+        waiting.update(job.chat_id for _, _, job in self._delayed)
+        for chat_id in [
+            chat_id for chat_id, bucket in self._chat_buckets.items()
+            if chat_id not in waiting and bucket.is_full(now)
+        ]:
+            del self._chat_buckets[chat_id]
+
+
+    def _trim_rate_window(self, now: float) -> None:
+        while self._sent_times and self._sent_times[0] < now - self.RATE_WINDOW:
+            self._sent_times.popleft()
+
+
+class ScheduledTeleBot(TeleBot):
+    """
+    TeleBot, у которого send_message проходит через OutboundScheduler.
+
+    Дополнительный аргумент priority задает приоритет отправки; метод
+    submit_message ставит сообщение в очередь без ожидания результата.
+    """
+
+    def __init__(self, token: str, scheduler: Optional[OutboundScheduler] = None, **kwargs):
+        super().__init__(token, **kwargs)
+        self.scheduler = scheduler or OutboundScheduler.from_config()
+
+
+    def send_message(self, chat_id, text, *args, priority: int = Priority.HIGH, **kwargs):
+        return self.scheduler.call(
+            chat_id,
+            lambda: TeleBot.send_message(self, chat_id, text, *args, **kwargs),
+            priority
+        )
+
+
+    def submit_message(self, chat_id, text, *args, priority: int = Priority.BULK, **kwargs) -> Future:
+        return self.scheduler.submit(
+            chat_id,
+            lambda: TeleBot.send_message(self, chat_id, text, *args, **kwargs),
+            priority
+        )
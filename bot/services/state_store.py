@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import delete
+from bot.config import Config
+from bot.database.connector import db_connector
+from bot.database.models import DialogState
+
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore(ABC):
+    """
+    Хранилище состояний диалогов по ID пользователя.
+
+    Состояние - словарь с ключом 'action' и данными шага диалога.
+    Состояние без обращений дольше ttl секунд считается брошенным и истекает.
+    """
+
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        ...
+
+
+    @abstractmethod
+    def set(self, user_id: int, state: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        ...
+
+
+    @abstractmethod
+    def clear(self, user_id: int) -> None:
+        ...
+
+
+    def get_action(self, user_id: int) -> Optional[str]:
+        state = self.get(user_id)
+        return state.get('action') if state else None
+
+
+class MemoryStateStore(StateStore):
+    """
+    Состояния в памяти процесса. Не переживают перезапуск и не видны
+    другим процессам.
+    """
+
+    def __init__(self, ttl: int = 3600):
+        super().__init__(ttl)
+        self._states: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._states.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._states[user_id]
+                return None
+            return dict(entry[1])
+
+
+    def set(self, user_id: int, state: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._states[user_id] = (time.time() + (ttl or self.ttl), dict(state))
+
+
+    def clear(self, user_id: int) -> None:
+        with self._lock:
+            self._states.pop(user_id, None)
+
+
+class DatabaseStateStore(StateStore):
+    """
+    Состояния в таблице dialog_states с истечением по TTL и сквозным
+    (write-through) LRU-кэшем в процессе.
+
+    Записи кэша живут cache_ttl секунд, поэтому изменения, сделанные другим
+    процессом, становятся видны не позже чем через cache_ttl.
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(self, ttl: int = 3600, cache_size: int = 1000, cache_ttl: float = 5):
+        super().__init__(ttl)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[int, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._cache.move_to_end(user_id)
+                return dict(entry[1]) if entry[1] is not None else None
+
+        state = None
+        with db_connector.session_scope() as session:
+            row = session.get(DialogState, user_id)
+            if row is not None:
+                if row.expires_at < int(time.time()):
+                    session.delete(row)
+                else:
+                    state = dict(row.state)
+
+        self._cache_put(user_id, state)
+        return dict(state) if state is not None else None
+
+
+    def set(self, user_id: int, state: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        with db_connector.session_scope() as session:
+            session.merge(DialogState(
+                user_id=user_id,
+                state=dict(state),
+                expires_at=int(time.time()) + (ttl or self.ttl)
+            ))
+        self._cache_put(user_id, dict(state))
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+
+    def clear(self, user_id: int) -> None:
+        with db_connector.session_scope() as session:
+            session.execute(delete(DialogState).where(DialogState.user_id == user_id))
+        self._cache_put(user_id, None)
+
+
+    def purge_expired(self) -> int:
+        with db_connector.session_scope() as session:
+            result = session.execute(
+                delete(DialogState).where(DialogState.expires_at < int(time.time()))
+            )
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired dialog states")
+        return result.rowcount
+
+
+    def _cache_put(self, user_id: int, state: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._cache[user_id] = (time.monotonic() + self.cache_ttl, state)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+def create_state_store() -> StateStore:
+    if Config.STATE_STORE == "memory":
+        return MemoryStateStore(ttl=Config.STATE_TTL)
+    return DatabaseStateStore(
+        ttl=Config.STATE_TTL,
+        cache_size=Config.STATE_CACHE_SIZE,
+        cache_ttl=Config.STATE_CACHE_TTL
+    )
@@ -0,0 +1,204 @@
+"""
+HTTP-транспорт для запросов к Telegram Bot API.
+
+По умолчанию apihelper создает отдельный requests.Session в каждом потоке
+и пересоздает его раз в 10 минут: при параллельной отправке это лишние
+TLS-рукопожатия и предупреждения "Connection pool is full". ApiTransport
+подключается через apihelper.CUSTOM_REQUEST_SENDER и использует один
+Session на все потоки с пулом соединений по числу параллельных отправителей.
+
+Для проверки против локального сервера задается TELEGRAM_API_URL, например
+http://127.0.0.1:8081/bot{0}/{1}
+
+api_request() - запрос к Bot API без построения типов telebot из ответа.
+Он использует только публичные настройки apihelper (API_URL, таймауты,
+CUSTOM_REQUEST_SENDER), поэтому идет через тот же Session, что и TeleBot,
+и не зависит от внутренних функций telebot.
+"""
+import logging
+import socket
+import threading
+import time
+
+import requests
+
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from requests import Session
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from telebot.apihelper import ApiHTTPException, ApiTelegramException
+from urllib3.connection import HTTPConnection
+from bot.config import Config
+from bot.utils.metrics import LatencyStats
+
+
+logger = logging.getLogger(__name__)
+
+
+def _keepalive_socket_options():
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # Параметры TCP keepalive есть не на всех платформах
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class KeepAliveAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", _keepalive_socket_options())
+        super().init_poolmanager(*args, **kwargs)
+
+
+class ApiTransport:
+
+    def __init__(self, pool_size: int, connect_timeout: float = 5, read_timeout: float = 30):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # pool_block: при исчерпании пула поток ждет свободное соединение,
+        # а не открывает временное, которое будет сразу закрыто
+        self.adapter = KeepAliveAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self.session = Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        self._latency: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_config(cls) -> "ApiTransport":
+        return cls(
+            pool_size=Config.HTTP_POOL_SIZE or default_pool_size(),
+            connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=Config.HTTP_READ_TIMEOUT
+        )
+
+
+    def install(self) -> "ApiTransport":
+        """
+        Подключение транспорта к apihelper: все синхронные запросы TeleBot
+        идут через общий Session.
+        """
+        apihelper.CUSTOM_REQUEST_SENDER = self.request
+        apihelper.CONNECT_TIMEOUT = self.connect_timeout
+        apihelper.READ_TIMEOUT = self.read_timeout
+        if Config.TELEGRAM_API_URL:
+            apihelper.API_URL = Config.TELEGRAM_API_URL
+        logger.info(
+            f"HTTP transport installed: pool {self.pool_size}, "
+            f"timeouts {self.connect_timeout}/{self.read_timeout} s"
+        )
+        return self
+
+
+    def request(self, method: str, url: str, **kwargs):
+        endpoint = urlsplit(url).path.rsplit("/", 1)[-1]
+        started_at = time.monotonic()
+        ok = False
+        try:
+            response = self.session.request(method, url, **kwargs)
+            ok = response.status_code < 500
+            return response
+        finally:
+            self._endpoint_stats(endpoint).record(time.monotonic() - started_at, ok=ok)
+
+
+    def _endpoint_stats(self, endpoint: str) -> LatencyStats:
+        stats = self._latency.get(endpoint)
+        if stats is None:
+            with self._lock:
+                stats = self._latency.setdefault(endpoint, LatencyStats())
+        return stats
+
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Счетчики пулов urllib3: requests - отправлено запросов,
+        connections - открыто соединений, reused - запросов по уже
+        открытому соединению.
+        """
+        requests_count = connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            connections += pool.num_connections
+        return {
+            "requests": requests_count,
+            "connections": connections,
+            "reused": max(0, requests_count - connections),
+            "pool_size": self.pool_size
+        }
+
+
+    def stats(self) -> Dict:
+        with self._lock:
+            endpoints = dict(self._latency)
+        return {
+            "connections": self.connection_stats(),
+            "endpoints": {name: stats.snapshot() for name, stats in endpoints.items()}
+        }
+
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def default_pool_size() -> int:
+    # Отправители планировщика, потоки обработчиков и поток polling
+    workers = Config.SENDER_WORKERS
+    if Config.RUN_MODE == "async":
+        workers = max(workers, Config.ASYNC_HANDLER_WORKERS + Config.ADMIN_LANE_WORKERS)
+    else:
+        workers = max(workers, Config.DISPATCH_SHARDS + Config.ADMIN_LANE_WORKERS)
+    return workers + 2
+
+
+_transport: Optional[ApiTransport] = None
+
+
+def install_transport() -> ApiTransport:
+    global _transport
+    if _transport is None:
+        _transport = ApiTransport.from_config().install()
+    return _transport
+
+
+def get_transport() -> Optional[ApiTransport]:
+    return _transport
+
+
+def api_request(token: str, method_name: str, params: Dict[str, Any]) -> Any:
+    """
+    POST-запрос к Bot API через apihelper.CUSTOM_REQUEST_SENDER (установленный
+    транспорт) или requests, если отправитель не задан.
+
+    :param params: Параметры запроса; сложные значения уже сериализованы в JSON
+    :return: Поле result ответа
+    :raises ApiTelegramException: ok=false в ответе, с error_code и retry_after
+    :raises ApiHTTPException: ответ не в формате JSON
+    """
+    url = apihelper.API_URL.format(token, method_name)
+    timeout = (apihelper.CONNECT_TIMEOUT, apihelper.READ_TIMEOUT)
+    sender = apihelper.CUSTOM_REQUEST_SENDER or requests.request
+    response = sender("post", url, data=params, timeout=timeout, proxies=apihelper.proxy)
+
+    try:
+        result_json = response.json()
+    except ValueError:
+        raise ApiHTTPException(method_name, response)
+    if not result_json.get("ok"):
+        raise ApiTelegramException(method_name, response, result_json)
+    return result_json["result"]
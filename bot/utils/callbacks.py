@@ -0,0 +1,122 @@
+"""
+Маршрутизация callback_data.
+
+Кнопки кодируются как "<версия>:<действие>:<id>:<аргументы...>", например
+"1:close:42" или "1:ot::n:1700000000.15". callback_data разбирается один
+раз, и обработчик выбирается по действию из словаря, без перебора
+предикатов telebot. Кнопки старого формата ("close_42", "ot:n:...",
+"confirm") из уже отправленных сообщений продолжают работать.
+"""
+import logging
+import re
+
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+from telebot import TeleBot, types
+
+
+logger = logging.getLogger(__name__)
+
+
+VERSION = "1"
+SEPARATOR = ":"
+MAX_CALLBACK_DATA = 64  # байт, ограничение Telegram
+
+_LEGACY_ITEM = re.compile(r"^(ban|close|reply|unban|lang)_(\w+)$")
+_LEGACY_PAGES = {"ot", "mt", "sr"}
+
+
+class CallbackData(NamedTuple):
+    verb: str
+    id: Optional[int]
+    args: Tuple[str, ...]
+
+
+def encode_callback(verb: str, item_id: Optional[int] = None, *args) -> str:
+    parts = [VERSION, verb, "" if item_id is None else str(item_id), *map(str, args)]
+    if any(SEPARATOR in part for part in parts[1:]):
+        raise ValueError(f"Callback part contains '{SEPARATOR}': {parts}")
+
+    data = SEPARATOR.join(parts).rstrip(SEPARATOR)
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"Callback data exceeds {MAX_CALLBACK_DATA} bytes: {data}")
+    return data
+
+
+def parse_callback(data: Optional[str]) -> Optional[CallbackData]:
+    if not data:
+        return None
+
+    version, _, rest = data.partition(SEPARATOR)
+    if version == VERSION:
+        verb, _, rest = rest.partition(SEPARATOR)
+        raw_id, _, rest = rest.partition(SEPARATOR)
+        try:
+            item_id = int(raw_id) if raw_id else None
+        except ValueError:
+            return None
+        return CallbackData(verb, item_id, tuple(rest.split(SEPARATOR)) if rest else ())
+
+    return _parse_legacy(data)
+
+
+def _parse_legacy(data: str) -> Optional[CallbackData]:
+    if data in ("confirm", "cancel"):
+        return CallbackData(data, None, ())
+
+    match = _LEGACY_ITEM.match(data)
+    if match:
+        verb, value = match.groups()
+        if verb == "lang":
+            return CallbackData(verb, None, (value,))
+        return CallbackData(verb, int(value), ()) if value.isdigit() else None
+
+    prefix, _, rest = data.partition(":")
+    if prefix in _LEGACY_PAGES and rest:
+        first, _, second = rest.partition(":")
+        if prefix == "sr":  # sr:<вид>:<смещение>
+            return CallbackData(prefix, int(second), (first,)) if second.isdigit() else None
+        return CallbackData(prefix, None, (first, second))
+    return None
+
+
+class CallbackRouter:
+    """
+    Один обработчик callback_query для бота и словарь действие -> функция.
+    Функция вызывается как handler(call, data).
+    """
+
+    def __init__(self, bot: TeleBot):
+        self.bot = bot
+        self.routes: Dict[str, Callable] = {}
+
+
+    def route(self, *verbs: str) -> Callable:
+        def decorator(handler: Callable) -> Callable:
+            for verb in verbs:
+                if verb in self.routes:
+                    raise ValueError(f"Callback route '{verb}' is already registered")
+                self.routes[verb] = handler
+            return handler
+        return decorator
+
+
+    def dispatch(self, call: types.CallbackQuery) -> None:
+        data = parse_callback(call.data)
+        handler = self.routes.get(data.verb) if data else None
+        if handler is None:
+            logger.warning(f"Unknown callback data from {call.from_user.id}: {call.data!r}")
+            self.bot.answer_callback_query(call.id)
+            return
+        handler(call, data)
+
+
+def get_router(bot: TeleBot) -> CallbackRouter:
+    """
+    Маршрутизатор бота; при первом вызове регистрируется в telebot.
+    """
+    router = getattr(bot, "callback_router", None)
+    if router is None:
+        router = CallbackRouter(bot)
+        bot.callback_router = router
+        bot.register_callback_query_handler(router.dispatch, func=lambda call: True)
+    return router
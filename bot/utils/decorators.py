@@ -3,7 +3,7 @@ import logging
 
 from typing import Callable, Any
 from telebot import types
-from bot.database import crud
+from bot.database.crud import crud
 from bot.database.connector import db_connector
 from bot.config import Config
 
@@ -27,21 +27,20 @@ def access_check(is_admin: bool = False) -> Callable:
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(message: types.Message, *args, **kwargs) -> Any:
-            with db_connector.session_scope() as session:
-                user = crud.get_user(session, message.from_user.id)
-                
-                if user and user.is_banned:
-                    logger.warning(
-                        f"Blocked user tried to access: {message.from_user.id}"
-                    )
-                    return None
-                
-                if is_admin and message.from_user.id not in Config.ADMIN_IDS:
-                    logger.warning(
-                        f"Unauthorized admin access attempt: {message.from_user.id}"
-                    )
-                    return None
-            
+            user = crud.get_cached_user(None, message.from_user.id)
+
+            if user and user.is_banned:
+                logger.warning(
+                    f"Blocked user tried to access: {message.from_user.id}"
+                )
+                return None
+
+            if is_admin and message.from_user.id not in Config.ADMIN_IDS:
+                logger.warning(
+                    f"Unauthorized admin access attempt: {message.from_user.id}"
+                )
+                return None
+
             return func(message, *args, **kwargs)
         return wrapper
     return decorator
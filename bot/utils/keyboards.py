@@ -1,5 +1,8 @@
+from typing import Optional
 from telebot import types
 from bot.config import BotMessages
+from bot.utils.callbacks import encode_callback, parse_callback
+from bot.utils.pagination import Cursor, encode_cursor
 
 
 def get_main_menu_keyboard() -> types.ReplyKeyboardMarkup:
@@ -18,22 +21,48 @@ def get_admin_ticket_keyboard(ticket_id: int) -> types.InlineKeyboardMarkup:
     keyboard.add(
         types.InlineKeyboardButton(
             text="✉️ Ответить",
-            callback_data=f"reply_{ticket_id}"
+            callback_data=encode_callback("reply", ticket_id)
         ),
         types.InlineKeyboardButton(
             text="🔒 Закрыть",
-            callback_data=f"close_{ticket_id}"
+            callback_data=encode_callback("close", ticket_id)
         )
     )
     keyboard.add(
         types.InlineKeyboardButton(
             text="⛔ Блокировать",
-            callback_data=f"ban_{ticket_id}"
+            callback_data=encode_callback("ban", ticket_id)
         )
     )
     return keyboard
 
 
+TICKET_VERBS = ("reply", "close", "ban")
+
+
+def remove_ticket_buttons(
+    keyboard: Optional[types.InlineKeyboardMarkup],
+    ticket_id: int
+) -> Optional[types.InlineKeyboardMarkup]:
+    """
+    Клавиатура без кнопок одного обращения, например в сводке после его закрытия.
+
+    :return: Оставшиеся кнопки или None, если кнопок не осталось
+    """
+    if keyboard is None:
+        return None
+    rows = []
+    for row in keyboard.keyboard:
+        kept = []
+        for button in row:
+            data = parse_callback(button.callback_data)
+            if data is None or data.verb not in TICKET_VERBS or data.id != ticket_id:
+                kept.append(button)
+        if kept:
+            rows.append(kept)
+    return types.InlineKeyboardMarkup(keyboard=rows) if rows else None
+
+
 def get_cancel_keyboard() -> types.ReplyKeyboardMarkup:
     keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
     keyboard.add(types.KeyboardButton(text="❌ Отмена"))
@@ -45,11 +74,11 @@ def get_confirmation_keyboard() -> types.InlineKeyboardMarkup:
     keyboard.add(
         types.InlineKeyboardButton(
             text="✅ Подтвердить",
-            callback_data="confirm"
+            callback_data=encode_callback("confirm")
         ),
         types.InlineKeyboardButton(
             text="❌ Отменить",
-            callback_data="cancel"
+            callback_data=encode_callback("cancel")
         )
     )
     return keyboard
@@ -70,8 +99,58 @@ def get_admin_main_keyboard() -> types.ReplyKeyboardMarkup:
 def get_language_keyboard() -> types.InlineKeyboardMarkup:
     keyboard = types.InlineKeyboardMarkup(row_width=2)
     keyboard.add(
-        types.InlineKeyboardButton("English 🇬🇧", callback_data="lang_en"),
-        types.InlineKeyboardButton("Deutsch 🇩🇪", callback_data="lang_de"),
-        types.InlineKeyboardButton("Русский 🇷🇺", callback_data="lang_ru")
+        types.InlineKeyboardButton("English 🇬🇧", callback_data=encode_callback("lang", None, "en")),
+        types.InlineKeyboardButton("Deutsch 🇩🇪", callback_data=encode_callback("lang", None, "de")),
+        types.InlineKeyboardButton("Русский 🇷🇺", callback_data=encode_callback("lang", None, "ru"))
     )
     return keyboard
+
+
+def get_pagination_keyboard(
+    verb: str,
+    prev_cursor: Optional[Cursor],
+    next_cursor: Optional[Cursor]
+) -> Optional[types.InlineKeyboardMarkup]:
+    buttons = []
+    if prev_cursor:
+        buttons.append(types.InlineKeyboardButton(
+            text="◀️",
+            callback_data=encode_callback(verb, None, "p", encode_cursor(prev_cursor))
+        ))
+    if next_cursor:
+        buttons.append(types.InlineKeyboardButton(
+            text="▶️",
+            callback_data=encode_callback(verb, None, "n", encode_cursor(next_cursor))
+        ))
+    if not buttons:
+        return None
+
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(*buttons)
+    return keyboard
+
+
+def get_offset_pagination_keyboard(
+    verb: str,
+    offset: int,
+    limit: int,
+    has_next: bool,
+    *args
+) -> Optional[types.InlineKeyboardMarkup]:
+    buttons = []
+    if offset > 0:
+        buttons.append(types.InlineKeyboardButton(
+            text="◀️",
+            callback_data=encode_callback(verb, max(offset - limit, 0), *args)
+        ))
+    if has_next:
+        buttons.append(types.InlineKeyboardButton(
+            text="▶️",
+            callback_data=encode_callback(verb, offset + limit, *args)
+        ))
+    if not buttons:
+        return None
+
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(*buttons)
+    return keyboard
@@ -0,0 +1,40 @@
+import threading
+
+from collections import deque
+from typing import Dict
+
+
+class LatencyStats:
+    """
+    Потокобезопасная статистика задержек по последним window замерам.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.failures = 0
+
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.count += 1
+            if not ok:
+                self.failures += 1
+            self._samples.append(seconds)
+
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, failures = self.count, self.failures
+        if not samples:
+            return {"count": count, "failures": failures, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": count,
+            "failures": failures,
+            "avg": round(sum(samples) / len(samples), 3),
+            "p50": round(samples[len(samples) // 2], 3),
+            "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+            "max": round(samples[-1], 3)
+        }
@@ -0,0 +1,30 @@
+import calendar
+
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+
+Cursor = Tuple[datetime, int]
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_cursor(cursor: Optional[Cursor]) -> str:
+    """
+    Компактная запись курсора (created_at, id) для callback_data.
+    Время хранится в секундах UTC, как и в таблице обращений.
+    """
+    if not cursor:
+        return ""
+    created_at, item_id = cursor
+    return f"{calendar.timegm(created_at.timetuple())}.{item_id}"
+
+
+def decode_cursor(value: str) -> Optional[Cursor]:
+    if not value:
+        return None
+    try:
+        timestamp, item_id = value.split(".", 1)
+        return _EPOCH + timedelta(seconds=int(timestamp)), int(item_id)
+    except ValueError:
+        return None
@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Config читает окружение при импорте, поэтому тестовая БД задается до импорта bot
+_db_dir = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(_db_dir, 'tickets.db')}"
+os.environ.setdefault("ADMIN_IDS", "900")
+
+
+@pytest.fixture
+def db():
+    """
+    Сессия на пустой БД: таблицы пересоздаются для каждого теста.
+    """
+    from bot.database.cache import user_cache
+    from bot.database.connector import db_connector
+    from bot.database.models import Base
+
+    Base.metadata.drop_all(db_connector.engine)
+    db_connector.create_tables()
+    user_cache.clear()
+    session = db_connector.session_factory()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
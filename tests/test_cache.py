@@ -0,0 +1,92 @@
+import time
+
+from bot.database import cache
+from bot.database.cache import UserCache, UserRecord, user_cache
+from bot.database.connector import db_connector
+from bot.database.crud import crud
+
+
+def record(user_id=1, chat_id=100, is_banned=False):
+    return UserRecord(
+        id=user_id, chat_id=chat_id, username="user", first_name="User",
+        last_name=None, is_banned=is_banned, language="en"
+    )
+
+
+def test_put_rejects_record_read_before_invalidation():
+    users = UserCache()
+    generation = users.generation()
+    users.invalidate(chat_ids=[100])
+
+    assert users.put(record(), generation) is False
+    assert users.get_by_chat_id(100) is None
+
+    assert users.put(record(), users.generation()) is True
+    assert users.get_by_chat_id(100) == record()
+
+
+def test_invalidate_by_user_id_drops_both_indexes():
+    users = UserCache()
+    users.put(record())
+
+    users.invalidate(user_ids=[1])
+
+    assert users.get_by_id(1) is None
+    assert users.get_by_chat_id(100) is None
+
+
+def test_lru_and_ttl():
+    users = UserCache(max_size=2, ttl=60)
+    users.put(record(1, 101))
+    users.put(record(2, 102))
+    users.get_by_chat_id(101)
+    users.put(record(3, 103))
+
+    assert users.get_by_chat_id(102) is None
+    assert users.get_by_chat_id(101) is not None
+    assert users.get_by_id(2) is None
+
+    expired = UserCache(ttl=0)
+    expired.put(record())
+    time.sleep(0.01)
+    assert expired.get_by_chat_id(100) is None
+
+
+def test_cached_user_reflects_ban_after_commit(db):
+    user = crud.create_user(db, chat_id=100, first_name="User")
+    stale = crud.get_cached_user(db, 100)
+    assert stale.is_banned is False
+
+    other = db_connector.session_factory()
+    try:
+        # Читатель начал чтение до коммита бана и получил старое значение
+        generation = user_cache.generation()
+        crud.bulk_update_users(other, [user.id], {"is_banned": True})
+        other.commit()
+    finally:
+        other.close()
+
+    assert user_cache.put(stale, generation) is False
+    assert user_cache.get_by_chat_id(100) is None
+    db.expire_all()
+    assert crud.get_cached_user(db, 100).is_banned is True
+    assert user_cache.get_by_id(user.id).is_banned is True
+
+
+def test_rollback_discards_pending_invalidation(db):
+    user = crud.create_user(db, chat_id=100, first_name="User")
+    calls = []
+    cache.add_invalidation_listener(lambda chat_ids, user_ids: calls.append(user_ids))
+    try:
+        crud.bulk_update_users(db, [user.id], {"is_banned": True})
+        db.rollback()
+        db.commit()
+        assert calls == []
+
+        crud.bulk_update_users(db, [user.id], {"is_banned": True})
+        db.commit()
+        assert calls == [[user.id]]
+    finally:
+        cache._invalidation_listeners.pop()
+
+    assert crud.get_cached_user(db, 100).is_banned is True
@@ -0,0 +1,119 @@
+import pytest
+from telebot import TeleBot
+
+from bot.database.crud import crud
+from bot.database.models import Ticket
+from bot.services import ingress, messaging
+from bot.services.admin_actions import AdminActions
+from bot.services.ingress import ALLOWED, BANNED, MUTED, THROTTLED, WARNED, IngressLimiter
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ingress, "time", clock)
+    return clock
+
+
+def limiter(**kwargs):
+    """
+    Без корзины токенов: каждый повтор сверх первого - нарушение.
+    """
+    params = dict(rate=0, duplicate_limit=1, mute_strikes=2, mute_seconds=600,
+                  warn_interval=60, ban_strikes=3)
+    params.update(kwargs)
+    return IngressLimiter(**params)
+
+
+def test_strikes_escalate_to_mute_and_ban(clock):
+    bans = []
+    limit = limiter(on_ban=lambda user_id, reason: bans.append(user_id))
+
+    assert limit.check(5, "spam") == ALLOWED
+    assert limit.check(5, "spam") == WARNED
+    assert limit.check(5, "spam") == MUTED
+    assert limit.mute_remaining(5) == 600
+    # Во время отключения сообщения отбрасываются молча и не засчитываются
+    assert limit.check(5, "other text") == THROTTLED
+    assert bans == []
+
+    clock.now += 601
+    assert limit.mute_remaining(5) == 0
+    assert limit.check(5, "other text") == ALLOWED
+    assert limit.check(5, "other text") == BANNED
+    assert bans == [5]
+    assert limit.stats()["mutes"] == 1
+    assert limit.stats()["bans"] == 1
+
+
+def test_warning_is_sent_once_per_interval(clock):
+    limit = limiter(mute_strikes=0, ban_strikes=0, duplicate_limit=2)
+
+    verdicts = [limit.check(5, "spam") for _ in range(6)]
+    assert verdicts == [ALLOWED, ALLOWED, WARNED, THROTTLED, THROTTLED, THROTTLED]
+
+    clock.now += 61
+    assert limit.check(5, "spam") == WARNED
+
+
+def test_strikes_expire_after_ttl(clock):
+    limit = limiter(strike_ttl=100)
+
+    assert limit.check(5, "spam") == ALLOWED
+    assert limit.check(5, "spam") == WARNED
+    clock.now += 101
+    # Счет начался заново: второе нарушение отключает, а не блокирует
+    assert limit.check(5, "spam") == WARNED
+    assert limit.check(5, "spam") == MUTED
+
+
+def test_exempt_users_are_not_limited(clock):
+    limit = limiter(exempt=[900])
+    assert all(limit.check(900, "spam") == ALLOWED for _ in range(10))
+
+
+def test_mute_survives_restart(db, clock):
+    first = limiter(persist=True)
+    assert first.check(5, "spam") == ALLOWED
+    assert first.check(5, "spam") == WARNED
+    assert first.check(5, "spam") == MUTED
+
+    restarted = limiter(persist=True)
+    assert restarted.check(5, "new text") == MUTED
+    assert restarted.mute_remaining(5) == 600
+
+
+def test_auto_ban_blocks_user_and_closes_tickets(db, clock, monkeypatch):
+    sent = []
+    monkeypatch.setattr(messaging, "api_request", lambda token, method, params: sent.append(params) or {})
+
+    # DB id пользователя отличается от его chat_id
+    crud.create_user(db, chat_id=111, first_name="Other")
+    user = crud.create_user(db, chat_id=5, first_name="Spammer")
+    db.add(Ticket(user_id=user.id, message="help"))
+    db.commit()
+
+    actions = AdminActions(TeleBot("1:test", threaded=False))
+    limit = limiter(on_ban=actions.system_ban)
+    verdicts = [limit.check(5, "spam") for _ in range(3)]
+    clock.now += 601
+    verdicts.append(limit.check(5, "spam"))
+    assert verdicts == [ALLOWED, WARNED, MUTED, BANNED]
+
+    db.expire_all()
+    assert crud.get_user(db, 5).is_banned is True
+    assert crud.get_user(db, 111).is_banned is False
+    assert db.get(Ticket, 1).status == "closed"
+    assert [params["chat_id"] for params in sent] == [5]
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from bot.database.crud import crud
+from bot.database.models import Ticket
+from bot.utils.pagination import decode_cursor, encode_cursor
+
+
+BASE_TIME = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def add_tickets(db, user_id, offsets, status="open"):
+    """
+    Обращения с created_at = BASE_TIME + offset секунд, id по порядку вставки.
+    """
+    tickets = [
+        Ticket(user_id=user_id, message=f"ticket {index}", status=status,
+               created_at=BASE_TIME + timedelta(seconds=offset))
+        for index, offset in enumerate(offsets)
+    ]
+    db.add_all(tickets)
+    db.commit()
+    return tickets
+
+
+def walk(fetch, direction_key, cursor=None, backward=False):
+    """
+    Обход всех страниц в одном направлении; курсор каждый раз проходит
+    через encode_cursor/decode_cursor, как в callback_data.
+    """
+    pages = []
+    while True:
+        page = fetch(cursor=cursor, backward=backward)
+        pages.append([row.id for row in page["items"]])
+        if page[direction_key] is None:
+            return pages, page
+        cursor = decode_cursor(encode_cursor(page[direction_key]))
+
+
+def test_cursor_round_trip():
+    cursor = (datetime(2024, 5, 1, 12, 30, 15), 42)
+
+    assert decode_cursor(encode_cursor(cursor)) == cursor
+    assert encode_cursor(None) == ""
+    assert decode_cursor("") is None
+
+
+def test_malformed_cursor_is_ignored():
+    assert decode_cursor("garbage") is None
+    assert decode_cursor("1714564800.x") is None
+    assert decode_cursor("x.5") is None
+
+
+def test_open_tickets_pages_cover_ties_without_gaps(db):
+    # Три обращения в одну секунду: порядок внутри них задает id
+    tickets = add_tickets(db, user_id=1, offsets=[0, 5, 5, 5, 10, 20, 30])
+    add_tickets(db, user_id=2, offsets=[7], status="closed")
+    expected = [ticket.id for ticket in tickets]
+
+    def fetch(cursor, backward):
+        return crud.get_open_ticket_previews(db, cursor=cursor, limit=3, backward=backward)
+
+    pages, last = walk(fetch, "next_cursor")
+    assert pages == [expected[0:3], expected[3:6], expected[6:7]]
+    assert last["prev_cursor"] is not None
+
+    first = fetch(cursor=None, backward=False)
+    assert first["prev_cursor"] is None
+
+    back_pages, first_again = walk(
+        fetch, "prev_cursor", cursor=last["prev_cursor"], backward=True
+    )
+    assert back_pages == [expected[3:6], expected[0:3]]
+    assert first_again["next_cursor"] is not None
+
+
+def test_user_tickets_are_paged_newest_first(db):
+    tickets = add_tickets(db, user_id=1, offsets=[0, 0, 60, 60, 120])
+    add_tickets(db, user_id=2, offsets=[30])
+    expected = [ticket.id for ticket in reversed(tickets)]
+
+    def fetch(cursor, backward):
+        return crud.get_user_ticket_previews(db, 1, cursor=cursor, limit=2, backward=backward)
+
+    pages, _ = walk(fetch, "next_cursor")
+    assert pages == [expected[0:2], expected[2:4], expected[4:5]]
+
+
+def test_page_size_equal_to_total_has_no_next_page(db):
+    add_tickets(db, user_id=1, offsets=[0, 1, 2])
+
+    page = crud.get_open_ticket_previews(db, limit=3)
+
+    assert len(page["items"]) == 3
+    assert page["next_cursor"] is None
+    assert page["prev_cursor"] is None
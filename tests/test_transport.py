@@ -0,0 +1,106 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from telebot import TeleBot, apihelper
+from bot.services.retry import ErrorKind, classify_error
+from bot.services.transport import ApiTransport, api_request
+
+
+TOKEN = "123:test"
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: соединение остается в пуле
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        params.update(parse_qs(self.rfile.read(length).decode()))
+        method = url.path.rsplit("/", 1)[-1]
+        self.server.calls.append((method, params.get("text", [None])[0]))
+
+        if params.get("chat_id") == ["403"]:
+            status, response = 403, {
+                "ok": False,
+                "error_code": 403,
+                "description": "Forbidden: bot was blocked by the user"
+            }
+        else:
+            status, response = 200, {"ok": True, "result": {
+                "message_id": len(self.server.calls),
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+                "text": "pong"
+            }}
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApiHandler)
+    server.calls = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport(api_server, monkeypatch):
+    monkeypatch.setattr(apihelper, "CUSTOM_REQUEST_SENDER", None)
+    monkeypatch.setattr(apihelper, "API_URL", apihelper.API_URL)
+    monkeypatch.setattr(apihelper, "CONNECT_TIMEOUT", apihelper.CONNECT_TIMEOUT)
+    monkeypatch.setattr(apihelper, "READ_TIMEOUT", apihelper.READ_TIMEOUT)
+
+    transport = ApiTransport(pool_size=2, connect_timeout=2, read_timeout=5).install()
+    host, port = api_server.server_address
+    apihelper.API_URL = f"http://{host}:{port}/bot{{0}}/{{1}}"
+    yield transport
+    transport.close()
+
+
+def test_pooled_session_round_trip(api_server, transport):
+    bot = TeleBot(TOKEN, threaded=False)
+
+    messages = [bot.send_message(1, f"ping {i}") for i in range(3)]
+
+    assert [message.message_id for message in messages] == [1, 2, 3]
+    assert api_server.calls == [("sendMessage", f"ping {i}") for i in range(3)]
+
+    connections = transport.connection_stats()
+    assert connections["requests"] == 3
+    assert connections["connections"] == 1
+    assert connections["reused"] == 2
+
+    endpoints = transport.stats()["endpoints"]
+    assert endpoints["sendMessage"]["count"] == 3
+    assert endpoints["sendMessage"]["failures"] == 0
+
+
+def test_api_request_uses_transport_and_raises_api_errors(api_server, transport):
+    result = api_request(TOKEN, "sendMessage", {"chat_id": 1, "text": "raw"})
+
+    assert result["message_id"] == 1
+    assert api_server.calls == [("sendMessage", "raw")]
+
+    with pytest.raises(apihelper.ApiTelegramException) as error:
+        api_request(TOKEN, "sendMessage", {"chat_id": 403, "text": "raw"})
+    assert error.value.error_code == 403
+    assert classify_error(error.value) == ErrorKind.FORBIDDEN
+
+    assert transport.connection_stats()["connections"] == 1
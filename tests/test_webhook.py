@@ -0,0 +1,89 @@
+import json
+import threading
+
+from http.client import HTTPConnection
+
+import pytest
+
+from telebot import TeleBot
+from bot.runtime.dispatcher import ShardedDispatcher
+from bot.runtime.webhook import SECRET_HEADER, WebhookServer
+
+
+SECRET = "test-secret"
+
+
+def message_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "text": text,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"}
+        }
+    }
+
+
+@pytest.fixture
+def received():
+    return []
+
+
+@pytest.fixture
+def dispatcher(received):
+    bot = TeleBot("123:test", threaded=False)
+    done = threading.Event()
+
+    @bot.message_handler(func=lambda message: True)
+    def record(message):
+        received.append((message.chat.id, message.text))
+        done.set()
+
+    dispatcher = ShardedDispatcher(bot, shards=2, queue_size=10)
+    dispatcher.start()
+    dispatcher.done = done
+    yield dispatcher
+    dispatcher.stop(drain=True, timeout=5)
+
+
+@pytest.fixture
+def server(dispatcher):
+    server = WebhookServer(("127.0.0.1", 0), dispatcher, secret=SECRET, path="/telegram")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body: bytes, secret: str = SECRET, path: str = "/telegram") -> int:
+    connection = HTTPConnection(*server.server_address, timeout=5)
+    try:
+        connection.request("POST", path, body=body, headers={
+            SECRET_HEADER: secret,
+            "Content-Type": "application/json"
+        })
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_update_is_dispatched_to_handlers(server, dispatcher, received):
+    status = post(server, json.dumps(message_update(1, 42, "hello")).encode())
+
+    assert status == 200
+    assert dispatcher.done.wait(5)
+    assert received == [(42, "hello")]
+
+
+def test_invalid_requests_are_rejected(server, dispatcher, received):
+    body = json.dumps(message_update(2, 42, "hello")).encode()
+
+    assert post(server, body, secret="wrong") == 403
+    assert post(server, body, path="/other") == 404
+    assert post(server, b"{not json") == 400
+
+    dispatcher.stop(drain=True, timeout=5)
+    assert received == []